@@ -0,0 +1,94 @@
+from functools import partial
+from http import HTTPStatus
+
+from decoding import decode
+from exception import CircuitOpenError
+from lazy import lazy_import
+
+requests = lazy_import('requests')
+
+POOL_SIZE = 10
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+
+
+def is_server_error(status_code):
+    """Проверяет, что код ответа говорит о недоступности API."""
+    return (
+        status_code >= HTTPStatus.INTERNAL_SERVER_ERROR
+        or status_code == HTTPStatus.TOO_MANY_REQUESTS)
+
+
+class PracticumClient:
+    """
+    Клиент API Практикума.
+
+    Держит одну requests.Session с пулом keep-alive соединений,
+    поэтому повторные запросы не тратят время на TCP и TLS рукопожатия.
+    Каждый запрос ограничен таймаутами на соединение и на чтение.
+    Если передан предохранитель breaker, при его размыкании запросы
+    не делаются, а сетевые ошибки и ответы 5xx и 429 считаются сбоями.
+    Функция loads, если передана, заменяет stdlib json в response.json().
+    При stream=True тело ответа не читается сразу, его можно
+    разбирать по кускам; соединение вернется в пул, когда тело
+    дочитано или ответ закрыт.
+    """
+
+    def __init__(self, endpoint, pool_size=POOL_SIZE,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 breaker=None, loads=None, stream=False):
+        """Создает сессию и монтирует адаптер с пулом соединений."""
+        self.endpoint = endpoint
+        self.breaker = breaker
+        self.loads = loads
+        self.stream = stream
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if loads is not None:
+            self.session.hooks['response'].append(self._use_loads)
+
+    def get(self, token, from_date, headers=None):
+        """
+        Запрашивает статусы домашек с временной метки from_date.
+
+        Дополнительные заголовки, например условного запроса,
+        передаются в headers.
+        """
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpenError('API Практикума недоступен, ждем')
+        request_headers = {'Authorization': f'OAuth {token}'}
+        if headers:
+            request_headers.update(headers)
+        try:
+            response = self.session.get(
+                self.endpoint,
+                headers=request_headers,
+                params={'from_date': from_date},
+                timeout=self.timeout,
+                stream=self.stream)
+        except requests.RequestException:
+            self._record(False)
+            raise
+        self._record(not is_server_error(response.status_code))
+        return response
+
+    def _use_loads(self, response, *args, **kwargs):
+        """Хук сессии: response.json() разбирает тело функцией loads."""
+        response.json = partial(decode, self.loads, response)
+
+    def _record(self, success):
+        """Сообщает предохранителю итог запроса."""
+        if self.breaker is None:
+            return
+        if success:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def close(self):
+        """Закрывает все соединения пула."""
+        self.session.close()
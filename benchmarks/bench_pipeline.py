@@ -0,0 +1,180 @@
+"""
+Нагрузочный замер цепочки опрос -> проверка -> форматирование -> отправка.
+
+Поднимает в процессе поддельные API Практикума и Telegram Bot API
+из fake_server.py, направляет на них get_api_answer_for и telegram.Bot
+и для каждого числа подписок замеряет пропускную способность
+и задержки p50/p99 обработки одной подписки. Перед замерами
+цепочка прогревается: ленивые импорты, пулы соединений и потоков
+иначе попали бы в первый замер. Каждый размер замеряется --runs
+раз, в отчет идет медиана каждого показателя; в одном замере пачка
+подписок повторяется, пока он не займет --min-time секунд.
+
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --sizes 1 100 --save
+    python benchmarks/bench_pipeline.py --compare
+
+Базовые значения хранятся в benchmarks/baselines.json. С --compare
+скрипт завершается с кодом 1, если пропускная способность упала
+больше чем на --tolerance относительно базовой.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import telegram  # noqa: E402
+from telegram.utils.request import Request  # noqa: E402
+
+import homework  # noqa: E402
+from fake_server import FakeServer  # noqa: E402
+
+SIZES = (1, 100, 1000, 10000)
+WORKERS = 32
+BASELINES = os.path.join(ROOT, 'benchmarks', 'baselines.json')
+TOLERANCE = 0.2
+RUNS = 5
+MIN_TIME = 1.0
+WARMUP = 2 * WORKERS
+METRICS = ('throughput', 'p50_ms', 'p99_ms')
+
+
+def run_pipeline(bot, token, chat_id):
+    """Прогоняет одну подписку через всю цепочку, возвращает секунды."""
+    started = time.perf_counter()
+    response = homework.get_api_answer_for(token, 0)
+    for item in homework.check_response(response):
+        homework.send_message_to(bot, chat_id, homework.parse_status(item))
+    return time.perf_counter() - started
+
+
+def percentile(values, share):
+    """Возвращает перцентиль share отсортированного списка."""
+    position = min(len(values) - 1, int(round(share * (len(values) - 1))))
+    return values[position]
+
+
+def measure(bot, size, workers, min_time):
+    """
+    Замеряет цепочку для size подписок.
+
+    Пачка из size подписок повторяется, пока замер не займет
+    min_time секунд: одиночная пачка малого размера длится
+    миллисекунды и тонет в шуме.
+    """
+    latencies = []
+    batches = 0
+    with ThreadPoolExecutor(workers) as executor:
+        started = time.perf_counter()
+        while True:
+            latencies.extend(executor.map(
+                lambda number: run_pipeline(bot, f'token-{number}', number),
+                range(size)))
+            batches += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_time:
+                break
+    latencies.sort()
+    return {
+        'subscriptions': size,
+        'throughput': round(size * batches / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def warm_up(bot, count, workers):
+    """Прогоняет count подписок мимо замеров."""
+    with ThreadPoolExecutor(workers) as executor:
+        list(executor.map(
+            lambda number: run_pipeline(bot, f'warmup-{number}', number),
+            range(count)))
+
+
+def measure_median(bot, size, workers, runs, min_time):
+    """Замеряет size подписок runs раз и берет медиану показателей."""
+    samples = [measure(bot, size, workers, min_time) for _ in range(runs)]
+    result = {'subscriptions': size, 'runs': runs}
+    for metric in METRICS:
+        result[metric] = statistics.median(
+            sample[metric] for sample in samples)
+    return result
+
+
+def compare(results, baselines, tolerance):
+    """Печатает сравнение с базой и возвращает число регрессий."""
+    regressions = 0
+    for result in results:
+        base = baselines.get(str(result['subscriptions']))
+        if base is None:
+            continue
+        change = result['throughput'] / base['throughput'] - 1
+        flag = ''
+        if change < -tolerance:
+            regressions += 1
+            flag = '  <-- регрессия'
+        print(f"{result['subscriptions']:>6}: {change:+.1%}{flag}")
+    return regressions
+
+
+def main():
+    """Разбирает аргументы и запускает замеры."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--save', action='store_true')
+    parser.add_argument('--compare', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--runs', type=int, default=RUNS)
+    parser.add_argument('--warmup', type=int, default=WARMUP)
+    parser.add_argument('--min-time', type=float, default=MIN_TIME)
+    args = parser.parse_args()
+
+    server = FakeServer(latency=args.latency).start_in_thread()
+    homework.configure(replace(
+        homework.CONFIG, endpoint=server.endpoint, pool_size=args.workers))
+    homework._client = None
+    bot = telegram.Bot(
+        '123:bench', base_url=server.telegram_url,
+        request=Request(con_pool_size=args.workers))
+
+    warm_up(bot, args.warmup, args.workers)
+    results = []
+    for size in args.sizes:
+        result = measure_median(
+            bot, size, args.workers, args.runs, args.min_time)
+        results.append(result)
+        print(json.dumps(result, ensure_ascii=False))
+    server.close()
+
+    if args.save:
+        baselines = {
+            str(result['subscriptions']): result for result in results}
+        baselines['environment'] = {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'workers': args.workers,
+            'runs': args.runs,
+            'warmup': args.warmup,
+            'min_time': args.min_time,
+        }
+        with open(BASELINES, 'w', encoding='utf-8') as file:
+            json.dump(baselines, file, ensure_ascii=False, indent=2)
+            file.write('\n')
+    if args.compare:
+        with open(BASELINES, encoding='utf-8') as file:
+            baselines = json.load(file)
+        sys.exit(1 if compare(results, baselines, args.tolerance) else 0)
+
+
+if __name__ == '__main__':
+    main()
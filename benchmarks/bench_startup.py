@@ -0,0 +1,130 @@
+"""
+Время запуска воркера.
+
+Импорт меряется через python -X importtime -c "import homework":
+итоговое время импорта модуля и самые дорогие из импортов,
+которые он тянет. Время до первого опроса — от запуска процесса
+python homework.py до первого запроса к поддельному API Практикума
+из fake_server.py.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 10 --top 15 --commands
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_server import FakeServer  # noqa: E402
+
+REPEAT = 5
+TOP = 10
+TOKEN = 'startup-token'
+FIRST_POLL_TIMEOUT = 30
+
+
+def parse_importtime(stderr):
+    """
+    Разбирает вывод -X importtime.
+
+    Возвращает словарь модуль -> (собственное, суммарное время в мкс).
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_time), int(cumulative))
+    return modules
+
+
+def measure_import(module, repeat):
+    """Импортирует module в отдельных процессах repeat раз."""
+    runs = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=ROOT, capture_output=True, text=True, check=True)
+        runs.append(parse_importtime(result.stderr))
+    return runs
+
+
+def measure_first_poll(server, repeat, commands=False):
+    """
+    Запускает воркер repeat раз и меряет время до первого опроса.
+
+    commands включает поток команд, который сразу создает бота.
+    """
+    times = []
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(
+            os.environ,
+            PRAKTICUM_TOKEN=TOKEN,
+            TELEGRAM_TOKEN='123:startup',
+            TELEGRAM_ChAT_ID='1',
+            PRACTICUM_ENDPOINT=server.endpoint,
+            TELEGRAM_API_URL=server.telegram_url,
+            STATE_PATH=os.path.join(directory, 'state.db'),
+            OUTBOX_PATH=os.path.join(directory, 'outbox.db'),
+            LOG_FILE=os.path.join(directory, 'main.log'),
+            POLL_JITTER='0',
+            COMMANDS='on' if commands else 'off')
+        for _ in range(repeat):
+            server.scripts.pop(TOKEN, None)
+            for path in (env['STATE_PATH'], env['OUTBOX_PATH']):
+                if os.path.exists(path):
+                    os.remove(path)
+            started = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, 'homework.py'], cwd=ROOT, env=env,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                while TOKEN not in server.scripts:
+                    if time.perf_counter() - started > FIRST_POLL_TIMEOUT:
+                        raise RuntimeError('Воркер не начал опрос')
+                    if process.poll() is not None:
+                        raise RuntimeError(
+                            f'Воркер завершился с кодом {process.returncode}')
+                    time.sleep(0.001)
+                times.append(time.perf_counter() - started)
+            finally:
+                process.terminate()
+                process.wait()
+    return times
+
+
+def main():
+    """Печатает время импорта и время до первого опроса."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--module', default='homework')
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--top', type=int, default=TOP)
+    parser.add_argument('--commands', action='store_true')
+    args = parser.parse_args()
+
+    interpreter, = measure_import('sys', 1)
+    runs = measure_import(args.module, args.repeat)
+    total = statistics.median(run[args.module][1] for run in runs)
+    print(f'import {args.module}: {total / 1000:.1f} мс (медиана)')
+    heaviest = sorted(
+        (item for item in runs[0].items() if item[0] not in interpreter),
+        key=lambda item: item[1][1], reverse=True)
+    print(f'{"модуль":<40} {"суммарно, мс":>14}')
+    for name, (_, cumulative) in heaviest[1:args.top + 1]:
+        print(f'{name:<40} {cumulative / 1000:>14.1f}')
+
+    with FakeServer() as server:
+        times = measure_first_poll(server, args.repeat, args.commands)
+    print(
+        f'до первого опроса: {statistics.median(times) * 1000:.0f} мс '
+        f'(медиана), {min(times) * 1000:.0f}–{max(times) * 1000:.0f} мс')
+
+
+if __name__ == '__main__':
+    main()
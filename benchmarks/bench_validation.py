@@ -0,0 +1,139 @@
+"""
+Сравнение проверки ответа API: прежние функции и ResponseValidator.
+
+Прежние check_response и parse_status воспроизведены здесь
+как были до перехода на validation.py. Обе версии делают
+работу process_response без индекса: проверяют ответ, готовят
+строки сообщений, пары (ключ, статус) и набор работ на проверке.
+
+Выигрыша в скорости validator не дает, он медленнее: на каждую
+годную домашку создается запись Homework, а проверок больше, чем
+в прежней цепочке. На замерах это 0.8x-0.9x от прежних функций.
+Ценность validator — в отбраковке плохих домашек по одной, а не
+в скорости; бенчмарк следит, чтобы разрыв не вырос.
+
+    python benchmarks/bench_validation.py
+    python benchmarks/bench_validation.py --homeworks 1 100 --repeat 2000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from homework import HOMEWORK_STATUSES  # noqa: E402
+from status_index import homework_key  # noqa: E402
+from validation import ResponseValidator  # noqa: E402
+
+SIZES = (1, 10, 100)
+REPEAT = 1000
+ROUNDS = 15
+
+
+def legacy_check_response(response):
+    """Прежняя проверка ответа."""
+    if not isinstance(response, dict):
+        raise TypeError('Response не является словарем')
+    homeworks = response.get('homeworks')
+    if not isinstance(homeworks, list):
+        raise TypeError('Response не является списком')
+    if 'homeworks' not in response or 'current_date' not in response:
+        raise TypeError('Response не является ключем')
+    return homeworks
+
+
+def legacy_parse_status(homework):
+    """Прежний разбор домашки, без записи в лог."""
+    if not isinstance(homework, dict):
+        raise TypeError('Это не словарь!')
+    homework_name = homework.get('homework_name')
+    if not homework_name:
+        raise KeyError('Имя не существует')
+    homework_status = homework.get('status')
+    if not homework_status:
+        raise KeyError('Статус не существует')
+    verdict = HOMEWORK_STATUSES.get(homework_status)
+    if not verdict:
+        raise KeyError(f'Ошибка статуса {verdict}')
+    return f'Изменился статус проверки работы "{homework_name}". {verdict}'
+
+
+def legacy(response):
+    """Прежняя цепочка: ответ целиком падает на первой плохой домашке."""
+    statuses = legacy_check_response(response)
+    diff = [(homework_key(item), item) for item in statuses]
+    lines = [legacy_parse_status(item) for _, item in diff]
+    changes = [(key, item['status']) for key, item in diff]
+    reviewing = {
+        homework_key(item) for item in statuses
+        if item.get('status') == 'reviewing'}
+    return lines, changes, reviewing
+
+
+def compiled(validator, response):
+    """Цепочка через ResponseValidator: один проход, как process_response."""
+    batch = validator.validate(response)
+    lines, changes, reviewing = [], [], set()
+    for item in batch.homeworks:
+        status = item.status
+        if status == 'reviewing':
+            reviewing.add(item.key)
+        lines.append(
+            f'Изменился статус проверки работы "{item.name}". '
+            f'{HOMEWORK_STATUSES[status]}')
+        changes.append((item.key, status))
+    return lines, changes, reviewing
+
+
+def make_response(size):
+    """Готовит ответ API с size домашками."""
+    statuses = list(HOMEWORK_STATUSES)
+    return {
+        'homeworks': [{
+            'id': number, 'homework_name': f'hw{number}',
+            'status': statuses[number % len(statuses)],
+            'reviewer_comment': '', 'date_updated': 1,
+        } for number in range(size)],
+        'current_date': 1,
+    }
+
+
+def measure(old, new, number, rounds):
+    """
+    Замеряет обе цепочки попеременно и возвращает лучшие времена.
+
+    Чередование уравнивает для них фоновый шум машины, а минимум
+    из rounds замеров отсекает случайные паузы.
+    """
+    old_times, new_times = [], []
+    for _ in range(rounds):
+        old_times.append(timeit.timeit(old, number=number))
+        new_times.append(timeit.timeit(new, number=number))
+    return min(old_times), min(new_times)
+
+
+def main():
+    """Разбирает аргументы и печатает время на один ответ."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--homeworks', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--rounds', type=int, default=ROUNDS)
+    args = parser.parse_args()
+    validator = ResponseValidator(HOMEWORK_STATUSES)
+    for size in args.homeworks:
+        response = make_response(size)
+        assert legacy(response) == compiled(validator, response)
+        old, new = measure(
+            lambda: legacy(response),
+            lambda: compiled(validator, response),
+            args.repeat, args.rounds)
+        print(
+            f'{size:>5} домашек: прежняя {old / args.repeat * 1e6:.2f} мкс, '
+            f'validator {new / args.repeat * 1e6:.2f} мкс '
+            f'({old / new:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
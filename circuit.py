@@ -0,0 +1,97 @@
+import random
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+FAILURE_THRESHOLD = 5
+BASE_DELAY = 30
+MAX_DELAY = 1800
+JITTER = 0.2
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для запросов к одному API.
+
+    В закрытом состоянии запросы идут как обычно. После
+    failure_threshold сбоев подряд он размыкается, и запросы
+    не делаются вовсе. Через задержку пропускается один пробный
+    запрос: успех замыкает цепь, сбой размыкает ее снова
+    с удвоенной задержкой, но не дольше max_delay.
+    Колбэк on_change(old, new) вызывается при смене состояния.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD,
+                 base_delay=BASE_DELAY, max_delay=MAX_DELAY, jitter=JITTER,
+                 on_change=None, clock=time.monotonic, rng=random.random):
+        """Создает замкнутый предохранитель."""
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.on_change = on_change
+        self.clock = clock
+        self.rng = rng
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = 0
+        self.retry_at = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Сообщает, можно ли сейчас сделать запрос."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.clock() >= self.retry_at:
+                change = self._switch(HALF_OPEN)
+            elif self.state == HALF_OPEN and not self._probing:
+                change = None
+            else:
+                return False
+            self._probing = True
+        self._notify(change)
+        return True
+
+    def record_success(self):
+        """Отмечает успешный запрос."""
+        with self._lock:
+            self.failures = 0
+            self.opened = 0
+            self._probing = False
+            change = self._switch(CLOSED)
+        self._notify(change)
+
+    def record_failure(self):
+        """Отмечает сбой запроса."""
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == OPEN:
+                return
+            if self.state == CLOSED and self.failures < self.failure_threshold:
+                return
+            self.opened += 1
+            delay = self.base_delay * 2 ** (self.opened - 1)
+            delay = min(self.max_delay, delay)
+            delay *= 1 + self.jitter * (2 * self.rng() - 1)
+            self.retry_at = self.clock() + delay
+            change = self._switch(OPEN)
+        self._notify(change)
+
+    def _switch(self, state):
+        """Меняет состояние и возвращает пару (старое, новое) или None."""
+        if state == self.state:
+            return None
+        change = (self.state, state)
+        self.state = state
+        return change
+
+    def _notify(self, change):
+        """Вызывает колбэк смены состояния вне блокировки."""
+        if change is not None and self.on_change is not None:
+            self.on_change(*change)
@@ -0,0 +1,200 @@
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+LONG_POLL_TIMEOUT = 30
+ERROR_DELAY = 5
+
+HELP_MESSAGE = (
+    'Команды бота:\n'
+    '/subscribe <токен> — следить за домашками аккаунта Практикума\n'
+    '/status — последние известные статусы\n'
+    '/pause — приостановить уведомления\n'
+    '/resume — возобновить уведомления')
+NOT_SUBSCRIBED_MESSAGE = (
+    'Чат не подписан. Отправьте /subscribe <токен Практикума>.')
+NO_STATUS_MESSAGE = 'Новых статусов пока нет.'
+PAUSED_MESSAGE = 'Уведомления приостановлены, /resume их возобновит.'
+
+
+class CommandHandler:
+    """
+    Обработчик команд, которые чаты присылают боту.
+
+    Фоновый поток забирает сообщения методом getUpdates в режиме
+    long polling и отвечает через reply(chat_id, text), обычно
+    очередь доставки. /status отвечает по последнему известному
+    состоянию подписок, не обращаясь к API Практикума: из хранилища
+    store, общего для воркеров, а без него — из памяти.
+    /subscribe и /resume добавляют подписку в реестр сразу, а в
+    расписание опросов — в цикле опроса при вызове apply:
+    планировщик не потокобезопасен. Подписки, заведенные и
+    приостановленные командами, сохраняются в хранилище store,
+    а wake будит цикл опроса, чтобы он не ждал конца сна.
+    """
+
+    def __init__(self, bot, registry, reply, store=None,
+                 timeout=LONG_POLL_TIMEOUT, error_delay=ERROR_DELAY,
+                 wake=None):
+        """Создает обработчик; поток запускает start."""
+        self.bot = bot
+        self.registry = registry
+        self.reply = reply
+        self.store = store
+        self.timeout = timeout
+        self.error_delay = error_delay
+        self.offset = None
+        self.wake = wake
+        self._scheduled = deque()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._commands = {
+            '/start': self.help,
+            '/help': self.help,
+            '/status': self.status,
+            '/subscribe': self.subscribe,
+            '/pause': self.pause,
+            '/resume': self.resume,
+        }
+
+    def start(self):
+        """Запускает поток получения команд."""
+        self._thread = threading.Thread(
+            target=self._run, name='commands', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """
+        Останавливает поток.
+
+        Поток выходит после текущего запроса getUpdates, то есть
+        не позже чем через timeout секунд long polling.
+        """
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        """Цикл потока: забирает и обрабатывает обновления."""
+        while not self._stopping.is_set():
+            try:
+                self.poll_once()
+            except Exception as error:
+                logger.error('Не удалось получить команды: %s', error)
+                self._stopping.wait(self.error_delay)
+
+    def poll_once(self):
+        """Забирает одну пачку обновлений и обрабатывает ее."""
+        updates = self.bot.get_updates(
+            offset=self.offset, timeout=self.timeout)
+        for update in updates:
+            self.offset = update.update_id + 1
+            try:
+                self.handle(update)
+            except Exception:
+                logger.exception('Ошибка обработки команды')
+        return len(updates)
+
+    def handle(self, update):
+        """Выполняет команду из сообщения, прочие сообщения пропускает."""
+        message = update.effective_message
+        if message is None or not message.text:
+            return
+        command, *arguments = message.text.split()
+        command = command.split('@', 1)[0].lower()
+        action = self._commands.get(command)
+        if action is None:
+            return
+        chat_id = str(message.chat_id)
+        logger.info('Команда %s', command, extra={'chat_id': chat_id})
+        self.reply(chat_id, action(chat_id, arguments))
+
+    def help(self, chat_id, arguments):
+        """Возвращает список команд."""
+        return HELP_MESSAGE
+
+    def status(self, chat_id, arguments):
+        """Возвращает последние известные статусы подписок чата."""
+        subscriptions = self.registry.for_chat(chat_id)
+        if not subscriptions:
+            return NOT_SUBSCRIBED_MESSAGE
+        parts = []
+        for subscription in subscriptions:
+            text = self.last_message(subscription) or NO_STATUS_MESSAGE
+            if subscription.paused:
+                text = f'{text}\n{PAUSED_MESSAGE}'
+            parts.append(text)
+        return '\n\n'.join(parts)
+
+    def last_message(self, subscription):
+        """
+        Возвращает последнее сообщение подписки.
+
+        С шардированием подписку опрашивает другой воркер, и в памяти
+        этого ее состояние устаревает, поэтому при хранилище оно
+        читается оттуда.
+        """
+        if self.store is not None:
+            state, _ = self.store.load_subscription(subscription.key)
+            if state and state['last_message']:
+                return state['last_message']
+        return subscription.last_message
+
+    def subscribe(self, chat_id, arguments):
+        """Подписывает чат на домашки аккаунта с токеном из команды."""
+        if len(arguments) != 1:
+            return 'Укажите токен: /subscribe <токен Практикума>'
+        token, = arguments
+        known = {item.key for item in self.registry.for_chat(chat_id)}
+        subscription = self.registry.add(token, chat_id)
+        if subscription.key in known and not subscription.paused:
+            return 'Чат уже подписан на этот аккаунт.'
+        subscription.paused = False
+        self._save(subscription)
+        self._schedule(subscription.key)
+        return 'Подписка оформлена, статусы придут после первого опроса.'
+
+    def pause(self, chat_id, arguments):
+        """Приостанавливает подписки чата."""
+        subscriptions = self.registry.for_chat(chat_id)
+        if not subscriptions:
+            return NOT_SUBSCRIBED_MESSAGE
+        for subscription in subscriptions:
+            subscription.paused = True
+            self._save(subscription)
+        return PAUSED_MESSAGE
+
+    def resume(self, chat_id, arguments):
+        """Возобновляет подписки чата."""
+        subscriptions = self.registry.for_chat(chat_id)
+        if not subscriptions:
+            return NOT_SUBSCRIBED_MESSAGE
+        for subscription in subscriptions:
+            if subscription.paused:
+                subscription.paused = False
+                self._save(subscription)
+                self._schedule(subscription.key)
+        return 'Уведомления возобновлены.'
+
+    def _save(self, subscription):
+        """Сохраняет подписку, если есть хранилище."""
+        if self.store is not None:
+            self.store.save_registration(subscription)
+
+    def _schedule(self, key):
+        """Просит цикл опроса поставить подписку в расписание."""
+        self._scheduled.append(key)
+        if self.wake is not None:
+            self.wake()
+
+    def apply(self, scheduler):
+        """
+        Ставит в расписание подписки, заведенные командами.
+
+        Вызывается из цикла опроса; подписка опрашивается сразу.
+        """
+        while self._scheduled:
+            scheduler.postpone(self._scheduled.popleft(), 0)
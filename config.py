@@ -0,0 +1,313 @@
+import json
+import os
+import re
+import typing
+from dataclasses import dataclass, field, fields, replace
+from typing import Optional
+
+from exception import ConfigError
+
+ENV_FILE = '.env'
+CONFIG_FILE_VARIABLE = 'CONFIG_FILE'
+PRACTICUM_ENDPOINT = (
+    'https://practicum.yandex.ru/api/user_api/homework_statuses/')
+TELEGRAM_TOKEN_PATTERN = re.compile(r'\d{3,}:[\w-]+')
+TRUE_VALUES = frozenset(('1', 'true', 'yes', 'on'))
+FALSE_VALUES = frozenset(('0', 'false', 'no', 'off'))
+
+
+def setting(env, default=None, minimum=None, above=None, maximum=None,
+            choices=None, reloadable=True):
+    """
+    Описывает поле настроек.
+
+    env — имя переменной окружения, minimum и maximum — границы
+    включительно, above — граница, которую значение должно
+    превышать, choices — допустимые значения. Поле с
+    reloadable=False меняется только перезапуском воркера.
+    """
+    return field(default=default, metadata={
+        'env': env, 'minimum': minimum, 'above': above, 'maximum': maximum,
+        'choices': choices, 'reloadable': reloadable})
+
+
+@dataclass(frozen=True)
+class Config:
+    """
+    Настройки воркера.
+
+    Каждое поле читается из переменной окружения, указанной
+    в его описании, и проверяется при создании: неверные значения
+    собираются в одну ошибку ConfigError. Поля с reloadable=False
+    (токены, хранилища, размеры пулов) при перечитывании
+    настроек не меняются.
+    """
+
+    practicum_token: Optional[str] = setting(
+        'PRAKTICUM_TOKEN', reloadable=False)
+    telegram_token: Optional[str] = setting(
+        'TELEGRAM_TOKEN', reloadable=False)
+    telegram_chat_id: Optional[str] = setting(
+        'TELEGRAM_ChAT_ID', reloadable=False)
+    subscriptions_file: Optional[str] = setting(
+        'SUBSCRIPTIONS_FILE', reloadable=False)
+
+    state_backend: str = setting(
+        'STATE_BACKEND', 'sqlite', choices=('sqlite', 'file'),
+        reloadable=False)
+    state_path: str = setting('STATE_PATH', 'state.db', reloadable=False)
+    status_index_capacity: int = setting(
+        'STATUS_INDEX_CAPACITY', 100000, minimum=1, reloadable=False)
+
+    poll_mode: str = setting(
+        'POLL_MODE', 'sync', choices=('sync', 'async'), reloadable=False)
+    poll_concurrency: int = setting(
+        'POLL_CONCURRENCY', 32, minimum=1, reloadable=False)
+    poll_in_flight: Optional[int] = setting('POLL_IN_FLIGHT', minimum=1)
+    poll_timeout: float = setting('POLL_TIMEOUT', 60.0, above=0)
+    retry_time: int = setting('RETRY_TIME', 600, minimum=1)
+    reviewing_retry_time: int = setting(
+        'REVIEWING_RETRY_TIME', 150, minimum=1)
+    max_retry_time: int = setting('MAX_RETRY_TIME', 3600, minimum=1)
+    poll_jitter: float = setting('POLL_JITTER', 0.1, minimum=0, maximum=0.9)
+
+    shard_leases: Optional[str] = setting('SHARD_LEASES', reloadable=False)
+    shard_backend: str = setting(
+        'SHARD_BACKEND', 'sqlite', choices=('sqlite',), reloadable=False)
+    shard_lease_ttl: float = setting(
+        'SHARD_LEASE_TTL', 60.0, minimum=1, reloadable=False)
+    worker_id: Optional[str] = setting('WORKER_ID', reloadable=False)
+
+    commands: bool = setting('COMMANDS', True, reloadable=False)
+    commands_worker: Optional[str] = setting(
+        'COMMANDS_WORKER', reloadable=False)
+    commands_timeout: int = setting(
+        'COMMANDS_TIMEOUT', 30, minimum=0, reloadable=False)
+
+    metrics_port: Optional[int] = setting(
+        'METRICS_PORT', minimum=1, maximum=65535, reloadable=False)
+    metrics_host: str = setting(
+        'METRICS_HOST', '127.0.0.1', reloadable=False)
+    log_file: str = setting('LOG_FILE', 'main.log', reloadable=False)
+    log_rotation: str = setting(
+        'LOG_ROTATION', 'size', choices=('size', 'time'), reloadable=False)
+    log_max_bytes: int = setting(
+        'LOG_MAX_BYTES', 10 * 1024 * 1024, minimum=1, reloadable=False)
+    log_backup_count: int = setting(
+        'LOG_BACKUP_COUNT', 5, minimum=0, reloadable=False)
+    log_sample_rate: int = setting(
+        'LOG_SAMPLE_RATE', 100, minimum=1, reloadable=False)
+
+    endpoint: str = setting('PRACTICUM_ENDPOINT', PRACTICUM_ENDPOINT)
+    telegram_api_url: Optional[str] = setting(
+        'TELEGRAM_API_URL', reloadable=False)
+    pool_size: int = setting('POOL_SIZE', 10, minimum=1, reloadable=False)
+    json_decoder: str = setting(
+        'JSON_DECODER', 'auto', choices=('auto', 'orjson', 'json'))
+    stream_threshold: int = setting(
+        'STREAM_THRESHOLD', 1024 * 1024, minimum=0)
+    connect_timeout: float = setting('CONNECT_TIMEOUT', 5.0, above=0)
+    read_timeout: float = setting('READ_TIMEOUT', 30.0, above=0)
+    breaker_threshold: int = setting('BREAKER_THRESHOLD', 5, minimum=1)
+    breaker_delay: float = setting('BREAKER_DELAY', 30.0, above=0)
+    breaker_max_delay: float = setting('BREAKER_MAX_DELAY', 1800.0, above=0)
+    response_cache_ttl: float = setting(
+        'RESPONSE_CACHE_TTL', 5.0, minimum=0)
+    response_cache_bucket: int = setting(
+        'RESPONSE_CACHE_BUCKET', 60, minimum=1)
+
+    max_messages_per_tick: int = setting(
+        'MAX_MESSAGES_PER_TICK', 3, minimum=1)
+    message_memo_size: int = setting('MESSAGE_MEMO_SIZE', 4096, minimum=1)
+    delivery_workers: int = setting(
+        'DELIVERY_WORKERS', 4, minimum=1, reloadable=False)
+    telegram_global_rate: float = setting(
+        'TELEGRAM_GLOBAL_RATE', 30.0, above=0)
+    telegram_chat_rate: float = setting('TELEGRAM_CHAT_RATE', 1.0, above=0)
+    shutdown_timeout: float = setting('SHUTDOWN_TIMEOUT', 20.0, minimum=0)
+    outbox: bool = setting('OUTBOX', True, reloadable=False)
+    outbox_path: str = setting('OUTBOX_PATH', 'outbox.db', reloadable=False)
+    outbox_flush_interval: float = setting(
+        'OUTBOX_FLUSH_INTERVAL', 0.01, above=0, reloadable=False)
+
+    def __post_init__(self):
+        """Проверяет значения полей и связи между ними."""
+        errors = [
+            f'{item.metadata["env"]}: {error}'
+            for item in fields(self)
+            for error in check_value(item, getattr(self, item.name))]
+        errors.extend(self._check_relations())
+        if errors:
+            raise ConfigError('Неверные настройки: ' + '; '.join(errors))
+
+    def _check_relations(self):
+        """Возвращает ошибки в связях между полями."""
+        errors = []
+        if not (self.reviewing_retry_time <= self.retry_time
+                <= self.max_retry_time):
+            errors.append(
+                'нужно REVIEWING_RETRY_TIME <= RETRY_TIME <= MAX_RETRY_TIME')
+        if self.breaker_delay > self.breaker_max_delay:
+            errors.append('BREAKER_DELAY больше BREAKER_MAX_DELAY')
+        if self.telegram_chat_rate > self.telegram_global_rate:
+            errors.append('TELEGRAM_CHAT_RATE больше TELEGRAM_GLOBAL_RATE')
+        if (self.telegram_token is not None
+                and not TELEGRAM_TOKEN_PATTERN.fullmatch(
+                    self.telegram_token)):
+            errors.append('TELEGRAM_TOKEN не похож на токен бота')
+        if self.shard_leases and self.commands and not self.commands_worker:
+            errors.append(
+                'с SHARD_LEASES команды читает один воркер: укажите '
+                'его WORKER_ID в COMMANDS_WORKER или задайте COMMANDS=off')
+        if self.shard_leases and self.state_backend != 'sqlite':
+            errors.append(
+                'с SHARD_LEASES воркеры делят состояние, нужно '
+                'STATE_BACKEND=sqlite: файл журнала сжимается '
+                'заменой и теряет записи других процессов')
+        return errors
+
+    def reads_commands(self, worker):
+        """Проверяет, что воркер worker должен отвечать на команды."""
+        if not self.commands:
+            return False
+        return not self.shard_leases or worker == self.commands_worker
+
+    @property
+    def in_flight(self):
+        """Сколько опросов идет одновременно."""
+        return self.poll_in_flight or self.poll_concurrency
+
+    @classmethod
+    def from_mapping(cls, values):
+        """
+        Создает настройки из словаря переменная окружения -> значение.
+
+        Пустые и отсутствующие значения оставляют поле по умолчанию.
+        """
+        kwargs = {}
+        errors = []
+        for item in fields(cls):
+            env = item.metadata['env']
+            raw = values.get(env)
+            if raw is None or raw == '':
+                continue
+            try:
+                kwargs[item.name] = parse_value(item, raw)
+            except ValueError as error:
+                errors.append(f'{env}: {error}')
+        if errors:
+            raise ConfigError('Неверные настройки: ' + '; '.join(errors))
+        return cls(**kwargs)
+
+    def changed(self, other):
+        """Возвращает имена переменных, значения которых различаются."""
+        return [
+            item.metadata['env'] for item in fields(self)
+            if getattr(self, item.name) != getattr(other, item.name)]
+
+    def reload(self, new):
+        """
+        Принимает перечитанные настройки new.
+
+        Возвращает настройки, в которых поля, меняющиеся только
+        перезапуском, оставлены прежними, и имена таких полей,
+        значение которых в new отличается.
+        """
+        kept = {}
+        ignored = []
+        for item in fields(self):
+            if item.metadata['reloadable']:
+                continue
+            old = getattr(self, item.name)
+            if getattr(new, item.name) != old:
+                ignored.append(item.metadata['env'])
+            kept[item.name] = old
+        return replace(new, **kept), ignored
+
+
+def value_type(item):
+    """Возвращает тип значения поля, снимая Optional."""
+    arguments = [
+        argument for argument in typing.get_args(item.type)
+        if argument is not type(None)]
+    return arguments[0] if arguments else item.type
+
+
+def parse_value(item, raw):
+    """Приводит строку или значение из JSON к типу поля."""
+    kind = value_type(item)
+    if kind is bool:
+        if isinstance(raw, bool):
+            return raw
+        text = str(raw).strip().lower()
+        if text in TRUE_VALUES:
+            return True
+        if text in FALSE_VALUES:
+            return False
+        raise ValueError(f'ожидается on или off, получено {raw!r}')
+    if kind is int and isinstance(raw, float) and not raw.is_integer():
+        raise ValueError(f'ожидается целое число, получено {raw!r}')
+    try:
+        return kind(raw)
+    except (TypeError, ValueError):
+        raise ValueError(
+            f'ожидается {kind.__name__}, получено {raw!r}') from None
+
+
+def check_value(item, value):
+    """Отдает ошибки значения поля по его ограничениям."""
+    if value is None:
+        return
+    metadata = item.metadata
+    if metadata['choices'] and value not in metadata['choices']:
+        choices = ', '.join(metadata['choices'])
+        yield f'допустимо одно из {choices}, получено {value!r}'
+    if metadata['minimum'] is not None and value < metadata['minimum']:
+        yield f'не меньше {metadata["minimum"]}, получено {value!r}'
+    if metadata['above'] is not None and value <= metadata['above']:
+        yield f'больше {metadata["above"]}, получено {value!r}'
+    if metadata['maximum'] is not None and value > metadata['maximum']:
+        yield f'не больше {metadata["maximum"]}, получено {value!r}'
+
+
+def read_config_file(path):
+    """
+    Читает файл настроек.
+
+    Файл .json — объект с именами переменных окружения в ключах,
+    любой другой разбирается как .env.
+    """
+    try:
+        if path.endswith('.json'):
+            with open(path, encoding='utf-8') as file:
+                values = json.load(file)
+            if not isinstance(values, dict):
+                raise ValueError('ожидается объект JSON')
+            return values
+        from dotenv import dotenv_values
+
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        return dotenv_values(path)
+    except (OSError, ValueError) as error:
+        raise ConfigError(
+            f'Не удалось прочитать настройки {path}: {error}') from error
+
+
+def load_config(environ=None, env_file=ENV_FILE, path=None):
+    """
+    Собирает настройки из .env, окружения и файла настроек.
+
+    Следующий источник перекрывает предыдущий: .env, переменные
+    окружения процесса, файл path или CONFIG_FILE. Окружение
+    процесса не меняется. Окружение запущенного процесса
+    неизменно, поэтому настройки на ходу меняются через файлы.
+    """
+    values = {}
+    if env_file and os.path.exists(env_file):
+        values.update(read_config_file(env_file))
+    values.update(os.environ if environ is None else environ)
+    path = path or values.get(CONFIG_FILE_VARIABLE)
+    if path:
+        values.update(read_config_file(path))
+    return Config.from_mapping(values)
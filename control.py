@@ -0,0 +1,120 @@
+import select
+import signal
+import socket
+import time
+
+
+class LoopControl:
+    """
+    Управление циклом опроса извне: из других потоков и сигналов.
+
+    Цикл спит в sleep и просыпается раньше срока, если кто-то
+    вызвал wake. Пробуждение пишет байт в пару сокетов, а сон ждет
+    его в select: так будить можно и из обработчика сигнала, где
+    блокировки threading.Event могут повиснуть. Обработчики сигналов
+    только выставляют флаги, а работу по ним цикл делает сам:
+    SIGHUP просит перечитать настройки, SIGTERM и SIGINT —
+    остановиться. Повторный сигнал остановки завершает процесс сразу.
+    Время остановки запоминается, чтобы все этапы завершения
+    укладывались в один общий срок, см. stop_deadline.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        """Создает пару сокетов для пробуждения."""
+        self._reader, self._writer = socket.socketpair()
+        self._reader.setblocking(False)
+        self._writer.setblocking(False)
+        self.clock = clock
+        self.reload_requested = False
+        self.stop_requested = False
+        self.stopped_at = None
+
+    def fileno(self):
+        """Сокет, который становится читаемым после wake."""
+        return self._reader.fileno()
+
+    def wake(self):
+        """Будит цикл; безопасно в обработчике сигнала."""
+        try:
+            self._writer.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    def sleep(self, timeout):
+        """Спит до timeout секунд; возвращает True, если разбудили."""
+        readable, _, _ = select.select([self._reader], [], [], timeout)
+        if not readable:
+            return False
+        self.drain()
+        return True
+
+    def drain(self):
+        """Забирает накопленные пробуждения."""
+        try:
+            while self._reader.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def request_reload(self, *args):
+        """Просит цикл перечитать настройки; обработчик SIGHUP."""
+        self.reload_requested = True
+        self.wake()
+
+    def take_reload(self):
+        """Сообщает, просили ли перечитать настройки, и сбрасывает флаг."""
+        requested = self.reload_requested
+        self.reload_requested = False
+        return requested
+
+    def request_stop(self, *args):
+        """Просит цикл остановиться; обработчик SIGTERM и SIGINT."""
+        if self.stop_requested and args:
+            raise SystemExit('Остановка без ожидания очереди')
+        if self.stopped_at is None:
+            self.stopped_at = self.clock()
+        self.stop_requested = True
+        self.wake()
+
+    def stop_deadline(self, timeout):
+        """
+        Возвращает момент, к которому остановка должна закончиться.
+
+        Срок — timeout секунд от первой просьбы остановиться;
+        до нее возвращается None.
+        """
+        if self.stopped_at is None:
+            return None
+        return self.stopped_at + timeout
+
+    def remaining(self, timeout):
+        """Сколько секунд осталось до stop_deadline, до просьбы — timeout."""
+        deadline = self.stop_deadline(timeout)
+        if deadline is None:
+            return timeout
+        return max(0, deadline - self.clock())
+
+    def running(self, items):
+        """Отдает элементы items, пока цикл не просят остановиться."""
+        for item in items:
+            if self.stop_requested:
+                return
+            yield item
+
+    def install(self):
+        """
+        Ставит обработчики сигналов.
+
+        Вызывается из главного потока. SIGHUP есть не на всех
+        платформах.
+        """
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self.request_reload)
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+        return self
+
+    def close(self):
+        """Закрывает сокеты."""
+        self._reader.close()
+        self._writer.close()
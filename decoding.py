@@ -0,0 +1,165 @@
+import codecs
+import json
+import re
+
+from exception import InvalidResponseError
+from lazy import lazy_import
+
+orjson = lazy_import('orjson', optional=True)
+
+AUTO = 'auto'
+ORJSON = 'orjson'
+STDLIB = 'json'
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def get_loads(name=AUTO):
+    """
+    Возвращает функцию разбора JSON по имени декодера.
+
+    auto выбирает orjson, если он установлен, иначе модуль json.
+    """
+    if name == ORJSON or (name == AUTO and orjson is not None):
+        if orjson is None:
+            raise ValueError('Декодер orjson не установлен')
+        return orjson.loads
+    if name in (AUTO, STDLIB):
+        return json.loads
+    raise ValueError(f'Неизвестный декодер JSON: {name}')
+
+
+def decode(loads, response, **kwargs):
+    """Разбирает тело ответа requests функцией loads."""
+    return loads(response.content)
+
+
+class HomeworkStream:
+    """
+    Ответ API, домашки которого разбираются по мере чтения.
+
+    Итерация отдает элементы списка homeworks по одному, не собирая
+    весь список в памяти: в буфере держится только непрочитанный
+    хвост тела. Остальные поля ответа, например current_date,
+    попадают в fields и полностью доступны после итерации.
+    Отдельные значения разбирает сканер модуля json: orjson
+    не умеет разбирать значение с середины строки.
+    """
+
+    def __init__(self, chunks, close=None):
+        """Создает поток; chunks — итератор байтовых кусков тела."""
+        self.fields = {}
+        self.close = close or (lambda: None)
+        self._chunks = iter(chunks)
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._scan = json.JSONDecoder().raw_decode
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._started = False
+        self._found = False
+
+    def __iter__(self):
+        """Возвращает итератор по домашкам; пройти его можно один раз."""
+        if self._started:
+            raise RuntimeError('Поток домашек уже прочитан')
+        self._started = True
+        return self._homeworks()
+
+    def _homeworks(self):
+        """Разбирает объект ответа, отдавая элементы homeworks."""
+        try:
+            if self._next_char() != '{':
+                raise InvalidResponseError('Ответ API не является словарем')
+            if self._peek() == '}':
+                self._pos += 1
+            else:
+                yield from self._members()
+            if not self._found:
+                raise InvalidResponseError('В ответе API нет ключа homeworks')
+        finally:
+            self.close()
+
+    def _members(self):
+        """Разбирает пары ключ-значение объекта ответа."""
+        while True:
+            key = self._value()
+            if not isinstance(key, str) or self._next_char() != ':':
+                raise InvalidResponseError('Ответ API не является JSON')
+            if key == 'homeworks':
+                self._found = True
+                yield from self._array()
+            else:
+                self.fields[key] = self._value()
+            separator = self._next_char()
+            if separator == '}':
+                return
+            if separator != ',':
+                raise InvalidResponseError('Ответ API не является JSON')
+
+    def _array(self):
+        """Отдает элементы массива homeworks по одному."""
+        if self._next_char() != '[':
+            raise InvalidResponseError(
+                'homeworks в ответе API не является списком')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            separator = self._next_char()
+            if separator == ']':
+                return
+            if separator != ',':
+                raise InvalidResponseError('Ответ API не является JSON')
+
+    def _fill(self):
+        """Дочитывает кусок тела, отбрасывая разобранное начало буфера."""
+        if self._eof:
+            return False
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            self._buffer += self._text.decode(b'', final=True)
+        else:
+            self._buffer += self._text.decode(chunk)
+        return True
+
+    def _peek(self):
+        """Возвращает следующий непробельный символ, не забирая его."""
+        while True:
+            self._pos = WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise InvalidResponseError('Ответ API оборвался')
+
+    def _next_char(self):
+        """Забирает следующий непробельный символ."""
+        char = self._peek()
+        self._pos += 1
+        return char
+
+    def _value(self):
+        """
+        Разбирает одно значение JSON.
+
+        Значение, упершееся в конец буфера, могло быть обрезано
+        (например, число), поэтому буфер дочитывается и значение
+        разбирается заново.
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self._scan(self._buffer, self._pos)
+            except json.JSONDecodeError as error:
+                if self._fill():
+                    continue
+                raise InvalidResponseError(
+                    f'Ответ API не является JSON: {error}')
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
@@ -0,0 +1,359 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from functools import partial
+
+from metrics import SEND_RETRIES
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = 30
+CHAT_RATE = 1
+WORKERS = 4
+MAX_ATTEMPTS = 3
+MESSAGE_LIMIT = 4096
+
+
+class TokenBucket:
+    """
+    Ведро токенов для ограничения частоты запросов.
+
+    Пополняется со скоростью rate токенов в секунду, но не выше
+    capacity. Методы вызываются под блокировкой очереди.
+    """
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic):
+        """Создает полное ведро."""
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.updated = clock()
+        self.blocked_until = 0
+
+    def _refill(self, now):
+        """Добавляет токены, накопившиеся с прошлого обращения."""
+        elapsed = max(0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def delay(self, now=None):
+        """Возвращает, сколько секунд ждать до появления токена."""
+        now = self.clock() if now is None else now
+        self._refill(now)
+        wait = max(0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def consume(self, now=None):
+        """Забирает токен, если он есть, и сообщает об успехе."""
+        now = self.clock() if now is None else now
+        if self.delay(now) > 0:
+            return False
+        self.tokens -= 1
+        return True
+
+    def pause(self, seconds, now=None):
+        """Запрещает выдачу токенов на seconds секунд."""
+        now = self.clock() if now is None else now
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+    def full(self, now=None):
+        """Проверяет, что ведро полное и его можно забыть."""
+        now = self.clock() if now is None else now
+        return self.delay(now) == 0 and self.tokens >= self.capacity
+
+
+class Envelope:
+    """
+    Сообщение в очереди и колбэк, вызываемый после доставки.
+
+    message_id — номер записи в журнале сообщений, если он есть.
+    """
+
+    __slots__ = ('text', 'on_sent', 'attempts', 'message_id')
+
+    def __init__(self, text, on_sent=None, message_id=None):
+        """Запоминает текст и колбэк."""
+        self.text = text
+        self.on_sent = on_sent
+        self.attempts = 0
+        self.message_id = message_id
+
+
+class DeliveryQueue:
+    """
+    Очередь исходящих сообщений Telegram.
+
+    Сообщения отправляют рабочие потоки, поэтому задержки Telegram
+    не тормозят опрос API. Частота ограничена ведрами токенов:
+    общим на бота и отдельным на каждый чат. Ожидающие сообщения
+    одного чата склеиваются в одно, пока оно не длиннее limit.
+    На ошибку с retry_after чат ставится на паузу, прочие ошибки
+    повторяются с задержкой не более max_attempts раз.
+
+    С журналом outbox (outbox.Outbox) сообщение попадает в очередь
+    только после записи на диск и отмечается в журнале после
+    доставки. Недоставленные сообщения журнала, в том числе
+    отброшенные после max_attempts попыток, start ставит в очередь
+    снова.
+    """
+
+    def __init__(self, send, workers=WORKERS, global_rate=GLOBAL_RATE,
+                 chat_rate=CHAT_RATE, limit=MESSAGE_LIMIT,
+                 max_attempts=MAX_ATTEMPTS, clock=time.monotonic,
+                 outbox=None):
+        """Создает очередь; send(chat_id, text) отправляет сообщение."""
+        self.send = send
+        self.outbox = outbox
+        self.workers = workers
+        self.chat_rate = chat_rate
+        self.limit = limit
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._global = TokenBucket(global_rate, global_rate, clock)
+        self._buckets = {}
+        self._pending = {}
+        self._ready = []
+        self._in_flight = set()
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._threads = []
+        self._stopping = False
+
+    def __len__(self):
+        """Возвращает число сообщений, ожидающих отправки."""
+        with self._condition:
+            return sum(len(items) for items in self._pending.values())
+
+    def pending(self, chat_id):
+        """Проверяет, есть ли у чата недоставленные сообщения."""
+        with self._condition:
+            return chat_id in self._pending or chat_id in self._in_flight
+
+    def start(self):
+        """Ставит в очередь недоставленное из журнала и запускает потоки."""
+        if self.outbox is not None:
+            pending = self.outbox.pending()
+            for message_id, chat_id, text in pending:
+                self._enqueue(chat_id, text, None, message_id)
+            if pending:
+                logger.info(
+                    'Повторная отправка из журнала: %s', len(pending))
+        for number in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f'delivery-{number}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def adopt(self, live):
+        """
+        Ставит в очередь сообщения журнала, брошенные ушедшими воркерами.
+
+        live — имена живых воркеров. Возвращает число сообщений.
+        """
+        if self.outbox is None:
+            return 0
+        rows = self.outbox.adopt(live)
+        for message_id, chat_id, text in rows:
+            self._enqueue(chat_id, text, None, message_id)
+        if rows:
+            logger.info('Забраны сообщения ушедших воркеров: %s', len(rows))
+        return len(rows)
+
+    def put(self, chat_id, text, on_sent=None, key=None):
+        """
+        Ставит сообщение в очередь чата.
+
+        С журналом key — ключ идемпотентности: сообщение, которое
+        уже есть в журнале, второй раз не отправляется, а on_sent
+        вызывается сразу.
+        """
+        if self.outbox is None:
+            self._enqueue(chat_id, text, on_sent)
+            return
+        self.outbox.append(
+            chat_id, text, key, partial(self._committed, chat_id, text,
+                                        on_sent))
+
+    def _committed(self, chat_id, text, on_sent, message_id):
+        """Ставит в очередь сообщение, записанное в журнал."""
+        if message_id is not None:
+            self._enqueue(chat_id, text, on_sent, message_id)
+        elif on_sent is not None:
+            on_sent()
+
+    def _enqueue(self, chat_id, text, on_sent=None, message_id=None):
+        """Добавляет сообщение в очередь чата и будит рабочий поток."""
+        with self._condition:
+            items = self._pending.get(chat_id)
+            if items is None:
+                items = self._pending[chat_id] = deque()
+            items.append(Envelope(text, on_sent, message_id))
+            if len(items) == 1 and chat_id not in self._in_flight:
+                self._schedule(chat_id, self.clock())
+            self._condition.notify()
+
+    def join(self, timeout=None):
+        """Ждет, пока очередь опустеет; возвращает True, если успела."""
+        if self.outbox is not None:
+            self.outbox.flush()
+        deadline = None if timeout is None else self.clock() + timeout
+        with self._condition:
+            while self._pending or self._in_flight:
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self, timeout=None):
+        """
+        Дожидается отправки очереди и останавливает потоки.
+
+        timeout ограничивает ожидание целиком. Возвращает True,
+        если очередь успела опустеть.
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        drained = self.join(timeout)
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            remaining = None
+            if deadline is not None:
+                remaining = max(0, deadline - self.clock())
+            thread.join(remaining)
+        if self.outbox is not None:
+            self.outbox.close()
+        return drained
+
+    def set_rates(self, global_rate, chat_rate):
+        """
+        Меняет лимиты отправки на ходу.
+
+        Очередь и паузы чатов сохраняются, новые лимиты действуют
+        со следующей отправки.
+        """
+        with self._condition:
+            self._global.rate = global_rate
+            self._global.capacity = global_rate
+            self._global.tokens = min(self._global.tokens, global_rate)
+            self.chat_rate = chat_rate
+            for bucket in self._buckets.values():
+                bucket.rate = chat_rate
+            self._condition.notify_all()
+
+    def _bucket(self, chat_id):
+        """Возвращает ведро токенов чата."""
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(
+                self.chat_rate, 1, self.clock)
+        return bucket
+
+    def _schedule(self, chat_id, now):
+        """Ставит чат в кучу готовности по времени его следующего токена."""
+        ready_at = now + self._bucket(chat_id).delay(now)
+        heapq.heappush(self._ready, (ready_at, next(self._sequence), chat_id))
+
+    def _take(self):
+        """Ждет готовый чат и забирает склеенную пачку его сообщений."""
+        with self._condition:
+            while not self._stopping:
+                now = self.clock()
+                if not self._ready:
+                    self._condition.wait()
+                    continue
+                ready_at, _, chat_id = self._ready[0]
+                wait = max(ready_at - now, self._global.delay(now))
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+                heapq.heappop(self._ready)
+                if not self._bucket(chat_id).consume(now):
+                    self._schedule(chat_id, now)
+                    continue
+                self._global.consume(now)
+                self._in_flight.add(chat_id)
+                return chat_id, self._coalesce(chat_id)
+        return None, None
+
+    def _coalesce(self, chat_id):
+        """Склеивает ожидающие сообщения чата в пачку не длиннее limit."""
+        items = self._pending[chat_id]
+        batch = [items.popleft()]
+        size = len(batch[0].text)
+        while items and size + 1 + len(items[0].text) <= self.limit:
+            size += 1 + len(items[0].text)
+            batch.append(items.popleft())
+        if not items:
+            del self._pending[chat_id]
+        return batch
+
+    def _work(self):
+        """Цикл рабочего потока."""
+        while True:
+            chat_id, batch = self._take()
+            if chat_id is None:
+                return
+            delay = self._deliver(chat_id, batch)
+            self._finish(chat_id, batch, delay)
+
+    def _deliver(self, chat_id, batch):
+        """
+        Отправляет пачку.
+
+        Возвращает None при успехе или задержку перед повтором.
+        """
+        try:
+            self.send(chat_id, '\n'.join(item.text for item in batch))
+        except Exception as error:
+            cause = error.__cause__ or error
+            retry_after = getattr(cause, 'retry_after', None)
+            if retry_after is not None:
+                SEND_RETRIES.inc(1, 'retry_after')
+                logger.warning(
+                    'Telegram просит подождать %s с для чата %s',
+                    retry_after, chat_id)
+                return float(retry_after)
+            batch[0].attempts += 1
+            SEND_RETRIES.inc(1, 'error')
+            logger.error('Сообщение не доставлено: %s', error)
+            return 2 ** batch[0].attempts
+        for item in batch:
+            if item.message_id is not None:
+                self.outbox.mark_sent(item.message_id)
+            if item.on_sent is not None:
+                try:
+                    item.on_sent()
+                except Exception:
+                    logger.exception('Ошибка после доставки сообщения')
+        return None
+
+    def _finish(self, chat_id, batch, delay):
+        """Возвращает чат в очередь и при ошибке — недоставленную пачку."""
+        with self._condition:
+            now = self.clock()
+            self._in_flight.discard(chat_id)
+            if delay is not None:
+                if batch[0].attempts >= self.max_attempts:
+                    logger.error(
+                        'Сообщения для чата %s отброшены после %s попыток',
+                        chat_id, batch[0].attempts)
+                else:
+                    self._bucket(chat_id).pause(delay, now)
+                    items = self._pending.setdefault(chat_id, deque())
+                    items.extendleft(reversed(batch))
+            if chat_id in self._pending:
+                self._schedule(chat_id, now)
+            elif self._bucket(chat_id).full(now):
+                del self._buckets[chat_id]
+            self._condition.notify_all()
@@ -14,3 +14,41 @@ class WrongStatusCodeError(Exception):
     """Классы ошибок."""
 
     pass
+
+
+class ServerError(NonStatusCodeError):
+    """API недоступен: ответ 5xx или 429."""
+
+    pass
+
+
+class CircuitOpenError(Exception):
+    """Предохранитель API разомкнут, запрос не делался."""
+
+    pass
+
+
+class InvalidResponseError(TypeError):
+    """Ответ API не соответствует ожидаемой схеме."""
+
+    pass
+
+
+class InvalidHomeworkError(KeyError):
+    """Домашка в ответе API не соответствует ожидаемой схеме."""
+
+    def __str__(self):
+        """Возвращает сообщение без кавычек KeyError."""
+        return str(self.args[0]) if self.args else ''
+
+
+class PollTimeoutError(Exception):
+    """Опрос подписки не уложился в отведенное время."""
+
+    pass
+
+
+class ConfigError(ValueError):
+    """Настройки воркера заданы неверно."""
+
+    pass
@@ -0,0 +1,364 @@
+"""
+Поддельные API Практикума и Telegram Bot API для нагрузочных тестов.
+
+Сервер написан на asyncio и держит keep-alive соединения.
+Его можно поднять внутри процесса (FakeServer.start_in_thread)
+или отдельно:
+
+    python fake_server.py --port 8080 --latency 0.05 --error-rate 0.01
+
+Бот направляется на него переменными окружения
+PRACTICUM_ENDPOINT=http://127.0.0.1:8080/api/user_api/homework_statuses/
+и TELEGRAM_API_URL=http://127.0.0.1:8080/bot.
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import zlib
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+HOMEWORKS_PATH = '/api/user_api/homework_statuses/'
+STATUSES = ('approved', 'reviewing', 'rejected')
+
+
+class Script:
+    """
+    Сценарий смены статусов одной домашки.
+
+    Статус меняется на следующий из statuses каждые step опросов,
+    на последнем сценарий останавливается.
+    """
+
+    def __init__(self, statuses, step=1, name='homework_bot', homework_id=1):
+        """Создает сценарий."""
+        self.statuses = list(statuses)
+        self.step = step
+        self.name = name
+        self.homework_id = homework_id
+        self.polls = 0
+        self.status = None
+        self.date_updated = 0
+
+    def advance(self, now):
+        """Учитывает опрос и возвращает текущую домашку."""
+        position = min(self.polls // self.step, len(self.statuses) - 1)
+        self.polls += 1
+        if self.statuses[position] != self.status:
+            self.status = self.statuses[position]
+            self.date_updated = now
+        return {
+            'id': self.homework_id,
+            'homework_name': self.name,
+            'status': self.status,
+            'reviewer_comment': '',
+            'date_updated': self.date_updated,
+        }
+
+
+class FakeServer:
+    """
+    Поддельные API Практикума и Telegram Bot API.
+
+    GET HOMEWORKS_PATH отвечает домашками токена из scripts, а для
+    незнакомого токена — одной домашкой с постоянным статусом.
+    Домашки, не менявшиеся после from_date, в ответ не попадают,
+    как в настоящем API. POST /bot<token>/sendMessage запоминает
+    сообщение, а при превышении flood_limit сообщений в секунду
+    на чат отвечает 429 с retry_after. getUpdates отдает сообщения,
+    добавленные push_message, и держит long polling до timeout
+    секунд, пока их нет. Каждый ответ задерживается на latency
+    секунд, а доля error_rate запросов получает 500.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0,
+                 error_rate=0.0, flood_limit=None, retry_after=1,
+                 scripts=None, seed=None):
+        """Настраивает сервер, но не запускает его."""
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.flood_limit = flood_limit
+        self.retry_after = retry_after
+        self.scripts = dict(scripts or {})
+        self.random = random.Random(seed)
+        self.sent = []
+        self.updates = []
+        self.requests = 0
+        self.connections = 0
+        self._chat_sends = {}
+        self._update_id = 0
+        self._new_update = None
+        self._connections = set()
+        self._server = None
+        self._loop = None
+        self._thread = None
+
+    @property
+    def url(self):
+        """Базовый адрес сервера."""
+        return f'http://{self.host}:{self.port}'
+
+    @property
+    def endpoint(self):
+        """Адрес поддельного API Практикума."""
+        return self.url + HOMEWORKS_PATH
+
+    @property
+    def telegram_url(self):
+        """Базовый адрес поддельного Bot API для telegram.Bot."""
+        return self.url + '/bot'
+
+    async def start(self):
+        """Запускает сервер в текущем цикле событий."""
+        self._new_update = asyncio.Event()
+        self._server = await asyncio.start_server(
+            self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        """Останавливает сервер и закрывает открытые соединения."""
+        self._server.close()
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+
+    def start_in_thread(self):
+        """Запускает сервер в фоновом потоке со своим циклом событий."""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self.stop())
+            self._loop.close()
+
+        self._thread = threading.Thread(
+            target=run, name='fake-server', daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def close(self):
+        """Останавливает сервер, запущенный в потоке."""
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def push_message(self, chat_id, text):
+        """
+        Добавляет входящее сообщение чата для getUpdates.
+
+        Можно вызывать из любого потока.
+        """
+        self._update_id += 1
+        self.updates.append({
+            'update_id': self._update_id,
+            'message': {
+                'message_id': self._update_id, 'date': int(time.time()),
+                'chat': {'id': int(chat_id), 'type': 'private'},
+                'from': {'id': int(chat_id), 'is_bot': False,
+                         'first_name': 'student'},
+                'text': text}})
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._new_update.set)
+        elif self._new_update is not None:
+            self._new_update.set()
+
+    def __enter__(self):
+        """Запускает сервер в потоке."""
+        return self.start_in_thread()
+
+    def __exit__(self, *exc_info):
+        """Останавливает сервер."""
+        self.close()
+
+    async def _serve(self, reader, writer):
+        """Обслуживает keep-alive соединение."""
+        self.connections += 1
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                self.requests += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                status, data = await self._route(
+                    method, target, headers, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self._write_response(writer, status, data, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError,
+                asyncio.CancelledError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader):
+        """Читает запрос: метод, путь, заголовки и тело."""
+        line = await reader.readline()
+        if not line:
+            return None
+        method, target, _ = line.decode('latin-1').split(' ', 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0))
+        body = await reader.readexactly(length) if length else b''
+        return method, target, headers, body
+
+    @staticmethod
+    def _write_response(writer, status, data, keep_alive):
+        """Пишет JSON-ответ."""
+        body = json.dumps(data, ensure_ascii=False).encode()
+        connection = 'keep-alive' if keep_alive else 'close'
+        head = (
+            f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+            'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: {connection}\r\n\r\n')
+        writer.write(head.encode('latin-1') + body)
+
+    async def _route(self, method, target, headers, body):
+        """Выбирает обработчик по методу и пути."""
+        if self.error_rate and self.random.random() < self.error_rate:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': 'fake error'}
+        url = urlsplit(target)
+        if method == 'GET' and url.path == HOMEWORKS_PATH:
+            return self._homeworks(headers, parse_qs(url.query))
+        if method == 'POST' and url.path.startswith('/bot'):
+            api_method = url.path.rsplit('/', 1)[-1]
+            return await self._telegram(api_method, headers, body)
+        return HTTPStatus.NOT_FOUND, {'error': 'not found'}
+
+    def _homeworks(self, headers, query):
+        """Отвечает как API статусов домашек."""
+        authorization = headers.get('authorization', '')
+        if not authorization.startswith('OAuth '):
+            return HTTPStatus.UNAUTHORIZED, {'code': 'not_authenticated'}
+        token = authorization[len('OAuth '):]
+        try:
+            from_date = int(float(query.get('from_date', ['0'])[0]))
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, {'code': 'UnknownError'}
+        now = int(time.time())
+        script = self.scripts.get(token)
+        if script is None:
+            status = STATUSES[zlib.crc32(token.encode()) % len(STATUSES)]
+            script = self.scripts[token] = Script([status])
+        homework = script.advance(now)
+        homeworks = [homework] if homework['date_updated'] >= from_date else []
+        return HTTPStatus.OK, {'homeworks': homeworks, 'current_date': now}
+
+    async def _telegram(self, api_method, headers, body):
+        """Отвечает как Telegram Bot API."""
+        if headers.get('content-type', '').startswith('application/json'):
+            data = json.loads(body or b'{}')
+        else:
+            data = {
+                key: values[0]
+                for key, values in parse_qs(body.decode()).items()}
+        if api_method == 'getMe':
+            return HTTPStatus.OK, {'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'fake',
+                'username': 'fake_bot'}}
+        if api_method == 'sendMessage':
+            return self._send_message(data)
+        if api_method == 'getUpdates':
+            return await self._get_updates(data)
+        return HTTPStatus.NOT_FOUND, {
+            'ok': False, 'error_code': 404, 'description': 'Not Found'}
+
+    def _send_message(self, data):
+        """Запоминает сообщение или отвечает 429 при флуде."""
+        chat_id = int(data.get('chat_id', 0))
+        now = time.monotonic()
+        if self.flood_limit:
+            recent = [
+                moment for moment in self._chat_sends.get(chat_id, [])
+                if moment > now - 1]
+            if len(recent) >= self.flood_limit:
+                return HTTPStatus.TOO_MANY_REQUESTS, {
+                    'ok': False, 'error_code': 429,
+                    'description': 'Too Many Requests: retry after '
+                                   f'{self.retry_after}',
+                    'parameters': {'retry_after': self.retry_after}}
+            recent.append(now)
+            self._chat_sends[chat_id] = recent
+        self.sent.append((chat_id, data.get('text', '')))
+        return HTTPStatus.OK, {'ok': True, 'result': {
+            'message_id': len(self.sent), 'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'text': data.get('text', '')}}
+
+    async def _get_updates(self, data):
+        """
+        Отдает обновления начиная с offset.
+
+        Как в Bot API, запрос с offset подтверждает и забывает
+        обновления с меньшими номерами.
+        """
+        offset = int(data.get('offset') or 0)
+        deadline = time.monotonic() + float(data.get('timeout') or 0)
+        self.updates[:] = [
+            update for update in self.updates
+            if update['update_id'] >= offset]
+        while not self.updates:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._new_update.clear()
+            try:
+                await asyncio.wait_for(self._new_update.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return HTTPStatus.OK, {'ok': True, 'result': list(self.updates)}
+
+
+def main():
+    """Запускает сервер отдельным процессом."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--flood-limit', type=int, default=None)
+    parser.add_argument('--retry-after', type=int, default=1)
+    args = parser.parse_args()
+    server = FakeServer(
+        args.host, args.port, args.latency, args.error_rate,
+        args.flood_limit, args.retry_after)
+
+    async def serve():
+        await server.start()
+        print(f'Практикум: {server.endpoint}')
+        print(f'Telegram: {server.telegram_url}')
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+import time
+from concurrent import futures
+
+from exception import PollTimeoutError
+
+WORKERS = 32
+TIMEOUT = 60
+DEADLINE_CHECK = 0.5
+
+
+class Task:
+    """Вызов в пуле: элемент, его future и момент начала работы."""
+
+    __slots__ = ('item', 'future', 'started')
+
+    def __init__(self, item):
+        """Создает еще не запущенную задачу."""
+        self.item = item
+        self.future = None
+        self.started = None
+
+
+class ConcurrentFetcher:
+    """
+    Параллельные вызовы для многих подписок в общем пуле потоков.
+
+    Одновременно выполняется не больше max_in_flight вызовов,
+    результаты отдаются по мере готовности, так что такт опроса
+    длится примерно как самый медленный запрос, а не как их сумма.
+    Вызов, который работает дольше timeout секунд, считается
+    ошибкой PollTimeoutError. Прервать поток нельзя, поэтому такой
+    вызов доживает в пуле, а новый вызов для того же элемента
+    (по ключу key) не запускается, пока он не закончится.
+    """
+
+    def __init__(self, workers=WORKERS, max_in_flight=None, timeout=TIMEOUT,
+                 key=id, clock=time.monotonic):
+        """Создает пул из workers потоков."""
+        self.executor = futures.ThreadPoolExecutor(
+            workers, thread_name_prefix='poll')
+        self.max_in_flight = max_in_flight or workers
+        self.timeout = timeout
+        self.key = key
+        self.clock = clock
+        self._abandoned = {}
+
+    def map(self, function, items, deadline=None):
+        """
+        Вызывает function(item) для каждого элемента items.
+
+        Отдает тройки (элемент, результат, ошибка) по мере
+        готовности; при ошибке результат равен None. deadline() —
+        момент по часам clock, после которого незаконченные вызовы
+        бросаются с PollTimeoutError, а новые не начинаются, или None,
+        пока срока нет; он проверяется не реже раза в DEADLINE_CHECK
+        секунд.
+        """
+        items = iter(items)
+        tasks = {}
+        exhausted = False
+        while True:
+            while not exhausted and len(tasks) < self.max_in_flight:
+                item = next(items, None)
+                if item is None:
+                    exhausted = True
+                    break
+                if self._busy(item):
+                    yield item, None, PollTimeoutError(
+                        'Предыдущий опрос еще не закончился')
+                    continue
+                task = Task(item)
+                task.future = self.executor.submit(self._run, task, function)
+                tasks[task.future] = task
+            if not tasks:
+                return
+            limit = None if deadline is None else deadline()
+            done, _ = futures.wait(
+                tasks, self._wait_timeout(
+                    tasks.values(), limit, deadline is not None),
+                futures.FIRST_COMPLETED)
+            for future in done:
+                task = tasks.pop(future)
+                error = future.exception()
+                yield task.item, None if error else future.result(), error
+            if limit is not None and self.clock() >= limit:
+                for task in tasks.values():
+                    yield task.item, None, PollTimeoutError(
+                        'Опрос прерван остановкой воркера')
+                return
+            for task in self._expired(tasks):
+                del tasks[task.future]
+                self._abandoned[self.key(task.item)] = task.future
+                yield task.item, None, PollTimeoutError(
+                    f'Опрос не уложился в {self.timeout} с')
+
+    def close(self, wait=True):
+        """Останавливает пул потоков."""
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, task, function):
+        """Отмечает начало работы задачи и вызывает функцию."""
+        task.started = self.clock()
+        return function(task.item)
+
+    def _busy(self, item):
+        """Проверяет, что брошенный по таймауту вызов элемента еще идет."""
+        future = self._abandoned.get(self.key(item))
+        if future is None:
+            return False
+        if future.done():
+            del self._abandoned[self.key(item)]
+            return False
+        return True
+
+    def _wait_timeout(self, tasks, limit=None, watch=False):
+        """
+        Возвращает, сколько ждать до ближайшего таймаута задачи.
+
+        Ожидание не дольше срока limit, а при watch без срока —
+        не дольше DEADLINE_CHECK, чтобы заметить его появление.
+        """
+        now = self.clock()
+        waits = []
+        if self.timeout is not None:
+            waits.append(max(0, min((
+                task.started + self.timeout - now
+                for task in tasks if task.started is not None),
+                default=self.timeout)))
+        if limit is not None:
+            waits.append(max(0, limit - now))
+        elif watch:
+            waits.append(DEADLINE_CHECK)
+        return min(waits, default=None)
+
+    def _expired(self, tasks):
+        """Возвращает запущенные задачи, которые вышли за таймаут."""
+        if self.timeout is None:
+            return []
+        now = self.clock()
+        return [
+            task for task in tasks.values()
+            if task.started is not None
+            and now - task.started >= self.timeout
+            and not task.future.done()]
@@ -1,31 +1,62 @@
 import logging
-import os
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from operator import attrgetter
 from http import HTTPStatus
-from typing import Dict
-
-import requests
-import telegram
-from dotenv import load_dotenv
+from time import perf_counter
 
+from api_client import PracticumClient, is_server_error
+from circuit import CLOSED, OPEN, CircuitBreaker
+from commands import CommandHandler
+from config import Config, load_config
+from control import LoopControl
+from decoding import CHUNK_SIZE, HomeworkStream, get_loads
+from delivery import DeliveryQueue
 from exception import (
-    NotSendMessageError, NonStatusCodeError, WrongStatusCodeError)
+    CircuitOpenError, ConfigError, NotSendMessageError, NonStatusCodeError,
+    PollTimeoutError, ServerError, WrongStatusCodeError)
+from fetcher import ConcurrentFetcher
+from lazy import LazyObject, lazy_import
+from log_setup import setup_logging
+from metrics import (
+    API_ERRORS, API_LATENCY, API_RESPONSES, PARSE_LATENCY, REGISTRY,
+    SEND_FAILURES, SEND_LATENCY, VALIDATION_FAILURES, start_http_server,
+    timed)
+from outbox import Outbox, outbox_key
+from response_cache import ResponseCache
+from scheduler import CHANGED, ERROR, IDLE, PollScheduler
+from sharding import ShardCoordinator, open_leases
+from status_index import StatusIndex, restore_index
+from storage import open_store, restore_registry
+from subscriptions import SubscriptionRegistry, load_subscriptions, make_key
+from templates import TemplateCatalog
+from validation import Batch, ResponseValidator
 
-logger = logging.getLogger(__name__)
-logger.addHandler(logging.StreamHandler())
-logger.info('Начинаем работать')
+asyncio = lazy_import('asyncio')
+requests = lazy_import('requests')
+telegram = lazy_import('telegram')
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
+# До вызова configure действуют настройки по умолчанию: импорт
+# модуля не читает окружение. Токены остаются переменными модуля,
+# их проверяет check_tokens.
+CONFIG = Config()
+PRACTICUM_TOKEN = CONFIG.practicum_token
+TELEGRAM_TOKEN = CONFIG.telegram_token
+TELEGRAM_CHAT_ID = CONFIG.telegram_chat_id
 
-PRACTICUM_TOKEN = os.getenv('PRAKTICUM_TOKEN')
-TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
-TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_ChAT_ID')
+SCHEDULER_TICK = 1
+OUTAGE_MESSAGE = (
+    'API Практикума недоступен. Статусы проверим, как только он вернется.')
+RECOVERY_MESSAGE = 'API Практикума снова доступен.'
+OUTAGE_ERRORS = (
+    CircuitOpenError, ServerError, WrongStatusCodeError, PollTimeoutError)
+MESSAGE_LIMIT = 4096
 
-RETRY_TIME = 600
-ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
-HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+_client = None
 
 
 HOMEWORK_STATUSES = {
@@ -33,6 +64,95 @@ HOMEWORK_STATUSES = {
     'reviewing': 'Работа взята на проверку ревьюером.',
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
+VALIDATOR = ResponseValidator(HOMEWORK_STATUSES)
+MESSAGE_TEMPLATES = TemplateCatalog(
+    HOMEWORK_STATUSES, memo_size=CONFIG.message_memo_size)
+RESPONSES = ResponseCache(
+    CONFIG.response_cache_ttl, CONFIG.response_cache_bucket)
+
+
+def configure(config):
+    """
+    Делает config текущими настройками модуля.
+
+    Функции модуля читают CONFIG при каждом вызове; уже созданные
+    объекты настраивает apply_config.
+    """
+    global CONFIG, PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID
+    global MESSAGE_TEMPLATES
+    if config.message_memo_size != MESSAGE_TEMPLATES.memo_size:
+        MESSAGE_TEMPLATES = TemplateCatalog(
+            HOMEWORK_STATUSES, memo_size=config.message_memo_size)
+    RESPONSES.ttl = config.response_cache_ttl
+    RESPONSES.bucket = config.response_cache_bucket
+    CONFIG = config
+    PRACTICUM_TOKEN = config.practicum_token
+    TELEGRAM_TOKEN = config.telegram_token
+    TELEGRAM_CHAT_ID = config.telegram_chat_id
+
+
+def apply_config(config, scheduler=None, queue=None, fetcher=None):
+    """
+    Применяет настройки к модулю и к работающим объектам.
+
+    Клиент API сохраняет сессию с пулом соединений, а планировщик,
+    очередь и пул опроса — свое состояние: меняются только их
+    параметры, новые значения действуют со следующего опроса
+    или отправки.
+    """
+    configure(config)
+    if _client is not None:
+        configure_client(_client, config)
+    if scheduler is not None:
+        scheduler.base_interval = config.retry_time
+        scheduler.reviewing_interval = config.reviewing_retry_time
+        scheduler.max_interval = config.max_retry_time
+        scheduler.jitter = config.poll_jitter
+    if queue is not None:
+        queue.set_rates(
+            config.telegram_global_rate, config.telegram_chat_rate)
+    if fetcher is not None:
+        fetcher.max_in_flight = config.in_flight
+        fetcher.timeout = config.poll_timeout
+
+
+def reload_config(scheduler=None, queue=None, fetcher=None):
+    """
+    Перечитывает настройки, например по SIGHUP, и применяет их.
+
+    Опросы в полете и пул соединений не прерываются. Поля, которые
+    меняются только перезапуском, остаются прежними, а неверные
+    настройки не применяются вовсе: воркер работает со старыми.
+    """
+    try:
+        new = load_config()
+    except ConfigError as error:
+        logger.error('Настройки не перечитаны: %s', error)
+        return False
+    config, ignored = CONFIG.reload(new)
+    if ignored:
+        logger.warning(
+            'Без перезапуска не меняются: %s', ', '.join(ignored))
+    changed = CONFIG.changed(config)
+    apply_config(config, scheduler, queue, fetcher)
+    logger.info(
+        'Настройки перечитаны, изменены: %s', ', '.join(changed) or 'нет')
+    return True
+
+
+def make_bot():
+    """
+    Создает бота Telegram.
+
+    TELEGRAM_API_URL позволяет направить бота на другой сервер
+    Bot API, например на поддельный из fake_server.py. Пул
+    соединений рассчитан на все потоки доставки и поток команд.
+    """
+    from telegram.utils.request import Request
+
+    return telegram.Bot(
+        token=TELEGRAM_TOKEN, base_url=CONFIG.telegram_api_url,
+        request=Request(con_pool_size=CONFIG.delivery_workers + 2))
 
 
 def send_message(bot, message):
@@ -43,12 +163,119 @@ def send_message(bot, message):
     Принимает на вход два параметра: экземпляр класса Bot
     и строку с текстом сообщения.
     """
+    send_message_to(bot, TELEGRAM_CHAT_ID, message)
+
+
+@timed(SEND_LATENCY, SEND_FAILURES)
+def send_message_to(bot, chat_id, message):
+    """
+    Отправляет сообщение в Telegram чат подписки.
+
+    Принимает экземпляр класса Bot, идентификатор чата
+    и строку с текстом сообщения.
+    """
     try:
-        logger.info('Начала отправки сообщения')
-        bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
-        logger.info('сообщение отправлено')
+        logger.info('Начала отправки сообщения', extra={'chat_id': chat_id})
+        bot.send_message(chat_id=chat_id, text=message)
+        logger.info('сообщение отправлено', extra={'chat_id': chat_id})
     except Exception as error:
-        raise NotSendMessageError(f'Бот не отправил сообщение {error}')
+        raise NotSendMessageError(
+            f'Бот не отправил сообщение {error}') from error
+
+
+def send_messages_to(bot, chat_id, lines):
+    """
+    Отправляет пакет строк в чат подписки.
+
+    Строки упаковываются не более чем в MAX_MESSAGES_PER_TICK
+    сообщений, поэтому число вызовов API Telegram за тик
+    не зависит от числа проверенных работ.
+    """
+    for text in pack_messages(lines):
+        send_message_to(bot, chat_id, text)
+
+
+def pack_messages(lines, limit=MESSAGE_LIMIT, max_messages=None):
+    """
+    Упаковывает строки в ограниченное число сообщений Telegram.
+
+    Строки склеиваются через перевод строки, пока сообщение
+    не длиннее limit символов. Если сообщений получается больше
+    max_messages, лишние строки отбрасываются, а в конце последнего
+    сообщения указывается их число. По умолчанию max_messages
+    берется из настроек.
+    """
+    if max_messages is None:
+        max_messages = CONFIG.max_messages_per_tick
+    chunks = []
+    for line in lines:
+        line = line[:limit]
+        if chunks and len(chunks[-1][0]) + len(line) < limit:
+            text, count = chunks[-1]
+            chunks[-1] = (f'{text}\n{line}', count + 1)
+        else:
+            chunks.append((line, 1))
+    if len(chunks) <= max_messages:
+        return [text for text, _ in chunks]
+    dropped = sum(count for _, count in chunks[max_messages:])
+    note = f'\nИ еще изменений: {dropped}'
+    messages = [text for text, _ in chunks[:max_messages]]
+    messages[-1] = messages[-1][:limit - len(note)] + note
+    return messages
+
+
+def get_client():
+    """Возвращает общий для всех подписок клиент API Практикума."""
+    global _client
+    if _client is None:
+        config = CONFIG
+        breaker = CircuitBreaker(
+            config.breaker_threshold, config.breaker_delay,
+            config.breaker_max_delay)
+        _client = PracticumClient(
+            config.endpoint, max(config.pool_size, config.poll_concurrency),
+            config.connect_timeout, config.read_timeout, breaker,
+            get_loads(config.json_decoder),
+            stream=bool(config.stream_threshold))
+    return _client
+
+
+def configure_client(client, config):
+    """Меняет адрес, таймауты, декодер и предохранитель клиента."""
+    client.endpoint = config.endpoint
+    client.timeout = (config.connect_timeout, config.read_timeout)
+    client.loads = get_loads(config.json_decoder)
+    client.stream = bool(config.stream_threshold)
+    breaker = client.breaker
+    if breaker is not None:
+        breaker.failure_threshold = config.breaker_threshold
+        breaker.base_delay = config.breaker_delay
+        breaker.max_delay = config.breaker_max_delay
+
+
+def notify_outage(registry, queue, old, new, shard=None):
+    """
+    Рассылает по чатам подписок одно сообщение о сбое API.
+
+    Вызывается предохранителем при смене состояния: при размыкании
+    уходит сообщение о недоступности, при замыкании — о восстановлении.
+    Приостановленные подписки не оповещаются. С шардированием реестр
+    целиком есть у каждого воркера, поэтому воркер пишет только
+    в чаты подписок, аренды которых держит сам.
+    """
+    if old == CLOSED and new == OPEN:
+        text = OUTAGE_MESSAGE
+    elif new == CLOSED:
+        text = RECOVERY_MESSAGE
+    else:
+        return
+    logger.warning(text)
+    chats = {
+        subscription.chat_id for subscription in registry
+        if not subscription.paused
+        and (shard is None or subscription.key in shard.held)}
+    for chat_id in chats:
+        queue.put(chat_id, text)
 
 
 def get_api_answer(current_timestamp):
@@ -58,27 +285,127 @@ def get_api_answer(current_timestamp):
     В случае успешного запроса должна вернуть ответ API,
     преобразовав его из формата JSON к типам данных Python.
     """
-    params = {
-        'from_date': current_timestamp}
+    return get_api_answer_for(PRACTICUM_TOKEN, current_timestamp)
+
+
+def get_api_answer_for(token, current_timestamp):
+    """
+    Делает запрос к API-сервису с токеном подписки.
+
+    Принимает токен API Практикума и временную метку,
+    возвращает ответ API, приведенный к типам данных Python.
+    """
+    return request_api(token, current_timestamp).json()
+
+
+def request_api(token, current_timestamp, headers=None, key=None):
+    """
+    Делает запрос к API-сервису и возвращает объект ответа.
+
+    Кроме 200 допускает 304 на условный запрос с заголовками headers.
+    key — ключ подписки для записей лога; у общего запроса
+    нескольких подписок его нет.
+    """
+    started = perf_counter()
     try:
-        logger.info('Запрос к информации о домашке')
-        response = requests.get(
-            url=ENDPOINT,
-            headers=HEADERS,
-            params=params)
+        logger.info(
+            'Запрос к информации о домашке', extra={'subscription': key})
+        response = get_client().get(token, current_timestamp, headers)
     except requests.RequestException as error:
+        API_ERRORS.inc()
         message = f'Код ответа API (RequestException): {error}'
         raise WrongStatusCodeError(message)
     except ValueError as error:
+        API_ERRORS.inc()
         message = f'Код ответа API (ValueError): {error}'
         raise WrongStatusCodeError(message)
-    if response.status_code != HTTPStatus.OK:
+    latency = perf_counter() - started
+    API_LATENCY.observe(latency)
+    API_RESPONSES.inc(1, response.status_code)
+    if is_server_error(response.status_code):
+        response.close()
+        raise ServerError(f'Ошибка сервера {response.status_code}')
+    if response.status_code not in (HTTPStatus.OK, HTTPStatus.NOT_MODIFIED):
+        response.close()
         message = 'Ошибка сервера'
         raise NonStatusCodeError(message)
-    logger.info('Соединение с сервером установлено')
-    return response.json()
+    logger.info(
+        'Соединение с сервером установлено',
+        extra={'subscription': key, 'latency': latency})
+    return response
+
+
+def get_api_update(subscription):
+    """
+    Запрашивает у API изменения для подписки.
+
+    Возвращает ответ API или None, если с прошлого опроса ничего
+    не изменилось: сервер ответил 304, тело ответа совпало побайтно
+    или совпал список домашек. Ответ длиннее STREAM_THRESHOLD байт
+    возвращается как HomeworkStream и разбирается по мере чтения,
+    хэши тела и домашек для него не считаются. Подписки с общим
+    токеном получают ответ через get_shared_update.
+    """
+    if subscription.shared and RESPONSES.ttl:
+        return get_shared_update(subscription)
+    fingerprint = subscription.fingerprint
+    response = request_api(
+        subscription.token, subscription.current_date,
+        fingerprint.request_headers(), subscription.key)
+    if response.status_code == HTTPStatus.NOT_MODIFIED:
+        response.close()
+        return None
+    if is_large(response):
+        fingerprint.reset()
+        fingerprint.remember_headers(response.headers)
+        return HomeworkStream(
+            response.iter_content(CHUNK_SIZE), response.close)
+    if not fingerprint.body_changed(response.content):
+        return None
+    fingerprint.remember_headers(response.headers)
+    answer = response.json()
+    if not isinstance(answer, dict):
+        return answer
+    if not fingerprint.homeworks_changed(answer.get('homeworks')):
+        subscription.current_date = answer.get(
+            'current_date', subscription.current_date)
+        return None
+    return answer
+
+
+def get_shared_update(subscription):
+    """
+    Запрашивает изменения подписки, токен которой есть у других.
+
+    Подписки с одним токеном и близкими временными метками
+    получают общий проверенный ответ из кэша RESPONSES: запрос
+    к API и проверка ответа выполняются один раз на всех. Условных
+    заголовков у общего запроса нет, а уже отправленные статусы
+    отсекает индекс статусов.
+    """
+    return RESPONSES.get(
+        subscription.token, subscription.current_date, fetch_shared)
+
 
+def fetch_shared(token, from_date):
+    """Запрашивает и проверяет ответ API для общего кэша."""
+    response = request_api(token, from_date)
+    if is_large(response):
+        batch = validate_response(HomeworkStream(
+            response.iter_content(CHUNK_SIZE), response.close))
+        return Batch(list(batch.homeworks), batch.rejected,
+                     batch.current_date)
+    return validate_response(response.json())
 
+
+def is_large(response):
+    """Проверяет, что тело ответа стоит разбирать потоком."""
+    threshold = CONFIG.stream_threshold
+    length = response.headers.get('Content-Length')
+    return bool(threshold and length and int(length) > threshold)
+
+
+@timed(PARSE_LATENCY, VALIDATION_FAILURES, 'check_response')
 def check_response(response):
     """
     Проверяет ответ API на корректность.
@@ -89,16 +416,23 @@ def check_response(response):
     то функция должна вернуть список домашних работ,
     доступный в ответе API по ключу 'homeworks'
     """
-    if not isinstance(response, dict):
-        raise TypeError('Response не является словарем')
-    homeworks = response.get("homeworks")
-    if not isinstance(homeworks, list):
-        raise TypeError('Response не является списком')
-    if 'homeworks' not in response or 'current_date' not in response:
-        raise TypeError('Response не является ключем')
-    return homeworks
+    return VALIDATOR.check(response)
+
+
+@timed(PARSE_LATENCY, VALIDATION_FAILURES, 'validate')
+def validate_response(response):
+    """
+    Проверяет ответ API и все домашки в нем за один проход.
+
+    Возвращает Batch: записи годных домашек и отбракованные.
+    Поток HomeworkStream проверяется по мере чтения.
+    """
+    if isinstance(response, HomeworkStream):
+        return VALIDATOR.validate_stream(response)
+    return VALIDATOR.validate(response)
 
 
+@timed(PARSE_LATENCY, VALIDATION_FAILURES, 'parse_status')
 def parse_status(homework):
     """
     Извлекает информацию в домашней работе.
@@ -108,19 +442,22 @@ def parse_status(homework):
     подготовленную для отправки в Telegram строку,
     содержащую один из вердиктов словаря HOMEWORK_STATUSES
     """
-    if not isinstance(homework, Dict):
-        raise TypeError('Это не словарь!')
-    homework_name = homework.get('homework_name')
-    if not homework_name:
-        raise KeyError('Имя не существует')
-    homework_status = homework.get('status')
-    if not homework_status:
-        raise KeyError('Статус не существует')
-    verdict = HOMEWORK_STATUSES.get(homework_status)
-    if not verdict:
-        raise KeyError(f'Ошибка статуса {verdict}')
-    logging.info(f'Новый стату работы {verdict}')
-    return f'Изменился статус проверки работы "{homework_name}". {verdict}'
+    return status_message(VALIDATOR.homework(homework))
+
+
+def status_message(homework, template=None, key=None):
+    """
+    Готовит строку сообщения для проверенной домашки.
+
+    template — скомпилированный шаблон чата, по умолчанию русский,
+    key — ключ подписки для записи лога.
+    """
+    if template is None:
+        template = MESSAGE_TEMPLATES.get()
+    logger.info(
+        'Новый статус работы %s: %s', homework.name, homework.status,
+        extra={'subscription': key, 'homework': homework.name})
+    return template.render(homework.name, homework.status)
 
 
 def check_tokens():
@@ -131,56 +468,688 @@ def check_tokens():
     Если отсутствует хотя бы одна переменная окружения —
     ункция должна вернуть False, иначе — True.
     """
-    tok = [TELEGRAM_CHAT_ID, PRACTICUM_TOKEN, TELEGRAM_TOKEN]
-    return all(tok)
+    tok = [TELEGRAM_CHAT_ID, PRACTICUM_TOKEN]
+    return bool(TELEGRAM_TOKEN) and (
+        bool(CONFIG.subscriptions_file) or all(tok))
+
+
+def load_registry():
+    """
+    Собирает реестр подписок.
+
+    Подписки читаются из файла SUBSCRIPTIONS_FILE, а пара
+    PRACTICUM_TOKEN/TELEGRAM_CHAT_ID добавляется как подписка
+    по умолчанию.
+    """
+    registry = SubscriptionRegistry()
+    if CONFIG.subscriptions_file:
+        load_subscriptions(registry, CONFIG.subscriptions_file)
+    if PRACTICUM_TOKEN and TELEGRAM_CHAT_ID:
+        registry.add(PRACTICUM_TOKEN, TELEGRAM_CHAT_ID)
+    return registry
+
+
+def process_response(subscription, response, index=None):
+    """
+    Проверяет ответ API подписки и готовит строки сообщения.
+
+    Возвращает строки по одной на каждую домашку, статус которой
+    изменился по индексу index, и пары (ключ домашки, статус)
+    для фиксации в индексе после отправки. Без индекса в сообщение
+    попадают все домашки из ответа.
+    Сдвигает временную метку подписки на current_date из ответа.
+    Уже проверенный общий ответ Batch не проверяется повторно.
+    """
+    if isinstance(response, Batch):
+        batch = response
+    else:
+        batch = validate_response(response)
+    template = MESSAGE_TEMPLATES.get(
+        subscription.locale, subscription.template)
+    lines, changes = [], []
+    empty = True
+    for homework in batch.homeworks:
+        empty = False
+        track_reviewing(subscription, homework)
+        if (index is None
+                or index.get(subscription.key, homework.key)
+                != homework.status):
+            lines.append(status_message(
+                homework, template, subscription.key))
+            changes.append((homework.key, homework.status))
+    for item, error in batch.rejected:
+        VALIDATION_FAILURES.inc(1, 'homework')
+        logger.warning(
+            'Домашка отброшена: %s', error,
+            extra={'subscription': subscription.key})
+    if empty and not batch.rejected:
+        lines = ['Список пуст']
+    subscription.current_date = batch.current_date
+    return lines, changes
+
+
+def track_reviewing(subscription, homework):
+    """Обновляет набор работ подписки, которые сейчас на проверке."""
+    if homework.status == 'reviewing':
+        subscription.reviewing.add(homework.key)
+    else:
+        subscription.reviewing.discard(homework.key)
+
+
+def handle_poll_error(subscription, error):
+    """
+    Готовит строки сообщения о сбое опроса подписки.
+
+    О недоступности API в каждый чат не пишем: один раз
+    об этом оповещает предохранитель, см. notify_outage.
+    """
+    subscription.fingerprint.reset()
+    message = f'Сбой в работе программы: {error}'
+    logger.error(message, extra={'subscription': subscription.key})
+    if isinstance(error, OUTAGE_ERRORS):
+        return []
+    return [message]
+
+
+def save_state(store, subscription, current_date, last_message, changes):
+    """Сохраняет курсор, последнее сообщение и статусы подписки."""
+    if store is not None:
+        store.save(subscription.key, current_date, last_message, changes)
+    subscription.saved_date = current_date
+
+
+def message_key(subscription, text):
+    """
+    Возвращает ключ идемпотентности сообщения подписки.
+
+    Ключ зависит от сохраненной временной метки, а не от текущей:
+    опрос, повторенный после сбоя с того же сохраненного места,
+    подготовит сообщение с тем же ключом, и журнал не отправит
+    его второй раз.
+    """
+    return outbox_key(subscription.key, subscription.saved_date, text)
+
+
+def dispatch(bot, subscription, lines, changes, store=None, index=None,
+             queue=None):
+    """
+    Доставляет строки в чат подписки и фиксирует изменения.
+
+    Без очереди queue сообщения отправляются сразу, а состояние
+    сохраняется после отправки. С очередью состояние в памяти
+    обновляется сразу, чтобы следующий опрос не повторил строки,
+    а в хранилище снимок попадает после доставки последнего сообщения.
+    Сообщения в очереди получают ключи идемпотентности message_key.
+    """
+    message = '\n'.join(lines)
+    if queue is None:
+        send_messages_to(bot, subscription.chat_id, lines)
+    subscription.last_message = message
+    if index is not None:
+        index.commit(subscription.key, changes)
+    save = partial(
+        save_state, store, subscription, subscription.current_date,
+        message, changes)
+    if queue is None:
+        save()
+        return
+    messages = pack_messages(lines)
+    for text in messages[:-1]:
+        queue.put(
+            subscription.chat_id, text, key=message_key(subscription, text))
+    queue.put(
+        subscription.chat_id, messages[-1], save,
+        message_key(subscription, messages[-1]))
 
 
-def main():
+def poll_subscription(bot, subscription, store=None, index=None,
+                      queue=None):
+    """
+    Опрашивает API для одной подписки.
+
+    При изменении статусов отправляет сообщение в чат подписки
+    или ставит его в очередь queue и сдвигает временную метку.
+    После отправки состояние подписки сохраняется в хранилище
+    store и индексе index.
+    Возвращает итог опроса для планировщика: IDLE, CHANGED или ERROR.
+    """
+    try:
+        update = poll_update(subscription, index)
+    except Exception as error:
+        return complete_poll(
+            bot, subscription, None, error, store, index, queue)
+    return complete_poll(bot, subscription, update, None, store, index, queue)
+
+
+def complete_poll(bot, subscription, update, error=None, store=None,
+                  index=None, queue=None):
+    """
+    Доставляет результат опроса подписки и возвращает его итог.
+
+    update — тройка (строки, изменения, снимок подписки) из
+    poll_update или None, error — исключение, которым закончился
+    опрос. Временная метка и отпечаток ответа из снимка переносятся
+    в подписку здесь, а не в потоке опроса.
+    """
+    if error is not None:
+        lines, changes = handle_poll_error(subscription, error), []
+        outcome = ERROR
+    elif update is None:
+        return IDLE
+    else:
+        lines, changes, state = update
+        subscription.adopt(state)
+        outcome = CHANGED if changes else IDLE
+    if lines and '\n'.join(lines) != subscription.last_message:
+        dispatch(bot, subscription, lines, changes, store, index, queue)
+    return outcome
+
+
+def poll_update(subscription, index=None):
+    """
+    Запрашивает изменения подписки и готовит строки сообщения.
+
+    Работает со снимком подписки и саму подписку не меняет:
+    опрос, брошенный по таймауту, дорабатывает в пуле потоков,
+    и его временная метка не должна пропустить непоказанные
+    переходы статусов. Возвращает тройку (строки, изменения,
+    снимок), ее принимает complete_poll.
+    """
+    state = subscription.snapshot()
+    response = get_api_update(state)
+    if response is None:
+        return [], [], state
+    lines, changes = process_response(state, response, index)
+    return lines, changes, state
+
+
+async def poll_update_async(subscription, index=None):
+    """
+    Корутина запроса и разбора ответа API.
+
+    Оба шага уходят в пул потоков: поток HomeworkStream дочитывает
+    тело ответа по сети и не должен блокировать цикл событий.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, poll_update, subscription, index)
+
+
+async def dispatch_async(bot, subscription, lines, changes, store=None,
+                         index=None, queue=None):
+    """Корутина доставки, вызовы Bot и хранилища уходят в пул потоков."""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, partial(
+        dispatch, bot, subscription, lines, changes, store, index, queue))
+
+
+async def poll_subscription_async(bot, subscription, store=None,
+                                  index=None, queue=None):
+    """
+    Асинхронно опрашивает API для одной подписки.
+
+    Повторяет poll_subscription, но не блокирует цикл событий,
+    поэтому опросы разных подписок идут одновременно.
+    """
+    outcome = IDLE
+    try:
+        update = await poll_update_async(subscription, index)
+        if update is None:
+            return outcome
+        lines, changes, state = update
+        subscription.adopt(state)
+        if changes:
+            outcome = CHANGED
+    except Exception as error:
+        lines, changes = handle_poll_error(subscription, error), []
+        outcome = ERROR
+    if lines and '\n'.join(lines) != subscription.last_message:
+        try:
+            await dispatch_async(
+                bot, subscription, lines, changes, store, index, queue)
+        except NotSendMessageError as error:
+            logger.error(error)
+            outcome = ERROR
+    return outcome
+
+
+def start_metrics(queue, scheduler):
+    """Регистрирует показатели очереди и планировщика и открывает /metrics."""
+    REGISTRY.gauge(
+        'delivery_queue_depth', 'Сообщения в очереди отправки',
+        queue.__len__)
+    REGISTRY.gauge(
+        'polls_per_second', 'Опросы API в секунду за минуту',
+        scheduler.requests_per_second)
+    REGISTRY.gauge(
+        'circuit_open', 'Предохранитель API разомкнут',
+        lambda: int(get_client().breaker.state != CLOSED))
+    start_http_server(CONFIG.metrics_port, CONFIG.metrics_host)
+
+
+def make_scheduler(registry):
+    """Создает планировщик и ставит в него все подписки реестра."""
+    scheduler = PollScheduler(
+        CONFIG.retry_time, CONFIG.reviewing_retry_time,
+        CONFIG.max_retry_time, jitter=CONFIG.poll_jitter)
+    for subscription in registry:
+        scheduler.add(subscription.key)
+    return scheduler
+
+
+async def poll_and_reschedule_async(bot, subscription, scheduler, store=None,
+                                    index=None, queue=None):
+    """Опрашивает подписку и планирует ее следующий опрос."""
+    outcome = await poll_subscription_async(
+        bot, subscription, store, index, queue)
+    scheduler.complete(subscription.key, outcome, bool(subscription.reviewing))
+
+
+def make_shard():
+    """Создает координатор шардирования, если задана таблица аренд."""
+    config = CONFIG
+    if not config.shard_leases:
+        return None
+    return ShardCoordinator(
+        open_leases(config.shard_backend, config.shard_leases),
+        config.worker_id, config.shard_lease_ttl)
+
+
+def due_subscriptions(registry, scheduler, shard=None, store=None,
+                      index=None, queue=None):
+    """
+    Забирает из расписания подписки, которые пора опросить.
+
+    С координатором shard остаются только подписки этого воркера,
+    а при каждой отметке в таблице аренд подхватывается то, что
+    оставили другие воркеры, см. follow_workers.
+    Приостановленные подписки выпадают из расписания до /resume.
+    Вместе с подпиской забираются остальные подписки ее токена,
+    чтобы они получили один общий ответ API.
+    """
+    if shard is not None and shard.refresh():
+        follow_workers(registry, scheduler, shard, store, queue)
+    due = []
+    for key in scheduler.pop_due():
+        subscription = registry.get(key)
+        if subscription is None or subscription.paused:
+            continue
+        for item in with_siblings(registry, scheduler, subscription):
+            if shard is None or claim_subscription(
+                    item, scheduler, shard, store, index, queue):
+                due.append(item)
+    return due
+
+
+def follow_workers(registry, scheduler, shard, store=None, queue=None):
+    """
+    Подхватывает то, что оставили другие воркеры.
+
+    Это подписки, заведенные командами на воркере команд,
+    и неотправленные сообщения общего журнала от воркеров,
+    которых больше нет в кольце.
+    """
+    if store is not None:
+        sync_registrations(registry, scheduler, store)
+    if queue is not None:
+        queue.adopt(shard.ring.nodes)
+
+
+def sync_registrations(registry, scheduler, store):
+    """
+    Переносит в реестр подписки и паузы, сохраненные командами.
+
+    Команды читает один воркер, а опрашивает подписку владелец
+    по кольцу, который иначе узнал бы о ней только при перезапуске.
+    Новые и возобновленные подписки ставятся в расписание.
+    """
+    for entry in store.load_registrations():
+        subscription = registry.get(make_key(entry['token'], entry['chat_id']))
+        if subscription is None:
+            subscription = registry.add(entry['token'], entry['chat_id'])
+            subscription.locale = entry['locale']
+        elif subscription.paused == entry['paused']:
+            continue
+        subscription.paused = entry['paused']
+        if not subscription.paused and subscription.key not in scheduler:
+            scheduler.postpone(subscription.key, 0)
+
+
+def with_siblings(registry, scheduler, subscription):
+    """
+    Возвращает подписку и забранные из расписания подписки ее токена.
+
+    Без общего кэша ответов подписка возвращается одна.
+    """
+    subscriptions = [subscription]
+    if subscription.shared and RESPONSES.ttl:
+        subscriptions.extend(
+            item for item in registry.for_token(subscription.token)
+            if not item.paused and scheduler.take(item.key))
+    return subscriptions
+
+
+def claim_subscription(subscription, scheduler, shard, store=None,
+                       index=None, queue=None):
+    """
+    Решает, опрашивать ли подписку этому воркеру.
+
+    Чужая подписка откладывается до следующей проверки кольца,
+    а ее аренда отдается, только когда сообщения подписки
+    доставлены: иначе новый владелец, не видя сохраненного
+    состояния, отправил бы их еще раз. Подписку, аренда которой
+    только что взята, опрашивал другой воркер, поэтому ее состояние
+    перечитывается из общего хранилища.
+    """
+    key = subscription.key
+    if not shard.assigned(key):
+        if key in shard.held and not (
+                queue is not None and queue.pending(subscription.chat_id)):
+            shard.release(key)
+        scheduler.postpone(key, shard.interval)
+        return False
+    fresh = key not in shard.held
+    if not shard.acquire(key):
+        scheduler.postpone(key, shard.interval)
+        return False
+    if fresh and store is not None:
+        reload_subscription(subscription, store, index)
+    return True
+
+
+def reload_subscription(subscription, store, index=None):
+    """Перечитывает состояние подписки и ее статусы из хранилища."""
+    state, statuses = store.load_subscription(subscription.key)
+    if state:
+        subscription.current_date = state['current_date']
+        subscription.saved_date = state['current_date']
+        subscription.last_message = state['last_message']
+    subscription.fingerprint.reset()
+    if index is not None and statuses:
+        index.commit(subscription.key, statuses)
+
+
+def next_sleep(scheduler, shard=None, tick=None):
+    """Возвращает, сколько спать до следующего такта цикла опроса."""
+    delay = scheduler.next_delay()
+    if tick is not None:
+        delay = min(delay, tick)
+    if shard is not None:
+        delay = min(delay, shard.interval)
+    return delay
+
+
+async def main_async(bot, registry, scheduler, store=None, index=None,
+                     queue=None, shard=None, commands=None, control=None):
+    """
+    Асинхронный цикл опроса.
+
+    Каждая подписка, которой по расписанию пора на опрос,
+    опрашивается отдельной задачей, поэтому медленный ответ API
+    не задерживает остальные. Подписки, заведенные командами
+    commands, и просьба control перечитать настройки выполняются
+    на ближайшем такте. После просьбы control остановиться новые
+    опросы не начинаются, а начатые дорабатывают, пока не вышел
+    общий срок остановки: SHUTDOWN_TIMEOUT секунд от просьбы.
+    Пул потоков опроса закрывается без ожидания, запускать
+    корутину нужно через run_async.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(CONFIG.poll_concurrency)
+    loop.set_default_executor(executor)
+    wakeup = asyncio.Event()
+    if control is not None:
+        loop.add_reader(
+            control.fileno(), lambda: (control.drain(), wakeup.set()))
+    tasks = set()
+    try:
+        while control is None or not control.stop_requested:
+            wakeup.clear()
+            if control is not None and control.take_reload():
+                reload_config(scheduler, queue)
+            if commands is not None:
+                commands.apply(scheduler)
+            due = due_subscriptions(
+                registry, scheduler, shard, store, index, queue)
+            for subscription in due:
+                task = asyncio.ensure_future(poll_and_reschedule_async(
+                    bot, subscription, scheduler, store, index, queue))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            logger.debug('Планировщик: %s', scheduler.stats())
+            delay = next_sleep(scheduler, shard, SCHEDULER_TICK)
+            try:
+                await asyncio.wait_for(wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        if control is not None:
+            loop.remove_reader(control.fileno())
+    await finish_polls(tasks, executor, control)
+
+
+async def finish_polls(tasks, executor, control=None):
+    """
+    Ждет начатые опросы не дольше остатка срока остановки.
+
+    Пул потоков закрывается без ожидания: вызовы, которые не
+    успели начаться, отменяются, а начатые дорабатывают в фоне.
+    """
+    try:
+        if tasks:
+            await asyncio.wait(tasks, timeout=stop_timeout(control))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_async(coroutine):
+    """
+    Выполняет корутину в новом цикле событий, как asyncio.run.
+
+    asyncio.run перед выходом ждет пул потоков цикла, то есть
+    все запросы в полете, и срок остановки вышел бы за
+    SHUTDOWN_TIMEOUT. Здесь незаконченные задачи отменяются,
+    а пул закрывается без ожидания, его вызовы дорабатывают в фоне.
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            loop.run_until_complete(
+                asyncio.gather(*pending, return_exceptions=True))
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def run_polling(bot, registry, scheduler, store=None, index=None,
+                queue=None, fetcher=None, shard=None, commands=None,
+                control=None):
+    """
+    Синхронный цикл опроса.
+
+    Подписки, которым по расписанию пора на опрос, опрашиваются
+    параллельно в пуле потоков fetcher, а результаты доставляются
+    по мере готовности. Потом цикл спит до ближайшего опроса;
+    control будит его раньше, когда команда завела подписку или
+    пришла просьба перечитать настройки. Настройки применяются
+    между тактами, поэтому опросы в полете не прерываются.
+    После просьбы control остановиться цикл не начинает новых
+    опросов, доставляет результаты начатых и возвращается. Начатые
+    опросы ждут не дольше срока остановки control.stop_deadline.
+    """
+    if fetcher is None:
+        fetcher = make_fetcher()
+    sleep = time.sleep if control is None else control.sleep
+    while control is None or not control.stop_requested:
+        if control is not None and control.take_reload():
+            reload_config(scheduler, queue, fetcher)
+        if commands is not None:
+            commands.apply(scheduler)
+        due = due_subscriptions(
+            registry, scheduler, shard, store, index, queue)
+        deadline = None
+        if control is not None:
+            due = control.running(due)
+            deadline = partial(
+                control.stop_deadline, CONFIG.shutdown_timeout)
+        results = fetcher.map(
+            partial(poll_update, index=index), due, deadline)
+        for subscription, update, error in results:
+            try:
+                outcome = complete_poll(
+                    bot, subscription, update, error, store, index, queue)
+            except NotSendMessageError as send_error:
+                logger.error(send_error)
+                outcome = ERROR
+            scheduler.complete(
+                subscription.key, outcome, bool(subscription.reviewing))
+        logger.debug('Планировщик: %s', scheduler.stats())
+        sleep(next_sleep(scheduler, shard))
+
+
+def stop_timeout(control=None):
+    """
+    Возвращает, сколько секунд осталось на остановку.
+
+    Весь путь остановки — опросы в полете и очередь отправки —
+    укладывается в SHUTDOWN_TIMEOUT секунд от просьбы control.
+    """
+    if control is None:
+        return CONFIG.shutdown_timeout
+    return control.remaining(CONFIG.shutdown_timeout)
+
+
+def shutdown(queue, store=None, shard=None, commands=None, fetcher=None,
+             timeout=None):
+    """
+    Останавливает воркер, не теряя подготовленных сообщений.
+
+    Команды больше не принимаются, а очередь отправки дорабатывает
+    не дольше timeout секунд (по умолчанию SHUTDOWN_TIMEOUT); main
+    передает остаток общего срока, который уже тратили опросы
+    в полете. Курсор
+    подписки сохраняется только после доставки ее сообщения, так
+    что недоставленное сообщение после перезапуска будет отправлено
+    из журнала сообщений или получено опросом заново. Затем воркер
+    отдает аренды подписок и закрывает хранилище.
+    """
+    if timeout is None:
+        timeout = CONFIG.shutdown_timeout
+    if commands is not None:
+        commands.stop(0)
+    if fetcher is not None:
+        fetcher.close(wait=False)
+    if queue is not None and not queue.close(timeout):
+        logger.warning(
+            'За %s с не доставлено сообщений: %s', timeout, len(queue))
+    if shard is not None:
+        shard.leave()
+        shard.table.close()
+    if store is not None:
+        store.close()
+    logger.info('Работа остановлена')
+
+
+def make_outbox(owner=''):
+    """
+    Открывает журнал исходящих сообщений, если он включен.
+
+    owner — имя воркера в общем журнале, у воркера без шардирования
+    пустое.
+    """
+    if not CONFIG.outbox:
+        return None
+    return Outbox(
+        CONFIG.outbox_path, CONFIG.outbox_flush_interval, owner=owner)
+
+
+def make_fetcher():
+    """Создает пул параллельного опроса подписок."""
+    return ConcurrentFetcher(
+        CONFIG.poll_concurrency, CONFIG.in_flight, CONFIG.poll_timeout,
+        attrgetter('key'))
+
+
+def main(config=None):
     """
     Основная логика работы бота.
 
-    Делает запрос к API. Проверяет ответ.
+    Делает запрос к API для каждой подписки. Проверяет ответ.
     При наличии обновлений получает статус работы из обновления
-    и отправляет сообщение в Telegram.
-    Ждет некоторое время и делает новый запрос.
+    и отправляет сообщение в чат подписки.
+    Следующий опрос подписки назначает планировщик.
+    Настройки config по умолчанию читаются load_config, по SIGHUP
+    они перечитываются на ходу. По SIGTERM или SIGINT воркер
+    прекращает опрос и выходит через shutdown.
+    При POLL_MODE=async опрос идет в цикле событий asyncio.
+    С SHARD_LEASES подписки делятся между несколькими воркерами.
+    Параллельно с опросом бот отвечает на команды чатов,
+    COMMANDS=off это отключает; с SHARD_LEASES команды читает
+    только воркер COMMANDS_WORKER. Бот создается при первой отправке
+    или первом запросе команд, чтобы импорт python-telegram-bot
+    не задерживал первый опрос.
     """
+    logger.info('Начинаем работать')
+    configure(load_config() if config is None else config)
     if not check_tokens():
         message = 'Отсутствуют токены чата'
         logger.critical(message)
         sys.exit(message)
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    current_timestamp = 1663665682
-    previos_message = ''
-    while True:
-        try:
-            response = get_api_answer(current_timestamp)
-            statuses = check_response(response)
-            if statuses:
-                message = parse_status(statuses)
-            else:
-                message = 'Список пуст'
-            current_timestamp = response.get('current_date', current_timestamp)
-            time.sleep(RETRY_TIME)
-            if message != previos_message:
-                send_message(bot, message)
-                previos_message = message
-        except Exception as error:
-            message = f'Сбой в работе программы: {error}'
-            logger.error(message)
-            if message != previos_message:
-                send_message(bot, message)
-                previos_message = message
-        finally:
-            time.sleep(RETRY_TIME)
+    control = LoopControl().install()
+    bot = LazyObject(make_bot)
+    store = open_store(CONFIG.state_backend, CONFIG.state_path)
+    registry = restore_registry(load_registry(), store)
+    index = restore_index(StatusIndex(CONFIG.status_index_capacity), store)
+    shard = make_shard()
+    queue = DeliveryQueue(
+        partial(send_message_to, bot), CONFIG.delivery_workers,
+        CONFIG.telegram_global_rate, CONFIG.telegram_chat_rate,
+        MESSAGE_LIMIT, outbox=make_outbox(shard.worker if shard else ''),
+    ).start()
+    get_client().breaker.on_change = partial(
+        notify_outage, registry, queue, shard=shard)
+    scheduler = make_scheduler(registry)
+    commands = None
+    if CONFIG.reads_commands(shard.worker if shard else None):
+        commands = CommandHandler(
+            bot, registry, queue.put, store, CONFIG.commands_timeout,
+            wake=control.wake).start()
+    if CONFIG.metrics_port:
+        start_metrics(queue, scheduler)
+    fetcher = None
+    try:
+        if CONFIG.poll_mode == 'async':
+            run_async(main_async(
+                bot, registry, scheduler, store, index, queue, shard,
+                commands, control))
+        else:
+            fetcher = make_fetcher()
+            run_polling(
+                bot, registry, scheduler, store, index, queue, fetcher,
+                shard, commands, control)
+    finally:
+        logger.info('Останавливаемся')
+        shutdown(
+            queue, store, shard, commands, fetcher, stop_timeout(control))
 
 
 if __name__ == '__main__':
-    logging.basicConfig(
-        level=logging.INFO,
-        filename='main.log',
-        format=(
-            '%(asctime)s, %(levelname)s, %(message)s, %{funcName)s, %(lineno)s'
-        ),
-        filemode='a'
-    )
-    main()
+    try:
+        settings = load_config()
+    except ConfigError as error:
+        logger.critical(error)
+        sys.exit(str(error))
+    listener = setup_logging(
+        settings.log_file, logging.INFO, settings.log_rotation,
+        settings.log_max_bytes, settings.log_backup_count,
+        settings.log_sample_rate, console=True)
+    try:
+        main(settings)
+    finally:
+        listener.stop()
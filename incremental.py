@@ -0,0 +1,61 @@
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Optional
+
+
+def digest(content):
+    """Возвращает короткий хэш байтовой строки."""
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+@dataclass
+class Fingerprint:
+    """
+    Отпечаток последнего ответа API для подписки.
+
+    Хранит ETag и Last-Modified, если сервер их присылает,
+    а также хэши тела ответа и списка домашек. По ним опрос
+    без изменений пропускает разбор JSON и сборку сообщения.
+    """
+
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    body_hash: Optional[str] = None
+    homeworks_hash: Optional[str] = None
+
+    def request_headers(self):
+        """Возвращает заголовки условного запроса."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def remember_headers(self, headers):
+        """Запоминает валидаторы кэша из заголовков ответа."""
+        self.etag = headers.get('ETag')
+        self.last_modified = headers.get('Last-Modified')
+
+    def body_changed(self, content):
+        """Сравнивает тело ответа с прошлым и запоминает новый хэш."""
+        body_hash = digest(content)
+        if body_hash == self.body_hash:
+            return False
+        self.body_hash = body_hash
+        return True
+
+    def homeworks_changed(self, homeworks):
+        """Сравнивает список домашек с прошлым и запоминает новый хэш."""
+        raw = json.dumps(homeworks, sort_keys=True, default=str)
+        homeworks_hash = digest(raw.encode())
+        if homeworks_hash == self.homeworks_hash:
+            return False
+        self.homeworks_hash = homeworks_hash
+        return True
+
+    def reset(self):
+        """Забывает отпечаток, следующий ответ будет обработан целиком."""
+        self.etag = self.last_modified = None
+        self.body_hash = self.homeworks_hash = None
@@ -0,0 +1,74 @@
+import importlib
+import threading
+from importlib.util import find_spec
+
+
+class LazyModule:
+    """
+    Модуль, который импортируется при первом обращении к атрибуту.
+
+    Тяжелые клиентские библиотеки (requests, python-telegram-bot,
+    asyncio) не нужны, чтобы импортировать homework в тестах или
+    проверить конфигурацию, поэтому их импорт откладывается
+    до первого использования.
+    """
+
+    def __init__(self, name):
+        """Запоминает имя модуля, не импортируя его."""
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        """Импортирует модуль при первом обращении и отдает атрибут."""
+        if attribute in ('_name', '_module'):
+            raise AttributeError(attribute)
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attribute)
+
+    def __repr__(self):
+        """Показывает, загружен ли модуль."""
+        state = 'загружен' if self._module is not None else 'не загружен'
+        return f'<LazyModule {self._name}: {state}>'
+
+
+class LazyObject:
+    """
+    Объект, который создается фабрикой при первом обращении к атрибуту.
+
+    Так клиент с тяжелой библиотекой, например бот Telegram,
+    создается не при запуске, а когда он впервые понадобится.
+    Создание защищено блокировкой: первыми могут обратиться
+    сразу несколько потоков.
+    """
+
+    def __init__(self, factory):
+        """Запоминает фабрику, не вызывая ее."""
+        self._factory = factory
+        self._object = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attribute):
+        """Создает объект при первом обращении и отдает атрибут."""
+        if attribute in ('_factory', '_object', '_lock'):
+            raise AttributeError(attribute)
+        target = self._object
+        if target is None:
+            with self._lock:
+                if self._object is None:
+                    self._object = self._factory()
+                target = self._object
+        return getattr(target, attribute)
+
+
+def lazy_import(name, optional=False):
+    """
+    Возвращает LazyModule для модуля name.
+
+    С optional=True для неустановленного модуля возвращает None;
+    проверка ищет модуль на диске, но не импортирует его.
+    """
+    if optional and find_spec(name) is None:
+        return None
+    return LazyModule(name)
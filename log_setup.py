@@ -0,0 +1,114 @@
+import json
+import logging
+import queue
+import threading
+from logging.handlers import (
+    QueueHandler, QueueListener, RotatingFileHandler,
+    TimedRotatingFileHandler)
+
+LOG_FILE = 'main.log'
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+SAMPLE_RATE = 100
+CONTEXT_FIELDS = ('subscription', 'chat_id', 'homework', 'latency')
+SAMPLED_MESSAGES = frozenset((
+    'Запрос к информации о домашке',
+    'Соединение с сервером установлено',
+    'Начала отправки сообщения',
+    'сообщение отправлено',
+))
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Форматирует запись лога в одну строку JSON.
+
+    Кроме стандартных полей пишет контекст из extra: ключ подписки,
+    чат, домашку и задержку.
+    """
+
+    def format(self, record):
+        """Возвращает запись в виде строки JSON."""
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'func': record.funcName,
+            'line': record.lineno,
+        }
+        for field in CONTEXT_FIELDS + ('sample_rate',):
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает только каждую rate-ю запись частых сообщений.
+
+    Частые сообщения перечислены в messages; у пропущенной записи
+    атрибут sample_rate показывает, сколько записей она представляет.
+    """
+
+    def __init__(self, rate=SAMPLE_RATE, messages=SAMPLED_MESSAGES):
+        """Создает фильтр с частотой rate."""
+        super().__init__()
+        self.rate = rate
+        self.messages = messages
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        """Решает, попадет ли запись в лог."""
+        if self.rate <= 1 or record.msg not in self.messages:
+            return True
+        with self._lock:
+            count = self._counts.get(record.msg, 0)
+            self._counts[record.msg] = count + 1
+        if count % self.rate:
+            return False
+        record.sample_rate = self.rate
+        return True
+
+
+def make_file_handler(path, rotation, max_bytes, backup_count):
+    """Создает файловый обработчик с ротацией по размеру или по времени."""
+    if rotation == 'time':
+        return TimedRotatingFileHandler(
+            path, when='midnight', backupCount=backup_count,
+            encoding='utf-8')
+    return RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backup_count,
+        encoding='utf-8')
+
+
+def setup_logging(path=LOG_FILE, level=logging.INFO, rotation='size',
+                  max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT,
+                  sample_rate=SAMPLE_RATE, console=False):
+    """
+    Настраивает неблокирующее логирование.
+
+    Корневой логгер только кладет записи в очередь, а в файл
+    и при console=True в stderr их пишет фоновый QueueListener.
+    Выборка частых сообщений действует на оба вывода. Возвращает
+    запущенный listener, его нужно остановить при завершении работы.
+    """
+    records = queue.SimpleQueue()
+    queue_handler = QueueHandler(records)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+    file_handler = make_file_handler(path, rotation, max_bytes, backup_count)
+    file_handler.setFormatter(JsonFormatter())
+    handlers = [file_handler]
+    if console:
+        handlers.append(logging.StreamHandler())
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    listener = QueueListener(
+        records, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,254 @@
+import threading
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+
+PREFIX = 'homework_bot_'
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_labels(names, values, extra=''):
+    """Форматирует метки в синтаксисе Prometheus."""
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(pairs) + '}'
+
+
+class Metric:
+    """Базовая метрика с метками."""
+
+    kind = 'untyped'
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        """Создает метрику в реестре registry."""
+        self.registry = registry
+        self.name = PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def render(self):
+        """Возвращает строки метрики в текстовом формате Prometheus."""
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.extend(self._render_value(labels, value))
+        return lines
+
+    def _render_value(self, labels, value):
+        """Возвращает строки одного значения метрики."""
+        return [f'{self.name}{format_labels(self.labelnames, labels)} {value}']
+
+
+class Counter(Metric):
+    """Счетчик, который только растет."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, *labels):
+        """Увеличивает счетчик с метками labels."""
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Histogram(Metric):
+    """Гистограмма значений, например длительностей в секундах."""
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(),
+                 buckets=BUCKETS):
+        """Создает гистограмму с границами корзин buckets."""
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        """Учитывает значение в гистограмме с метками labels."""
+        if not self.registry.enabled:
+            return
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [
+                    [0] * (len(self.buckets) + 1), 0.0]
+            state[0][position] += 1
+            state[1] += value
+
+    def _render_value(self, labels, value):
+        """Возвращает корзины, сумму и количество значений."""
+        counts, total = value
+        lines = []
+        cumulative = 0
+        bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+        for bound, count in zip(bounds, counts):
+            cumulative += count
+            label = format_labels(self.labelnames, labels, f'le="{bound}"')
+            lines.append(f'{self.name}_bucket{label} {cumulative}')
+        label = format_labels(self.labelnames, labels)
+        lines.append(f'{self.name}_sum{label} {total}')
+        lines.append(f'{self.name}_count{label} {cumulative}')
+        return lines
+
+
+class Gauge(Metric):
+    """Показатель, значение которого вычисляется при выдаче метрик."""
+
+    kind = 'gauge'
+
+    def __init__(self, registry, name, documentation, function):
+        """Создает показатель, значение дает вызов function()."""
+        super().__init__(registry, name, documentation)
+        self.function = function
+
+    def render(self):
+        """Вычисляет значение и возвращает строки метрики."""
+        self._values = {(): self.function()}
+        return super().render()
+
+
+class Registry:
+    """
+    Реестр метрик.
+
+    Пока реестр выключен, счетчики и гистограммы ничего не делают,
+    поэтому инструментирование почти ничего не стоит.
+    """
+
+    def __init__(self, enabled=False):
+        """Создает пустой реестр."""
+        self.enabled = enabled
+        self._metrics = {}
+
+    def counter(self, name, documentation, labelnames=()):
+        """Регистрирует счетчик."""
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=BUCKETS):
+        """Регистрирует гистограмму."""
+        return self._register(
+            Histogram(self, name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, function):
+        """Регистрирует вычисляемый показатель."""
+        return self._register(Gauge(self, name, documentation, function))
+
+    def _register(self, metric):
+        """Добавляет метрику, заменяя одноименную."""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """Возвращает все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+API_LATENCY = REGISTRY.histogram(
+    'api_request_seconds', 'Длительность запроса к API Практикума')
+API_RESPONSES = REGISTRY.counter(
+    'api_responses_total', 'Ответы API Практикума по кодам', ('code',))
+API_ERRORS = REGISTRY.counter(
+    'api_errors_total', 'Запросы к API Практикума без ответа')
+SHARED_RESPONSES = REGISTRY.counter(
+    'api_shared_responses_total',
+    'Опросы подписок с общим токеном: ответ из кэша или новый запрос',
+    ('result',))
+PARSE_LATENCY = REGISTRY.histogram(
+    'parse_seconds', 'Длительность проверки и разбора ответа', ('stage',))
+VALIDATION_FAILURES = REGISTRY.counter(
+    'validation_failures_total', 'Ответы и домашки, не прошедшие проверку',
+    ('stage',))
+SEND_LATENCY = REGISTRY.histogram(
+    'telegram_send_seconds', 'Длительность отправки сообщения в Telegram')
+SEND_FAILURES = REGISTRY.counter(
+    'telegram_send_failures_total', 'Неудачные отправки в Telegram')
+SEND_RETRIES = REGISTRY.counter(
+    'telegram_retries_total', 'Повторы отправки в Telegram', ('reason',))
+
+
+def timed(histogram, failures=None, *labels):
+    """
+    Декоратор: измеряет длительность вызова функции.
+
+    Исключения считаются счетчиком failures и пробрасываются дальше.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not histogram.registry.enabled:
+                return func(*args, **kwargs)
+            started = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                if failures is not None:
+                    failures.inc(1, *labels)
+                raise
+            finally:
+                histogram.observe(perf_counter() - started, *labels)
+        return wrapper
+    return decorator
+
+
+def make_handler(registry):
+    """
+    Создает класс обработчика, отдающего метрики реестра по /metrics.
+
+    http.server импортируется здесь: сервер метрик включают не всегда,
+    а модуль тянет за собой заметную часть стандартной библиотеки.
+    """
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """Отдает метрики реестра по адресу /metrics."""
+
+        def do_GET(self):
+            """Отвечает на GET /metrics."""
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            """Не пишет обращения к метрикам в лог."""
+
+    return MetricsHandler
+
+
+def start_http_server(port, host='127.0.0.1', registry=REGISTRY):
+    """
+    Включает реестр и запускает HTTP-сервер метрик в фоновом потоке.
+
+    По умолчанию сервер слушает только локальный адрес; для сбора
+    метрик с другой машины host задается явно.
+    """
+    from http.server import ThreadingHTTPServer
+
+    registry.enabled = True
+    server = ThreadingHTTPServer((host, port), make_handler(registry))
+    server.daemon_threads = True
+    thread = threading.Thread(
+        target=server.serve_forever, name='metrics', daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,225 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 0.01
+BATCH_SIZE = 500
+RETENTION = 24 * 60 * 60
+ERROR_DELAY = 1
+
+
+def outbox_key(*parts):
+    """Возвращает ключ идемпотентности сообщения по его составляющим."""
+    raw = '\0'.join(str(part) for part in parts).encode()
+    return hashlib.sha1(raw).hexdigest()
+
+
+class Outbox:
+    """
+    Журнал исходящих сообщений (write-ahead log) в базе SQLite.
+
+    Сообщение записывается в журнал до отправки, а после доставки
+    отмечается отправленным. Неотмеченные сообщения после
+    перезапуска отправляются снова. Записи копятся и фиксируются
+    одной транзакцией в фоновом потоке не реже чем раз в
+    flush_interval секунд (group commit), поэтому append не ждет
+    диска; о фиксации сообщает колбэк. Ключ идемпотентности key
+    не дает записать одно сообщение дважды, например когда опрос
+    после сбоя заново подготовил уже записанное сообщение. Записи
+    старше retention секунд удаляются, даже если не доставлены.
+
+    Журнал может быть общим у нескольких воркеров на одном хосте.
+    Каждая запись помечена воркером owner, и pending отдает только
+    свои записи, чтобы воркер не отправил сообщение, которое сейчас
+    отправляет другой. Записи ушедших воркеров забирает adopt.
+    """
+
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL,
+                 batch_size=BATCH_SIZE, retention=RETENTION,
+                 clock=time.time, owner=''):
+        """Открывает журнал и запускает поток фиксации."""
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retention = retention
+        self.clock = clock
+        self.owner = owner
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS outbox ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'key TEXT UNIQUE, '
+                'chat_id TEXT NOT NULL, '
+                'text TEXT NOT NULL, '
+                'created REAL NOT NULL, '
+                'sent REAL, '
+                "owner TEXT NOT NULL DEFAULT '')")
+            columns = {
+                row[1] for row in
+                self._connection.execute('PRAGMA table_info(outbox)')}
+            if 'owner' not in columns:
+                self._connection.execute(
+                    "ALTER TABLE outbox ADD COLUMN "
+                    "owner TEXT NOT NULL DEFAULT ''")
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS outbox_created '
+                'ON outbox (created)')
+        self._appends = []
+        self._sent = []
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run, name='outbox', daemon=True)
+        self._thread.start()
+
+    def append(self, chat_id, text, key=None, on_commit=None):
+        """
+        Добавляет сообщение в журнал.
+
+        После фиксации вызывается on_commit(id) с номером записи
+        или on_commit(None), если сообщение с ключом key уже есть
+        в журнале и отправлять его не нужно.
+        """
+        with self._condition:
+            self._appends.append((key, str(chat_id), text, on_commit))
+            self._condition.notify()
+
+    def mark_sent(self, message_id):
+        """Отмечает сообщение отправленным при следующей фиксации."""
+        with self._condition:
+            self._sent.append(message_id)
+            self._condition.notify()
+
+    def pending(self):
+        """Возвращает тройки (id, чат, текст) своих неотправленных записей."""
+        with self._write_lock:
+            return self._connection.execute(
+                'SELECT id, chat_id, text FROM outbox '
+                'WHERE sent IS NULL AND owner = ? ORDER BY id',
+                (self.owner,)).fetchall()
+
+    def adopt(self, live):
+        """
+        Забирает неотправленные сообщения воркеров не из списка live.
+
+        Возвращает тройки (id, чат, текст) забранных сообщений.
+        Выбор и смена владельца идут в одной транзакции с блокировкой
+        на запись, поэтому одну запись не заберут два воркера.
+        """
+        live = set(live) | {self.owner}
+        with self._write_lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                rows = [
+                    (message_id, chat_id, text)
+                    for message_id, chat_id, text, owner
+                    in self._connection.execute(
+                        'SELECT id, chat_id, text, owner FROM outbox '
+                        'WHERE sent IS NULL AND owner != ? ORDER BY id',
+                        (self.owner,))
+                    if owner not in live]
+                self._connection.executemany(
+                    'UPDATE outbox SET owner = ? WHERE id = ?',
+                    [(self.owner, row[0]) for row in rows])
+            except sqlite3.Error:
+                self._connection.rollback()
+                raise
+            self._connection.commit()
+        return rows
+
+    def flush(self):
+        """
+        Фиксирует накопленные записи и отметки сразу.
+
+        Если записать не удалось, они остаются в очереди на фиксацию.
+        """
+        with self._condition:
+            appends, self._appends = self._appends, []
+            sent, self._sent = self._sent, []
+        if not appends and not sent:
+            return
+        try:
+            with self._write_lock:
+                ids = self._write(appends, sent)
+        except sqlite3.Error:
+            with self._condition:
+                self._appends[:0] = appends
+                self._sent[:0] = sent
+            raise
+        for (_, _, _, on_commit), message_id in zip(appends, ids):
+            if on_commit is None:
+                continue
+            try:
+                on_commit(message_id)
+            except Exception:
+                logger.exception('Ошибка после записи в журнал сообщений')
+
+    def close(self):
+        """Фиксирует остаток, останавливает поток и закрывает базу."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+        with self._write_lock:
+            self._connection.close()
+
+    def _run(self):
+        """Цикл потока: фиксирует записи пачками."""
+        while True:
+            with self._condition:
+                while not (self._appends or self._sent or self._stopping):
+                    self._condition.wait()
+                if self._stopping:
+                    return
+                self._gather()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                logger.exception('Не удалось записать журнал сообщений')
+                with self._condition:
+                    self._condition.wait(ERROR_DELAY)
+
+    def _gather(self):
+        """
+        Ждет под блокировкой, пока пачка наберется.
+
+        Пачка фиксируется через flush_interval секунд после первой
+        записи или раньше, когда записей batch_size.
+        """
+        deadline = time.monotonic() + self.flush_interval
+        while not self._stopping and len(self._appends) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self._condition.wait(remaining)
+
+    def _write(self, appends, sent):
+        """
+        Пишет записи и отметки одной транзакцией.
+
+        Возвращает номера новых записей, для повторов ключа — None.
+        """
+        now = self.clock()
+        ids = []
+        with self._connection:
+            for key, chat_id, text, _ in appends:
+                cursor = self._connection.execute(
+                    'INSERT OR IGNORE INTO outbox '
+                    '(key, chat_id, text, created, owner) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (key, chat_id, text, now, self.owner))
+                ids.append(cursor.lastrowid if cursor.rowcount else None)
+            self._connection.executemany(
+                'UPDATE outbox SET sent = ? WHERE id = ?',
+                [(now, message_id) for message_id in sent])
+            self._connection.execute(
+                'DELETE FROM outbox WHERE created < ?',
+                (now - self.retention,))
+        return ids
@@ -0,0 +1,100 @@
+import threading
+import time
+
+from metrics import SHARED_RESPONSES
+
+TTL = 5
+BUCKET = 60
+
+
+class Flight:
+    """Запрос кэша: его результат или ошибка и срок годности."""
+
+    __slots__ = ('done', 'value', 'error', 'expires')
+
+    def __init__(self):
+        """Создает еще не выполненный запрос."""
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.expires = None
+
+
+class ResponseCache:
+    """
+    Общий кэш ответов API для подписок с одним токеном.
+
+    Ключ — токен и временная метка from_date, округленная вниз
+    до начала корзины в bucket секунд. Запрос делается с началом
+    корзины, поэтому его ответ покрывает все метки корзины. Пока
+    запрос ключа идет, остальные вызовы ждут его результат, а не
+    делают свой (single flight). Готовый ответ отдается еще ttl
+    секунд. Ошибку получают только те, кто ждал запрос: она
+    не кэшируется.
+    """
+
+    def __init__(self, ttl=TTL, bucket=BUCKET, clock=time.monotonic):
+        """Создает пустой кэш."""
+        self.ttl = ttl
+        self.bucket = bucket
+        self.clock = clock
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Возвращает число ключей в кэше."""
+        with self._lock:
+            return len(self._flights)
+
+    def get(self, token, from_date, fetch):
+        """
+        Возвращает результат fetch(token, начало корзины from_date).
+
+        fetch вызывается, только если для ключа нет свежего ответа
+        и запроса в полете.
+        """
+        start = from_date - from_date % self.bucket
+        key = (token, start)
+        with self._lock:
+            now = self.clock()
+            flight = self._flights.get(key)
+            leader = flight is None or (
+                flight.expires is not None and flight.expires <= now)
+            if leader:
+                self._prune(now)
+                flight = self._flights[key] = Flight()
+        if leader:
+            SHARED_RESPONSES.inc(1, 'miss')
+            try:
+                flight.value = fetch(token, start)
+            except BaseException as error:
+                flight.error = error
+                self._forget(key, flight)
+            finally:
+                flight.expires = self.clock() + self.ttl
+                flight.done.set()
+        else:
+            SHARED_RESPONSES.inc(1, 'hit')
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def clear(self):
+        """Забывает все ответы."""
+        with self._lock:
+            self._flights.clear()
+
+    def _forget(self, key, flight):
+        """Убирает запрос из кэша, если его еще не заменил новый."""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def _prune(self, now):
+        """Убирает устаревшие ответы."""
+        expired = [
+            key for key, flight in self._flights.items()
+            if flight.expires is not None and flight.expires <= now]
+        for key in expired:
+            del self._flights[key]
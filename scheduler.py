@@ -0,0 +1,177 @@
+import heapq
+import random
+import threading
+import time
+from collections import deque
+
+IDLE = 'idle'
+CHANGED = 'changed'
+ERROR = 'error'
+
+BASE_INTERVAL = 600
+REVIEWING_INTERVAL = 150
+MAX_INTERVAL = 3600
+IDLE_BACKOFF = 1.5
+JITTER = 0.1
+RATE_WINDOW = 60
+
+
+class PollScheduler:
+    """
+    Планировщик опросов подписок.
+
+    Куча упорядочена по времени следующего опроса. Интервал
+    зависит от состояния подписки: пока работа на проверке,
+    опрос идет чаще; подписки без изменений и с ошибками
+    опрашиваются все реже, вплоть до max_interval. Каждый интервал
+    случайно растягивается или сжимается на долю jitter, чтобы
+    опросы не собирались на одной границе тика.
+
+    Расписание меняет только цикл опроса. Частоту опросов читает
+    и поток /metrics, поэтому окно завершенных опросов защищено
+    блокировкой.
+    """
+
+    def __init__(self, base_interval=BASE_INTERVAL,
+                 reviewing_interval=REVIEWING_INTERVAL,
+                 max_interval=MAX_INTERVAL, idle_backoff=IDLE_BACKOFF,
+                 jitter=JITTER, clock=time.monotonic, rng=random.random):
+        """Создает пустой планировщик."""
+        self.base_interval = base_interval
+        self.reviewing_interval = reviewing_interval
+        self.max_interval = max_interval
+        self.idle_backoff = idle_backoff
+        self.jitter = jitter
+        self.clock = clock
+        self.rng = rng
+        self._heap = []
+        self._due = {}
+        self._idle = {}
+        self._errors = {}
+        self._completed = deque()
+        self._rate_lock = threading.Lock()
+
+    def __len__(self):
+        """Возвращает число подписок в расписании."""
+        return len(self._due)
+
+    def __contains__(self, key):
+        """Проверяет, есть ли подписка в расписании."""
+        return key in self._due
+
+    def add(self, key):
+        """
+        Добавляет подписку в расписание.
+
+        Первый опрос случайно сдвигается внутри доли jitter
+        базового интервала, чтобы разнести старт подписок.
+        """
+        delay = self.rng() * self.jitter * self.base_interval
+        self._push(key, self.clock() + delay)
+
+    def postpone(self, key, delay):
+        """Откладывает опрос на delay секунд, не меняя интервалов."""
+        self._push(key, self.clock() + delay)
+
+    def take(self, key):
+        """
+        Забирает подписку из расписания раньше срока.
+
+        Возвращает False, если ее нет в расписании. Интервалы
+        подписки сохраняются, следующий опрос назначит complete.
+        """
+        return self._due.pop(key, None) is not None
+
+    def remove(self, key):
+        """Убирает подписку из расписания."""
+        self._due.pop(key, None)
+        self._idle.pop(key, None)
+        self._errors.pop(key, None)
+
+    def pop_due(self, now=None):
+        """Забирает из расписания подписки, которым пора на опрос."""
+        now = self.clock() if now is None else now
+        keys = []
+        while self._heap and self._heap[0][0] <= now:
+            due, key = heapq.heappop(self._heap)
+            if self._due.get(key) == due:
+                del self._due[key]
+                keys.append(key)
+        return keys
+
+    def next_delay(self, now=None):
+        """Возвращает, сколько секунд осталось до ближайшего опроса."""
+        now = self.clock() if now is None else now
+        self._prune()
+        if not self._heap:
+            return self.base_interval
+        return max(0, self._heap[0][0] - now)
+
+    def complete(self, key, outcome, reviewing=False):
+        """
+        Планирует следующий опрос подписки по итогу текущего.
+
+        outcome — IDLE, CHANGED или ERROR, reviewing — есть ли
+        у подписки работы на проверке.
+        """
+        now = self.clock()
+        self._record(now)
+        interval = self.interval(key, outcome, reviewing)
+        spread = 1 + self.jitter * (2 * self.rng() - 1)
+        self._push(key, now + interval * spread)
+
+    def interval(self, key, outcome, reviewing=False):
+        """Вычисляет интервал до следующего опроса без разброса."""
+        if outcome == ERROR:
+            errors = self._errors.get(key, 0) + 1
+            self._errors[key] = errors
+            return min(self.max_interval, self.base_interval * 2 ** errors)
+        self._errors.pop(key, None)
+        if outcome == CHANGED or reviewing:
+            self._idle.pop(key, None)
+            if reviewing:
+                return self.reviewing_interval
+            return self.base_interval
+        idle = self._idle.get(key, 0) + 1
+        self._idle[key] = idle
+        interval = self.base_interval * self.idle_backoff ** (idle - 1)
+        return min(self.max_interval, interval)
+
+    def requests_per_second(self, now=None):
+        """Возвращает число опросов в секунду за последние RATE_WINDOW с."""
+        now = self.clock() if now is None else now
+        with self._rate_lock:
+            self._trim(now)
+            return len(self._completed) / RATE_WINDOW
+
+    def stats(self):
+        """Возвращает метрики планировщика."""
+        return {
+            'scheduled': len(self),
+            'requests_per_second': self.requests_per_second(),
+            'next_poll_in': self.next_delay(),
+        }
+
+    def _push(self, key, due):
+        """Кладет подписку в кучу с временем опроса due."""
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, key))
+
+    def _prune(self):
+        """Снимает с вершины кучи устаревшие записи."""
+        while self._heap:
+            due, key = self._heap[0]
+            if self._due.get(key) == due:
+                return
+            heapq.heappop(self._heap)
+
+    def _record(self, now):
+        """Запоминает время завершенного опроса для подсчета частоты."""
+        with self._rate_lock:
+            self._completed.append(now)
+            self._trim(now)
+
+    def _trim(self, now):
+        """Отбрасывает опросы старше окна RATE_WINDOW под блокировкой."""
+        while self._completed and self._completed[0] <= now - RATE_WINDOW:
+            self._completed.popleft()
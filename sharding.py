@@ -0,0 +1,250 @@
+import bisect
+import hashlib
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+SQLITE_BACKEND = 'sqlite'
+REPLICAS = 64
+LEASE_TTL = 60
+
+
+def ring_hash(value):
+    """Возвращает позицию строки на кольце."""
+    digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def default_worker_id():
+    """Возвращает имя воркера: DYNO на Heroku, иначе хост и pid."""
+    return os.getenv('DYNO') or f'{socket.gethostname()}-{os.getpid()}'
+
+
+class HashRing:
+    """
+    Консистентное хеширование ключей подписок по воркерам.
+
+    Каждый воркер занимает replicas точек на кольце, ключ достается
+    первому воркеру по часовой стрелке. При добавлении или уходе
+    воркера переезжает только доля ключей около его точек.
+    """
+
+    def __init__(self, nodes=(), replicas=REPLICAS):
+        """Строит кольцо из воркеров nodes."""
+        self.replicas = replicas
+        self.nodes = tuple(sorted(set(nodes)))
+        points = sorted(
+            (ring_hash(f'{node}#{replica}'), node)
+            for node in self.nodes for replica in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def owner(self, key):
+        """Возвращает воркера ключа или None для пустого кольца."""
+        if not self._nodes:
+            return None
+        position = bisect.bisect(self._hashes, ring_hash(key))
+        return self._nodes[position % len(self._nodes)]
+
+
+class LeaseTable:
+    """
+    Общая таблица воркеров и аренд подписок.
+
+    Воркер периодически отмечается в таблице; пропавший воркер
+    исчезает из нее через ttl. Подписку опрашивает только воркер,
+    который держит ее аренду. Моменты времени — секунды Unix,
+    общие для всех процессов.
+    """
+
+    def heartbeat(self, worker, ttl):
+        """Отмечает воркера живым и продлевает все его аренды."""
+        raise NotImplementedError
+
+    def workers(self):
+        """Возвращает живых воркеров."""
+        raise NotImplementedError
+
+    def acquire(self, key, worker, ttl):
+        """Берет или продлевает аренду ключа; сообщает об успехе."""
+        raise NotImplementedError
+
+    def release(self, key, worker):
+        """Отдает аренду ключа, если она принадлежит воркеру."""
+        raise NotImplementedError
+
+    def leave(self, worker):
+        """Убирает воркера и все его аренды."""
+        raise NotImplementedError
+
+    def close(self):
+        """Освобождает ресурсы таблицы."""
+
+
+class SQLiteLeaseTable(LeaseTable):
+    """
+    Таблица аренд в базе SQLite.
+
+    Подходит для нескольких процессов на одной машине: атомарность
+    захвата аренды обеспечивает блокировка файла базы.
+    """
+
+    def __init__(self, path, clock=time.time):
+        """Открывает базу и создает таблицы."""
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, timeout=30, check_same_thread=False,
+            isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS workers ('
+            'worker TEXT PRIMARY KEY, expires REAL NOT NULL)')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS leases ('
+            'key TEXT PRIMARY KEY, worker TEXT NOT NULL, '
+            'expires REAL NOT NULL)')
+
+    def _transaction(self, statements):
+        """
+        Выполняет пары (запрос, параметры) в одной транзакции записи.
+
+        Возвращает число строк, измененных последним запросом.
+        """
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                for sql, parameters in statements:
+                    cursor.execute(sql, parameters)
+                changed = cursor.rowcount
+            except Exception:
+                cursor.execute('ROLLBACK')
+                raise
+            cursor.execute('COMMIT')
+            return changed
+
+    def heartbeat(self, worker, ttl):
+        """Отмечает воркера живым и продлевает все его аренды."""
+        expires = self.clock() + ttl
+        self._transaction([
+            ('INSERT INTO workers (worker, expires) VALUES (?, ?) '
+             'ON CONFLICT(worker) DO UPDATE SET expires = excluded.expires',
+             (worker, expires)),
+            ('UPDATE leases SET expires = ? WHERE worker = ?',
+             (expires, worker)),
+        ])
+
+    def workers(self):
+        """Возвращает живых воркеров."""
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT worker FROM workers WHERE expires > ?',
+                (self.clock(),))
+            return [worker for worker, in rows]
+
+    def acquire(self, key, worker, ttl):
+        """Берет аренду, если она свободна, истекла или уже своя."""
+        now = self.clock()
+        return self._transaction([(
+            'INSERT INTO leases (key, worker, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET '
+            'worker = excluded.worker, expires = excluded.expires '
+            'WHERE leases.worker = excluded.worker OR leases.expires <= ?',
+            (key, worker, now + ttl, now))]) == 1
+
+    def release(self, key, worker):
+        """Отдает аренду ключа, если она принадлежит воркеру."""
+        self._transaction([(
+            'DELETE FROM leases WHERE key = ? AND worker = ?',
+            (key, worker))])
+
+    def leave(self, worker):
+        """Убирает воркера и все его аренды."""
+        self._transaction([
+            ('DELETE FROM leases WHERE worker = ?', (worker,)),
+            ('DELETE FROM workers WHERE worker = ?', (worker,)),
+        ])
+
+    def close(self):
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._connection.close()
+
+
+def open_leases(backend, path):
+    """Создает таблицу аренд по имени бэкенда."""
+    if backend == SQLITE_BACKEND:
+        return SQLiteLeaseTable(path)
+    raise ValueError(f'Неизвестная таблица аренд: {backend}')
+
+
+class ShardCoordinator:
+    """
+    Распределение подписок между воркерами.
+
+    Подписка назначается воркеру консистентным хешированием ключа
+    по кольцу живых воркеров, а опрашивать ее можно, только взяв
+    аренду в общей таблице. Прежний владелец отдает аренду сам,
+    когда подписка ушла к другому воркеру и ее сообщения доставлены,
+    или теряет ее через ttl после своей смерти. Поэтому при
+    масштабировании подписку никогда не опрашивают два воркера сразу.
+    """
+
+    def __init__(self, table, worker=None, ttl=LEASE_TTL, replicas=REPLICAS,
+                 clock=time.monotonic):
+        """Создает координатор воркера worker."""
+        self.table = table
+        self.worker = worker or default_worker_id()
+        self.ttl = ttl
+        self.replicas = replicas
+        self.clock = clock
+        self.ring = HashRing((), replicas)
+        self.held = set()
+        self._refreshed = None
+
+    @property
+    def interval(self):
+        """Как часто отмечаться в таблице, чтобы аренды не истекли."""
+        return self.ttl / 3
+
+    def refresh(self, force=False):
+        """
+        Отмечается в таблице и перестраивает кольцо, если пора.
+
+        Возвращает True, если отметка была, иначе False.
+        """
+        now = self.clock()
+        if (not force and self._refreshed is not None
+                and now - self._refreshed < self.interval):
+            return False
+        self._refreshed = now
+        self.table.heartbeat(self.worker, self.ttl)
+        workers = set(self.table.workers()) | {self.worker}
+        if tuple(sorted(workers)) != self.ring.nodes:
+            self.ring = HashRing(workers, self.replicas)
+        return True
+
+    def assigned(self, key):
+        """Проверяет, что ключ по кольцу принадлежит этому воркеру."""
+        return self.ring.owner(key) == self.worker
+
+    def acquire(self, key):
+        """Берет или продлевает аренду ключа."""
+        if self.table.acquire(key, self.worker, self.ttl):
+            self.held.add(key)
+            return True
+        self.held.discard(key)
+        return False
+
+    def release(self, key):
+        """Отдает аренду ключа."""
+        self.table.release(key, self.worker)
+        self.held.discard(key)
+
+    def leave(self):
+        """Уходит из кольца, отдавая все аренды."""
+        self.table.leave(self.worker)
+        self.held.clear()
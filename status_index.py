@@ -0,0 +1,73 @@
+from collections import OrderedDict
+
+FINISHED_STATUS = 'approved'
+INDEX_CAPACITY = 100000
+
+
+def homework_key(homework):
+    """Возвращает ключ домашки: id, а без него — имя."""
+    return str(homework.get('id') or homework.get('homework_name'))
+
+
+class StatusIndex:
+    """
+    Индекс последних известных статусов домашек.
+
+    Ключ — пара (ключ подписки, ключ домашки), поиск и обновление
+    за O(1). Когда записей больше capacity, вытесняются давно
+    не встречавшиеся принятые работы: незавершенные остаются,
+    иначе их следующий переход статуса потерялся бы. Встречей
+    считается и запись статуса, и поиск: опрос ищет в индексе
+    каждую домашку ответа, даже если ее статус не изменился.
+    """
+
+    def __init__(self, capacity=INDEX_CAPACITY):
+        """Создает пустой индекс на capacity записей."""
+        self.capacity = capacity
+        self._statuses = {}
+        self._finished = OrderedDict()
+
+    def __len__(self):
+        """Возвращает число записей в индексе."""
+        return len(self._statuses)
+
+    def get(self, subscription_key, key):
+        """
+        Возвращает последний статус домашки или None.
+
+        Принятая работа при этом отодвигается в конец очереди
+        на вытеснение.
+        """
+        index_key = (subscription_key, key)
+        status = self._statuses.get(index_key)
+        if status == FINISHED_STATUS:
+            try:
+                self._finished.move_to_end(index_key)
+            except KeyError:
+                pass
+        return status
+
+    def commit(self, subscription_key, statuses):
+        """Запоминает пары (ключ домашки, статус) подписки."""
+        for key, status in statuses:
+            index_key = (subscription_key, key)
+            self._statuses[index_key] = status
+            if status == FINISHED_STATUS:
+                self._finished[index_key] = None
+                self._finished.move_to_end(index_key)
+            else:
+                self._finished.pop(index_key, None)
+        self._evict()
+
+    def _evict(self):
+        """Вытесняет самые старые принятые работы сверх capacity."""
+        while len(self._statuses) > self.capacity and self._finished:
+            index_key, _ = self._finished.popitem(last=False)
+            del self._statuses[index_key]
+
+
+def restore_index(index, store):
+    """Загружает в индекс статусы, сохраненные в хранилище."""
+    for subscription_key, key, status in store.load_statuses():
+        index.commit(subscription_key, [(key, status)])
+    return index
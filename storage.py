@@ -0,0 +1,338 @@
+import json
+import os
+import sqlite3
+import threading
+
+SQLITE_BACKEND = 'sqlite'
+FILE_BACKEND = 'file'
+CHUNK_SIZE = 64 * 1024
+
+
+class StateStore:
+    """
+    Хранилище состояния подписок.
+
+    Для каждой подписки хранит временную метку следующего запроса,
+    последнее отправленное сообщение и последние статусы домашек,
+    чтобы после перезапуска продолжить опрос с того же места
+    и не повторять сообщения.
+    """
+
+    def load(self):
+        """Возвращает словарь ключ подписки -> сохраненное состояние."""
+        raise NotImplementedError
+
+    def load_statuses(self):
+        """Возвращает тройки (ключ подписки, ключ домашки, статус)."""
+        raise NotImplementedError
+
+    def load_subscription(self, key):
+        """
+        Возвращает состояние одной подписки и ее статусы.
+
+        Состояние — словарь или None, статусы — пары
+        (ключ домашки, статус).
+        """
+        statuses = [
+            (homework, status)
+            for subscription, homework, status in self.load_statuses()
+            if subscription == key]
+        return self.load().get(key), statuses
+
+    def load_registrations(self):
+        """
+        Возвращает подписки, заведенные и измененные командами чатов.
+
+        Каждая — словарь с ключами token, chat_id, locale и paused.
+        """
+        return []
+
+    def save_registration(self, subscription):
+        """Сохраняет токен, чат, язык и паузу подписки."""
+        raise NotImplementedError
+
+    def save(self, key, current_date, last_message, statuses=()):
+        """
+        Атомарно сохраняет состояние одной подписки.
+
+        statuses — пары (ключ домашки, статус), изменившиеся
+        с прошлого сохранения.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Освобождает ресурсы хранилища."""
+
+
+class SQLiteStateStore(StateStore):
+    """Хранилище состояния в базе SQLite."""
+
+    def __init__(self, path):
+        """Открывает базу и создает таблицу состояния."""
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS subscriptions ('
+                'key TEXT PRIMARY KEY, '
+                'from_date INTEGER NOT NULL, '
+                'last_message TEXT NOT NULL)')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS statuses ('
+                'subscription TEXT NOT NULL, '
+                'homework TEXT NOT NULL, '
+                'status TEXT NOT NULL, '
+                'PRIMARY KEY (subscription, homework))')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS registrations ('
+                'key TEXT PRIMARY KEY, '
+                'token TEXT NOT NULL, '
+                'chat_id TEXT NOT NULL, '
+                'locale TEXT NOT NULL, '
+                'paused INTEGER NOT NULL)')
+
+    def load(self):
+        """Возвращает словарь ключ подписки -> сохраненное состояние."""
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT key, from_date, last_message FROM subscriptions')
+            return {
+                key: {'current_date': date, 'last_message': message}
+                for key, date, message in rows}
+
+    def load_statuses(self):
+        """Возвращает тройки (ключ подписки, ключ домашки, статус)."""
+        with self._lock:
+            return self._connection.execute(
+                'SELECT subscription, homework, status FROM statuses'
+            ).fetchall()
+
+    def load_subscription(self, key):
+        """Возвращает состояние одной подписки и ее статусы."""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT from_date, last_message FROM subscriptions '
+                'WHERE key = ?', (key,)).fetchone()
+            statuses = self._connection.execute(
+                'SELECT homework, status FROM statuses '
+                'WHERE subscription = ?', (key,)).fetchall()
+        state = None
+        if row is not None:
+            state = {'current_date': row[0], 'last_message': row[1]}
+        return state, statuses
+
+    def load_registrations(self):
+        """Возвращает подписки, заведенные командами чатов."""
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT token, chat_id, locale, paused FROM registrations')
+            return [
+                {'token': token, 'chat_id': chat_id, 'locale': locale,
+                 'paused': bool(paused)}
+                for token, chat_id, locale, paused in rows]
+
+    def save_registration(self, subscription):
+        """Сохраняет токен, чат, язык и паузу подписки."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO registrations '
+                '(key, token, chat_id, locale, paused) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (subscription.key, subscription.token, subscription.chat_id,
+                 subscription.locale, int(subscription.paused)))
+
+    def save(self, key, current_date, last_message, statuses=()):
+        """Атомарно сохраняет состояние одной подписки."""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO statuses '
+                '(subscription, homework, status) VALUES (?, ?, ?)',
+                [(key, homework, status) for homework, status in statuses])
+            self._connection.execute(
+                'INSERT INTO subscriptions (key, from_date, last_message) '
+                'VALUES (?, ?, ?) ON CONFLICT(key) DO UPDATE SET '
+                'from_date = excluded.from_date, '
+                'last_message = excluded.last_message',
+                (key, current_date, last_message))
+
+    def close(self):
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._connection.close()
+
+
+class FileStateStore(StateStore):
+    """
+    Хранилище состояния в журнале JSON-строк.
+
+    Каждое сохранение дописывает строку в конец файла, при чтении
+    побеждает последняя запись подписки. Оборванная при сбое строка
+    отрезается при открытии, чтобы следующая запись не склеилась
+    с ней. Журнал сжимается при загрузке, когда устаревших записей
+    становится много.
+    """
+
+    def __init__(self, path):
+        """Отрезает оборванный хвост и открывает журнал на дозапись."""
+        self.path = path
+        self._lock = threading.Lock()
+        self._truncate_torn_tail()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def load(self):
+        """Возвращает словарь ключ подписки -> сохраненное состояние."""
+        return self._replay()[0]
+
+    def load_statuses(self):
+        """Возвращает тройки (ключ подписки, ключ домашки, статус)."""
+        return [
+            (subscription, homework, status)
+            for (subscription, homework), status
+            in self._replay()[1].items()]
+
+    def load_registrations(self):
+        """Возвращает подписки, заведенные командами чатов."""
+        return list(self._replay()[2].values())
+
+    def save_registration(self, subscription):
+        """Дописывает токен, чат, язык и паузу подписки."""
+        self._append([{
+            'key': subscription.key, 'token': subscription.token,
+            'chat_id': subscription.chat_id, 'locale': subscription.locale,
+            'paused': subscription.paused}])
+
+    def save(self, key, current_date, last_message, statuses=()):
+        """
+        Дописывает состояние одной подписки.
+
+        Статусы пишутся раньше курсора, поэтому при обрыве записи
+        курсор не опередит сохраненные статусы.
+        """
+        records = [
+            {'key': key, 'homework': homework, 'status': status}
+            for homework, status in statuses]
+        records.append(
+            {'key': key, 'current_date': current_date,
+             'last_message': last_message})
+        self._append(records)
+
+    def _append(self, records):
+        """Дописывает записи в журнал и сбрасывает их на диск."""
+        lines = ''.join(
+            json.dumps(record, ensure_ascii=False) + '\n'
+            for record in records)
+        with self._lock:
+            self._file.write(lines)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def _truncate_torn_tail(self):
+        """Обрезает журнал после последнего полного перевода строки."""
+        try:
+            file = open(self.path, 'r+b')
+        except FileNotFoundError:
+            return
+        with file:
+            end = position = file.seek(0, os.SEEK_END)
+            while position > 0:
+                start = max(0, position - CHUNK_SIZE)
+                file.seek(start)
+                index = file.read(position - start).rfind(b'\n')
+                if index >= 0:
+                    position = start + index + 1
+                    break
+                position = start
+            if position < end:
+                file.truncate(position)
+                file.flush()
+                os.fsync(file.fileno())
+
+    def _replay(self):
+        """
+        Читает журнал, последняя запись каждого ключа побеждает.
+
+        Чтение и сжатие идут под одной блокировкой, чтобы запись
+        из другого потока не потерялась при замене файла.
+        """
+        states = {}
+        statuses = {}
+        registrations = {}
+        records = 0
+        with self._lock:
+            with open(self.path, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    records += 1
+                    key = record.pop('key')
+                    if 'homework' in record:
+                        statuses[(key, record['homework'])] = record['status']
+                    elif 'token' in record:
+                        registrations[key] = record
+                    else:
+                        states[key] = record
+            live = len(states) + len(statuses) + len(registrations)
+            if records > 2 * live:
+                self._compact(states, statuses, registrations)
+        return states, statuses, registrations
+
+    def _compact(self, states, statuses, registrations):
+        """
+        Переписывает журнал, оставляя по одной записи на ключ.
+
+        Вызывается под блокировкой журнала.
+        """
+        records = [
+            {'key': key, 'homework': homework, 'status': status}
+            for (key, homework), status in statuses.items()]
+        records.extend(dict(state, key=key) for key, state in states.items())
+        records.extend(
+            dict(registration, key=key)
+            for key, registration in registrations.items())
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        self._file.close()
+        os.replace(temporary, self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        """Закрывает журнал."""
+        with self._lock:
+            self._file.close()
+
+
+def open_store(backend, path):
+    """Создает хранилище состояния по имени бэкенда."""
+    if backend == SQLITE_BACKEND:
+        return SQLiteStateStore(path)
+    if backend == FILE_BACKEND:
+        return FileStateStore(path)
+    raise ValueError(f'Неизвестное хранилище состояния: {backend}')
+
+
+def restore_registry(registry, store):
+    """
+    Восстанавливает подписки реестра из хранилища.
+
+    Добавляет подписки, заведенные командами чатов, и их паузы,
+    затем курсоры и последние сообщения всех подписок.
+    """
+    for entry in store.load_registrations():
+        subscription = registry.add(entry['token'], entry['chat_id'])
+        subscription.locale = entry['locale']
+        subscription.paused = entry['paused']
+    states = store.load()
+    for subscription in registry:
+        state = states.get(subscription.key)
+        if state:
+            subscription.current_date = state['current_date']
+            subscription.saved_date = state['current_date']
+            subscription.last_message = state['last_message']
+    return registry
@@ -0,0 +1,166 @@
+import copy
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Set
+
+from incremental import Fingerprint
+from templates import DEFAULT_LOCALE
+
+DEFAULT_FROM_DATE = 1663665682
+
+
+@dataclass
+class Subscription:
+    """
+    Подписка одного чата на статусы домашек одного студента.
+
+    Хранит токен API Практикума, идентификатор чата Telegram
+    и временную метку, с которой запрашиваются обновления.
+    Язык locale и собственный шаблон template задают вид сообщений
+    о статусах, см. templates.py. Приостановленная командой /pause
+    подписка не опрашивается. shared отмечает, что тот же токен
+    есть у других подписок реестра, saved_date — временную метку,
+    последней сохраненную в хранилище.
+    """
+
+    token: str
+    chat_id: str
+    current_date: int = DEFAULT_FROM_DATE
+    last_message: str = ''
+    locale: str = DEFAULT_LOCALE
+    template: Optional[str] = None
+    paused: bool = False
+    fingerprint: Fingerprint = field(default_factory=Fingerprint, repr=False)
+    reviewing: Set[str] = field(default_factory=set, repr=False)
+    shared: bool = field(default=False, init=False, repr=False)
+    saved_date: Optional[int] = field(default=None, init=False, repr=False)
+    key: str = field(init=False, repr=False)
+
+    def __post_init__(self):
+        """Вычисляет ключ подписки, не раскрывающий токен."""
+        self.chat_id = str(self.chat_id)
+        self.key = make_key(self.token, self.chat_id)
+
+    def snapshot(self):
+        """
+        Возвращает копию подписки для опроса в пуле потоков.
+
+        Опрос меняет временную метку, отпечаток ответа и набор работ
+        на проверке только у копии. Подписка получает их через
+        adopt, когда результат опроса принят, так что брошенный
+        по таймауту опрос ничего в ней не сдвинет.
+        """
+        state = copy.copy(self)
+        state.fingerprint = copy.copy(self.fingerprint)
+        state.reviewing = set(self.reviewing)
+        return state
+
+    def adopt(self, state):
+        """Переносит в подписку результат опроса ее копии snapshot."""
+        self.current_date = state.current_date
+        self.fingerprint = state.fingerprint
+        self.reviewing = state.reviewing
+
+
+def make_key(token, chat_id):
+    """Возвращает короткий стабильный ключ пары (токен, чат)."""
+    raw = f'{token}:{chat_id}'.encode()
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+class SubscriptionRegistry:
+    """
+    Реестр подписок.
+
+    Доступ к подписке по ключу, к подпискам чата и к подпискам
+    токена — O(1), повторное добавление той же пары (токен, чат)
+    возвращает уже существующую подписку.
+    """
+
+    def __init__(self):
+        """Создает пустой реестр."""
+        self._subscriptions: Dict[str, Subscription] = {}
+        self._chats: Dict[str, Set[str]] = {}
+        self._tokens: Dict[str, Set[str]] = {}
+
+    def add(self, token, chat_id, current_date=DEFAULT_FROM_DATE,
+            locale=DEFAULT_LOCALE, template=None):
+        """Регистрирует подписку и возвращает ее."""
+        key = make_key(token, chat_id)
+        subscription = self._subscriptions.get(key)
+        if subscription is None:
+            subscription = Subscription(
+                token, chat_id, current_date, locale=locale,
+                template=template)
+            self._subscriptions[key] = subscription
+            self._chats.setdefault(subscription.chat_id, set()).add(key)
+            self._tokens.setdefault(token, set()).add(key)
+            self._mark_shared(token)
+        return subscription
+
+    def remove(self, key):
+        """Удаляет подписку по ключу, если она есть."""
+        subscription = self._subscriptions.pop(key, None)
+        if subscription is not None:
+            keys = self._chats.get(subscription.chat_id, set())
+            keys.discard(key)
+            if not keys:
+                self._chats.pop(subscription.chat_id, None)
+            keys = self._tokens.get(subscription.token, set())
+            keys.discard(key)
+            if not keys:
+                self._tokens.pop(subscription.token, None)
+            self._mark_shared(subscription.token)
+        return subscription
+
+    def _mark_shared(self, token):
+        """Отмечает подписки токена, если их больше одной."""
+        keys = self._tokens.get(token, ())
+        for key in keys:
+            self._subscriptions[key].shared = len(keys) > 1
+
+    def get(self, key) -> Optional[Subscription]:
+        """Возвращает подписку по ключу или None."""
+        return self._subscriptions.get(key)
+
+    def for_chat(self, chat_id) -> List[Subscription]:
+        """Возвращает подписки чата."""
+        keys = self._chats.get(str(chat_id), ())
+        return [self._subscriptions[key] for key in sorted(keys)]
+
+    def for_token(self, token) -> List[Subscription]:
+        """Возвращает подписки с токеном API Практикума."""
+        keys = self._tokens.get(token, ())
+        return [self._subscriptions[key] for key in sorted(keys)]
+
+    def __contains__(self, key):
+        """Проверяет наличие подписки с ключом."""
+        return key in self._subscriptions
+
+    def __len__(self):
+        """Возвращает количество подписок."""
+        return len(self._subscriptions)
+
+    def __iter__(self) -> Iterator[Subscription]:
+        """Итерирует по снимку подписок, чтобы реестр можно было менять."""
+        return iter(list(self._subscriptions.values()))
+
+
+def load_subscriptions(registry, path):
+    """
+    Загружает подписки из JSON-файла в реестр.
+
+    Файл содержит список объектов с ключами token и chat_id
+    и необязательными current_date, locale и template.
+    """
+    with open(path, encoding='utf-8') as file:
+        entries = json.load(file)
+    for entry in entries:
+        registry.add(
+            entry['token'],
+            entry['chat_id'],
+            entry.get('current_date', DEFAULT_FROM_DATE),
+            entry.get('locale', DEFAULT_LOCALE),
+            entry.get('template'))
+    return registry
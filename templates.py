@@ -0,0 +1,111 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_LOCALE = 'ru'
+MEMO_SIZE = 4096
+CATALOG_SIZE = 256
+MARK = '\x00'
+
+TEMPLATES = {
+    'ru': 'Изменился статус проверки работы "{name}". {verdict}',
+    'en': 'The review status of "{name}" has changed. {verdict}',
+}
+VERDICTS = {
+    'en': {
+        'approved': 'The reviewer liked everything. Hooray!',
+        'reviewing': 'The reviewer has started checking the work.',
+        'rejected': 'The reviewer has left some comments.',
+    },
+}
+
+
+class MessageTemplate:
+    """
+    Скомпилированный шаблон сообщения о статусе.
+
+    Для каждого статуса шаблон заранее разбит по местам имени
+    работы с уже подставленным вердиктом, так что готовое
+    сообщение — это одна склейка строк. Готовые сообщения
+    запоминаются по паре (имя работы, статус) в LRU на memo_size
+    записей: при массовой проверке одной работы у многих студентов
+    строка берется из памяти.
+    """
+
+    def __init__(self, template, verdicts, memo_size=MEMO_SIZE):
+        """Компилирует шаблон с полями {name} и {verdict}."""
+        self.template = template
+        self.memo_size = memo_size
+        self._parts = {
+            status: template.format(name=MARK, verdict=verdict).split(MARK)
+            for status, verdict in verdicts.items()}
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    def render(self, name, status):
+        """
+        Возвращает сообщение; для неизвестного статуса KeyError.
+
+        Попадание в память обходится без блокировки: get и move_to_end
+        у OrderedDict атомарны, а запись, вытесненную между ними
+        другим потоком, достаточно не поднимать.
+        """
+        key = (name, status)
+        message = self._memo.get(key)
+        if message is not None:
+            try:
+                self._memo.move_to_end(key)
+            except KeyError:
+                pass
+            return message
+        message = name.join(self._parts[status])
+        with self._lock:
+            self._memo[key] = message
+            if len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return message
+
+
+class TemplateCatalog:
+    """
+    Шаблоны сообщений по языкам и пользовательские шаблоны чатов.
+
+    Вердикты языка по умолчанию задает бот, для других языков
+    берутся из VERDICTS. Скомпилированные шаблоны хранятся в LRU
+    на size записей, поэтому собственный шаблон чата компилируется
+    один раз, а не на каждое сообщение.
+    """
+
+    def __init__(self, verdicts, default_locale=DEFAULT_LOCALE,
+                 memo_size=MEMO_SIZE, size=CATALOG_SIZE):
+        """Создает каталог с вердиктами verdicts языка по умолчанию."""
+        self.verdicts = dict(VERDICTS, **{default_locale: verdicts})
+        self.default_locale = default_locale
+        self.memo_size = memo_size
+        self.size = size
+        self._compiled = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, locale=None, template=None):
+        """
+        Возвращает скомпилированный шаблон.
+
+        Неизвестный язык заменяется языком по умолчанию, а без
+        template берется стандартный шаблон языка.
+        """
+        if locale not in self.verdicts:
+            locale = self.default_locale
+        template = template or TEMPLATES.get(
+            locale, TEMPLATES[DEFAULT_LOCALE])
+        key = (locale, template)
+        with self._lock:
+            compiled = self._compiled.get(key)
+            if compiled is not None:
+                self._compiled.move_to_end(key)
+                return compiled
+        compiled = MessageTemplate(
+            template, self.verdicts[locale], self.memo_size)
+        with self._lock:
+            compiled = self._compiled.setdefault(key, compiled)
+            if len(self._compiled) > self.size:
+                self._compiled.popitem(last=False)
+        return compiled
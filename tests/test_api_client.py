@@ -0,0 +1,66 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from api_client import PracticumClient
+
+
+class PracticumHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    delay = 0
+
+    def do_GET(self):
+        self.server.peers.append(self.client_address)
+        time.sleep(self.delay)
+        body = json.dumps({'homeworks': [], 'current_date': 1}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PracticumHandler)
+    server.daemon_threads = True
+    server.peers = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def server_url(server):
+    host, port = server.server_address
+    return f'http://{host}:{port}/api/user_api/homework_statuses/'
+
+
+class TestPracticumClient:
+
+    def test_connection_is_reused(self, fake_server):
+        client = PracticumClient(server_url(fake_server), pool_size=2)
+        for _ in range(5):
+            response = client.get('token', 0)
+            assert response.status_code == 200
+        client.close()
+        assert len(fake_server.peers) == 5
+        assert len(set(fake_server.peers)) == 1, (
+            'Проверьте, что клиент переиспользует keep-alive соединение'
+        )
+
+    def test_read_timeout(self, fake_server, monkeypatch):
+        monkeypatch.setattr(PracticumHandler, 'delay', 0.5)
+        client = PracticumClient(
+            server_url(fake_server), connect_timeout=1, read_timeout=0.1)
+        with pytest.raises(requests.Timeout):
+            client.get('token', 0)
+        client.close()
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import time
+
+import subscriptions
+from control import LoopControl
+from utils import MockBot
+
+
+class TestAsyncPoll:
+
+    def test_polls_run_concurrently(self, monkeypatch):
+        import homework
+
+        def slow_get_api_update(subscription):
+            time.sleep(0.2)
+            return {
+                'homeworks': [],
+                'current_date': subscription.current_date + 1}
+
+        monkeypatch.setattr(homework, 'get_api_update', slow_get_api_update)
+        registry = subscriptions.SubscriptionRegistry()
+        for chat_id in range(5):
+            registry.add('token', chat_id, 10)
+        scheduler = homework.make_scheduler(registry)
+        for subscription in registry:
+            scheduler.postpone(subscription.key, 0)
+        bot = MockBot()
+        control = LoopControl()
+        threading.Timer(0.1, control.request_stop).start()
+
+        started = time.monotonic()
+        try:
+            homework.run_async(homework.main_async(
+                bot, registry, scheduler, control=control))
+        finally:
+            control.close()
+        elapsed = time.monotonic() - started
+
+        assert elapsed < 0.6, (
+            'Проверьте, что опросы подписок в асинхронном режиме '
+            'выполняются одновременно'
+        )
+        assert len(bot.sent) == 5
+        assert all(item.current_date == 11 for item in registry)
+        assert len(scheduler) == 5 and scheduler.next_delay() > 0, (
+            'Проверьте, что после опроса подписки снова в расписании'
+        )
+
+    def test_failed_send_keeps_last_message(self, monkeypatch):
+        import homework
+
+        class FailingBot:
+            def send_message(self, chat_id=None, text=None):
+                raise RuntimeError('telegram недоступен')
+
+        monkeypatch.setattr(
+            homework, 'get_api_update',
+            lambda subscription: {'homeworks': [], 'current_date': 1})
+        subscription = subscriptions.Subscription('token', 1)
+        asyncio.run(homework.poll_subscription_async(FailingBot(), subscription))
+        assert subscription.last_message == '', (
+            'Проверьте, что неотправленное сообщение не считается '
+            'отправленным'
+        )
@@ -0,0 +1,43 @@
+import subscriptions
+from utils import MockBot
+
+
+class TestBatch:
+
+    def test_every_homework_is_reported(self, monkeypatch):
+        import homework
+
+        response = {
+            'homeworks': [
+                {'homework_name': 'hw1', 'status': 'approved'},
+                {'homework_name': 'hw2', 'status': 'rejected'},
+                {'homework_name': 'hw3', 'status': 'reviewing'},
+            ],
+            'current_date': 10,
+        }
+        monkeypatch.setattr(
+            homework, 'get_api_update', lambda subscription: response)
+        bot = MockBot()
+        homework.poll_subscription(bot, subscriptions.Subscription('t', 1))
+        assert len(bot.sent) == 1, (
+            'Проверьте, что изменения за тик уходят одним сообщением'
+        )
+        for name in ('hw1', 'hw2', 'hw3'):
+            assert f'"{name}"' in bot.sent[0]
+
+    def test_pack_messages_respects_limit(self):
+        import homework
+
+        lines = ['x' * 40 for _ in range(5)]
+        messages = homework.pack_messages(lines, limit=100, max_messages=5)
+        assert messages == ['\n'.join(['x' * 40] * 2)] * 2 + ['x' * 40]
+        assert all(len(text) <= 100 for text in messages)
+
+    def test_pack_messages_bounds_count(self):
+        import homework
+
+        lines = ['x' * 40 for _ in range(10)]
+        messages = homework.pack_messages(lines, limit=100, max_messages=2)
+        assert len(messages) == 2
+        assert messages[-1].endswith('И еще изменений: 6')
+        assert all(len(text) <= 100 for text in messages)
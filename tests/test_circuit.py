@@ -0,0 +1,140 @@
+import pytest
+import requests
+
+import subscriptions
+from api_client import PracticumClient
+from circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from exception import CircuitOpenError
+from utils import FakeClock
+
+
+class MockResponse:
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def make_breaker(clock, changes=None):
+    return CircuitBreaker(
+        failure_threshold=2, base_delay=10, max_delay=25, jitter=0,
+        clock=clock,
+        on_change=None if changes is None else (
+            lambda old, new: changes.append((old, new))))
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_threshold(self):
+        clock = FakeClock()
+        changes = []
+        breaker = make_breaker(clock, changes)
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow(), (
+            'Проверьте, что разомкнутый предохранитель не пропускает запросы'
+        )
+        assert changes == [(CLOSED, OPEN)]
+
+    def test_half_open_probe(self):
+        clock = FakeClock()
+        changes = []
+        breaker = make_breaker(clock, changes)
+        breaker.record_failure()
+        breaker.record_failure()
+        clock.now = 10
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow(), (
+            'Проверьте, что в полуоткрытом состоянии идет один пробный запрос'
+        )
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        assert changes[-1] == (HALF_OPEN, CLOSED)
+
+    def test_backoff_is_capped(self):
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.retry_at == 10
+        for expected in (20, 25, 25):
+            clock.now = breaker.retry_at
+            assert breaker.allow()
+            breaker.record_failure()
+            assert breaker.retry_at - clock.now == expected
+
+
+class TestClientWithBreaker:
+
+    def test_no_requests_while_open(self, monkeypatch):
+        calls = []
+
+        def fake_get(self, url, **kwargs):
+            calls.append(url)
+            return MockResponse(503)
+
+        monkeypatch.setattr(requests.Session, 'get', fake_get)
+        client = PracticumClient(
+            'http://api.test/', breaker=make_breaker(FakeClock()))
+        for _ in range(2):
+            assert client.get('token', 0).status_code == 503
+        with pytest.raises(CircuitOpenError):
+            client.get('token', 0)
+        assert len(calls) == 2
+
+    def test_client_errors_do_not_trip(self, monkeypatch):
+        monkeypatch.setattr(
+            requests.Session, 'get',
+            lambda self, url, **kwargs: MockResponse(401))
+        breaker = make_breaker(FakeClock())
+        client = PracticumClient('http://api.test/', breaker=breaker)
+        for _ in range(3):
+            client.get('token', 0)
+        assert breaker.state == CLOSED
+
+
+class TestOutageNotice:
+
+    def test_one_notice_per_chat(self, monkeypatch):
+        import homework
+
+        class Queue:
+            sent = []
+
+            def put(self, chat_id, text, on_sent=None):
+                self.sent.append((chat_id, text))
+
+        registry = subscriptions.SubscriptionRegistry()
+        registry.add('a', 1)
+        registry.add('b', 1)
+        registry.add('c', 2)
+        queue = Queue()
+        homework.notify_outage(registry, queue, CLOSED, OPEN)
+        homework.notify_outage(registry, queue, OPEN, HALF_OPEN)
+        homework.notify_outage(registry, queue, HALF_OPEN, OPEN)
+        assert sorted(queue.sent) == [
+            ('1', homework.OUTAGE_MESSAGE), ('2', homework.OUTAGE_MESSAGE)]
+        homework.notify_outage(registry, queue, HALF_OPEN, CLOSED)
+        assert len(queue.sent) == 4
+
+    def test_outage_errors_are_not_sent_to_chat(self, monkeypatch):
+        import homework
+
+        def failing_update(subscription):
+            raise CircuitOpenError('API недоступен')
+
+        monkeypatch.setattr(homework, 'get_api_update', failing_update)
+
+        class Bot:
+            sent = []
+
+            def send_message(self, chat_id=None, text=None):
+                self.sent.append(text)
+
+        bot = Bot()
+        outcome = homework.poll_subscription(
+            bot, subscriptions.Subscription('t', 1))
+        assert outcome == homework.ERROR
+        assert bot.sent == []
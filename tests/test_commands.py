@@ -0,0 +1,140 @@
+import threading
+import time
+from functools import partial
+
+import pytest
+import telegram
+from telegram.utils.request import Request
+
+import homework
+from commands import NOT_SUBSCRIBED_MESSAGE, CommandHandler
+from control import LoopControl
+from fake_server import FakeServer
+from scheduler import PollScheduler
+from storage import SQLiteStateStore, restore_registry
+from subscriptions import SubscriptionRegistry
+
+
+@pytest.fixture
+def server():
+    with FakeServer() as server:
+        yield server
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStateStore(str(tmp_path / 'state.db'))
+    yield store
+    store.close()
+
+
+def make_bot(server):
+    return telegram.Bot(
+        '123:test', base_url=server.telegram_url,
+        request=Request(con_pool_size=4))
+
+
+def make_handler(server, registry, store=None, wake=None):
+    bot = make_bot(server)
+    return CommandHandler(
+        bot, registry, partial(homework.send_message_to, bot), store,
+        timeout=0, wake=wake)
+
+
+class TestCommandHandler:
+
+    def test_status_uses_known_state(self, server):
+        registry = SubscriptionRegistry()
+        subscription = registry.add('token', 5)
+        subscription.last_message = 'Работа проверена'
+        handler = make_handler(server, registry)
+        server.push_message(5, '/status')
+        server.push_message(6, '/status')
+        assert handler.poll_once() == 2
+        assert server.sent == [
+            (5, 'Работа проверена'), (6, NOT_SUBSCRIBED_MESSAGE)]
+        assert server.scripts == {}, (
+            'Проверьте, что /status не обращается к API Практикума'
+        )
+
+    def test_status_reads_shared_store(self, server, store):
+        registry = SubscriptionRegistry()
+        subscription = registry.add('token', 5)
+        subscription.last_message = 'Работа на проверке'
+        store.save(subscription.key, 100, 'Работа проверена')
+        handler = make_handler(server, registry, store)
+        server.push_message(5, '/status')
+        handler.poll_once()
+        assert server.sent == [(5, 'Работа проверена')], (
+            'Проверьте, что /status берет состояние подписки, '
+            'которую опрашивает другой воркер, из общего хранилища'
+        )
+
+    def test_updates_are_confirmed(self, server):
+        handler = make_handler(server, SubscriptionRegistry())
+        server.push_message(5, '/help')
+        server.push_message(5, 'просто текст')
+        assert handler.poll_once() == 2
+        assert handler.poll_once() == 0
+        assert len(server.sent) == 1
+
+    def test_subscribe_schedules_and_persists(self, server, store):
+        registry = SubscriptionRegistry()
+        scheduler = PollScheduler(jitter=0)
+        handler = make_handler(server, registry, store)
+        server.push_message(7, '/subscribe secret')
+        server.push_message(7, '/subscribe secret')
+        handler.poll_once()
+        subscription, = registry.for_chat(7)
+        assert subscription.token == 'secret'
+        handler.apply(scheduler)
+        assert scheduler.pop_due() == [subscription.key]
+        assert 'уже подписан' in server.sent[-1][1]
+        restored = restore_registry(SubscriptionRegistry(), store)
+        assert [item.key for item in restored] == [subscription.key]
+
+    def test_pause_and_resume(self, server, store):
+        registry = SubscriptionRegistry()
+        subscription = registry.add('token', 8)
+        scheduler = PollScheduler(jitter=0)
+        scheduler.postpone(subscription.key, 0)
+        handler = make_handler(server, registry, store)
+        server.push_message(8, '/pause')
+        handler.poll_once()
+        assert homework.due_subscriptions(registry, scheduler) == []
+        assert subscription.key not in scheduler
+        assert restore_registry(SubscriptionRegistry(), store).get(
+            subscription.key).paused
+
+        server.push_message(8, '/resume')
+        handler.poll_once()
+        handler.apply(scheduler)
+        assert homework.due_subscriptions(registry, scheduler) == [
+            subscription]
+
+    def test_runs_alongside_polling(self, server):
+        registry = SubscriptionRegistry()
+        scheduler = PollScheduler(jitter=0)
+        control = LoopControl()
+        handler = make_handler(server, registry, wake=control.wake)
+        handler.timeout = 1
+        handler.start()
+        woke = threading.Event()
+
+        def sleep():
+            control.sleep(5)
+            woke.set()
+
+        sleeper = threading.Thread(target=sleep)
+        sleeper.start()
+        server.push_message(9, '/subscribe token')
+        sleeper.join(5)
+        handler.stop(5)
+        control.close()
+        assert woke.is_set()
+        handler.apply(scheduler)
+        assert len(scheduler) == 1
+        deadline = time.monotonic() + 5
+        while not server.sent and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert server.sent[0][0] == 9
@@ -0,0 +1,205 @@
+import dataclasses
+import json
+import os
+import signal
+
+import pytest
+
+import homework
+from config import Config, load_config
+from control import LoopControl
+from delivery import DeliveryQueue
+from exception import ConfigError
+from fetcher import ConcurrentFetcher
+from scheduler import PollScheduler
+
+
+class TestConfig:
+
+    def test_defaults(self):
+        config = Config()
+        assert config.retry_time == 600
+        assert config.in_flight == config.poll_concurrency
+        assert config.commands is True
+        assert config.metrics_port is None
+
+    def test_values_are_parsed(self):
+        config = Config.from_mapping({
+            'RETRY_TIME': '300', 'POLL_JITTER': '0.2', 'COMMANDS': 'off',
+            'METRICS_PORT': '9100', 'POLL_IN_FLIGHT': '8', 'LOG_FILE': ''})
+        assert config.retry_time == 300
+        assert config.poll_jitter == 0.2
+        assert config.commands is False
+        assert config.metrics_port == 9100
+        assert config.in_flight == 8
+        assert config.log_file == 'main.log', (
+            'Проверьте, что пустое значение оставляет поле по умолчанию'
+        )
+
+    def test_errors_are_collected(self):
+        with pytest.raises(ConfigError) as error:
+            Config.from_mapping({
+                'RETRY_TIME': 'часто', 'COMMANDS': 'maybe',
+                'POLL_MODE': 'threads'})
+        message = str(error.value)
+        assert 'RETRY_TIME' in message
+        assert 'COMMANDS' in message
+        with pytest.raises(ConfigError) as error:
+            Config.from_mapping({'POLL_MODE': 'threads', 'POOL_SIZE': '0'})
+        assert 'POLL_MODE' in str(error.value)
+        assert 'POOL_SIZE' in str(error.value), (
+            'Проверьте, что все неверные значения попадают в одну ошибку'
+        )
+
+    @pytest.mark.parametrize('values', [
+        {'REVIEWING_RETRY_TIME': '700'},
+        {'RETRY_TIME': '5000'},
+        {'BREAKER_DELAY': '4000'},
+        {'TELEGRAM_CHAT_RATE': '40'},
+        {'TELEGRAM_TOKEN': 'не токен'},
+        {'TELEGRAM_TOKEN': '1:abc'},
+    ])
+    def test_relations_are_checked(self, values):
+        with pytest.raises(ConfigError):
+            Config.from_mapping(values)
+
+    def test_sharded_commands_need_one_worker(self):
+        with pytest.raises(ConfigError) as error:
+            Config.from_mapping({'SHARD_LEASES': 'leases.db'})
+        assert 'COMMANDS_WORKER' in str(error.value)
+        config = Config.from_mapping(
+            {'SHARD_LEASES': 'leases.db', 'COMMANDS_WORKER': 'worker.1'})
+        assert config.reads_commands('worker.1')
+        assert not config.reads_commands('worker.2'), (
+            'Проверьте, что с SHARD_LEASES команды читает один воркер'
+        )
+        assert Config(commands=False, shard_leases='leases.db')
+        assert Config().reads_commands(None)
+
+    def test_bot_token_format(self):
+        assert Config.from_mapping({'TELEGRAM_TOKEN': '123:abc-_1'})
+        with pytest.raises(ConfigError):
+            Config.from_mapping({'TELEGRAM_TOKEN': '12:abc'})
+
+    def test_sharded_state_needs_sqlite(self):
+        with pytest.raises(ConfigError) as error:
+            Config(
+                commands=False, shard_leases='leases.db',
+                state_backend='file')
+        assert 'STATE_BACKEND=sqlite' in str(error.value), (
+            'Проверьте, что SHARD_LEASES нельзя сочетать '
+            'с файловым хранилищем'
+        )
+        assert Config(state_backend='file')
+
+    def test_reload_keeps_restart_only_fields(self):
+        old = Config(pool_size=10, retry_time=600)
+        new = Config(pool_size=20, retry_time=300)
+        config, ignored = old.reload(new)
+        assert config.pool_size == 10
+        assert config.retry_time == 300
+        assert ignored == ['POOL_SIZE']
+        assert old.changed(config) == ['RETRY_TIME']
+
+
+class TestLoadConfig:
+
+    def test_sources_precedence(self, tmp_path):
+        env_file = tmp_path / '.env'
+        env_file.write_text(
+            'RETRY_TIME=300\nMAX_RETRY_TIME=1200\nPOLL_TIMEOUT=20\n')
+        config_file = tmp_path / 'settings.json'
+        config_file.write_text(json.dumps({'POLL_TIMEOUT': 5}))
+        config = load_config(
+            {'MAX_RETRY_TIME': '2400', 'CONFIG_FILE': str(config_file)},
+            str(env_file))
+        assert config.retry_time == 300
+        assert config.max_retry_time == 2400, (
+            'Проверьте, что окружение перекрывает .env'
+        )
+        assert config.poll_timeout == 5, (
+            'Проверьте, что файл настроек перекрывает окружение'
+        )
+
+    def test_dotenv_config_file(self, tmp_path):
+        config_file = tmp_path / 'worker.env'
+        config_file.write_text('POLL_JITTER=0.3\n')
+        config = load_config({}, None, str(config_file))
+        assert config.poll_jitter == 0.3
+
+    def test_missing_config_file(self, tmp_path):
+        with pytest.raises(ConfigError):
+            load_config({}, None, str(tmp_path / 'missing.json'))
+
+
+class TestReload:
+
+    def test_apply_config_updates_live_objects(self, monkeypatch):
+        monkeypatch.setattr(homework, 'CONFIG', homework.CONFIG)
+        monkeypatch.setattr(homework, '_client', None)
+        client = homework.get_client()
+        session = client.session
+        scheduler = PollScheduler(jitter=0)
+        queue = DeliveryQueue(lambda chat_id, text: None)
+        queue._bucket(1)
+        fetcher = ConcurrentFetcher(2)
+        config = dataclasses.replace(
+            homework.CONFIG, endpoint='http://127.0.0.1:1/api/',
+            retry_time=300, poll_in_flight=1, poll_timeout=7,
+            telegram_chat_rate=0.5, breaker_threshold=2)
+        try:
+            homework.apply_config(config, scheduler, queue, fetcher)
+        finally:
+            fetcher.close()
+        assert homework.CONFIG is config
+        assert client.endpoint == 'http://127.0.0.1:1/api/'
+        assert client.session is session, (
+            'Проверьте, что пул соединений сохраняется при перечитывании'
+        )
+        assert client.breaker.failure_threshold == 2
+        assert scheduler.base_interval == 300
+        assert (fetcher.max_in_flight, fetcher.timeout) == (1, 7)
+        assert queue._bucket(1).rate == 0.5
+
+    def test_invalid_reload_keeps_config(self, monkeypatch, tmp_path):
+        config_file = tmp_path / 'settings.json'
+        config_file.write_text(json.dumps({'RETRY_TIME': 0}))
+        monkeypatch.setenv('CONFIG_FILE', str(config_file))
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(homework, 'CONFIG', homework.CONFIG)
+        old = homework.CONFIG
+        assert not homework.reload_config()
+        assert homework.CONFIG is old
+        config_file.write_text(json.dumps({'RETRY_TIME': 300}))
+        assert homework.reload_config()
+        assert homework.CONFIG.retry_time == 300
+
+
+class TestLoopControl:
+
+    def test_wake_interrupts_sleep(self):
+        control = LoopControl()
+        try:
+            assert not control.sleep(0)
+            control.wake()
+            control.wake()
+            assert control.sleep(5)
+            assert not control.sleep(0), (
+                'Проверьте, что sleep сбрасывает накопленные пробуждения'
+            )
+        finally:
+            control.close()
+
+    @pytest.mark.skipif(
+        not hasattr(signal, 'SIGHUP'), reason='SIGHUP недоступен')
+    def test_sighup_requests_reload(self):
+        previous = signal.getsignal(signal.SIGHUP)
+        control = LoopControl().install()
+        try:
+            os.kill(os.getpid(), signal.SIGHUP)
+            assert control.sleep(5)
+            assert control.take_reload()
+            assert not control.take_reload()
+        finally:
+            signal.signal(signal.SIGHUP, previous)
+            control.close()
@@ -0,0 +1,124 @@
+import dataclasses
+import json
+
+import pytest
+
+import decoding
+import homework
+from api_client import PracticumClient
+from decoding import HomeworkStream, get_loads
+from exception import InvalidResponseError
+from fake_server import FakeServer, Script
+from subscriptions import Subscription
+
+
+def chunks(data, size=1):
+    raw = data if isinstance(data, bytes) else json.dumps(
+        data, ensure_ascii=False).encode()
+    return [raw[start:start + size] for start in range(0, len(raw), size)]
+
+
+class TestGetLoads:
+
+    def test_auto_prefers_orjson(self, monkeypatch):
+        sentinel = type('orjson', (), {'loads': staticmethod(json.loads)})
+        monkeypatch.setattr(decoding, 'orjson', sentinel)
+        assert get_loads() is sentinel.loads
+        assert get_loads('json') is json.loads
+
+    def test_auto_falls_back_to_stdlib(self, monkeypatch):
+        monkeypatch.setattr(decoding, 'orjson', None)
+        assert get_loads() is json.loads
+        with pytest.raises(ValueError):
+            get_loads('orjson')
+
+    def test_unknown_decoder(self):
+        with pytest.raises(ValueError):
+            get_loads('yaml')
+
+
+class TestHomeworkStream:
+
+    def test_items_and_fields(self):
+        data = {
+            'homeworks': [
+                {'id': 1, 'homework_name': 'Проект', 'status': 'approved'},
+                {'id': 22, 'homework_name': 'hw', 'status': 'reviewing'},
+            ],
+            'current_date': 1700000000,
+        }
+        closed = []
+        stream = HomeworkStream(chunks(data), lambda: closed.append(True))
+        assert list(stream) == data['homeworks']
+        assert stream.fields == {'current_date': 1700000000}
+        assert closed == [True]
+
+    def test_fields_before_homeworks(self):
+        raw = b'{"current_date": 12345 , "homeworks" : [ ] }'
+        stream = HomeworkStream(chunks(raw, 3))
+        assert list(stream) == []
+        assert stream.fields == {'current_date': 12345}
+
+    @pytest.mark.parametrize('raw, message', [
+        (b'[]', 'не является словарем'),
+        (b'{"current_date": 1}', 'нет ключа homeworks'),
+        (b'{"homeworks": {}, "current_date": 1}', 'не является списком'),
+        (b'{"homeworks": [{"id": 1}', 'оборвался'),
+        (b'{"homeworks": [nope]}', 'не является JSON'),
+    ])
+    def test_bad_response(self, raw, message):
+        with pytest.raises(InvalidResponseError, match=message):
+            list(HomeworkStream(chunks(raw, 4)))
+
+    def test_can_be_read_once(self):
+        stream = HomeworkStream(chunks({'homeworks': []}))
+        list(stream)
+        with pytest.raises(RuntimeError):
+            list(stream)
+
+
+class TestStreamingPoll:
+
+    def test_process_stream(self):
+        data = {
+            'homeworks': [
+                {'id': 1, 'homework_name': 'hw1', 'status': 'reviewing'},
+                {'id': 2, 'homework_name': 'hw2', 'status': 'lost'},
+            ],
+            'current_date': 99,
+        }
+        subscription = Subscription('token', '1', 0)
+        lines, changes = homework.process_response(
+            subscription, HomeworkStream(chunks(data, 7)))
+        assert changes == [('1', 'reviewing')]
+        assert len(lines) == 1
+        assert subscription.reviewing == {'1'}
+        assert subscription.current_date == 99
+
+    def test_large_response_is_streamed(self, monkeypatch):
+        with FakeServer(scripts={'token': Script(['reviewing'])}) as server:
+            monkeypatch.setattr(homework, 'CONFIG', dataclasses.replace(
+                homework.CONFIG, endpoint=server.endpoint,
+                stream_threshold=10))
+            monkeypatch.setattr(homework, '_client', None)
+            subscription = Subscription('token', '1', 0)
+            response = homework.get_api_update(subscription)
+            assert isinstance(response, HomeworkStream)
+            lines, changes = homework.process_response(
+                subscription, response)
+            homework.get_client().close()
+        assert changes == [('1', 'reviewing')]
+        assert subscription.current_date > 0
+
+    def test_client_uses_loads(self):
+        calls = []
+
+        def loads(content):
+            calls.append(content)
+            return json.loads(content)
+
+        with FakeServer() as server:
+            client = PracticumClient(server.endpoint, loads=loads)
+            data = client.get('token', 0).json()
+            client.close()
+        assert calls and data['homeworks']
@@ -0,0 +1,126 @@
+import threading
+import time
+
+from delivery import DeliveryQueue, TokenBucket
+from utils import FakeClock
+
+
+class RetryAfter(Exception):
+
+    def __init__(self, retry_after):
+        super().__init__(f'Flood control, retry in {retry_after}')
+        self.retry_after = retry_after
+
+
+class Recorder:
+
+    def __init__(self, failures=()):
+        self.sent = []
+        self.failures = list(failures)
+        self.lock = threading.Lock()
+
+    def __call__(self, chat_id, text):
+        with self.lock:
+            if self.failures:
+                raise self.failures.pop(0)
+            self.sent.append((chat_id, text))
+
+
+class TestTokenBucket:
+
+    def test_rate_is_respected(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+        assert bucket.consume()
+        assert bucket.consume()
+        assert not bucket.consume()
+        assert bucket.delay() == 0.5
+        clock.now = 0.5
+        assert bucket.consume()
+
+    def test_pause(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, capacity=1, clock=clock)
+        bucket.pause(3)
+        assert bucket.delay() == 3
+        clock.now = 3
+        assert bucket.consume()
+
+
+class TestDeliveryQueue:
+
+    def test_pending_messages_are_coalesced(self):
+        send = Recorder()
+        queue = DeliveryQueue(send, workers=1, chat_rate=1000)
+        for number in range(3):
+            queue.put(1, f'строка {number}')
+        queue.start()
+        assert queue.close(timeout=5)
+        assert send.sent == [(1, 'строка 0\nстрока 1\nстрока 2')], (
+            'Проверьте, что ожидающие сообщения одного чата склеиваются'
+        )
+
+    def test_retry_after_is_honoured(self):
+        send = Recorder(failures=[RetryAfter(0.2)])
+        delivered = threading.Event()
+        queue = DeliveryQueue(send, workers=2, chat_rate=1000).start()
+        queue.put(1, 'текст', on_sent=delivered.set)
+        assert delivered.wait(timeout=0.1) is False, (
+            'Проверьте, что после RetryAfter чат ставится на паузу'
+        )
+        assert delivered.wait(timeout=5)
+        assert send.sent == [(1, 'текст')]
+        queue.close(timeout=5)
+
+    def test_gives_up_after_max_attempts(self):
+        send = Recorder(failures=[RuntimeError('сбой')] * 5)
+        delivered = threading.Event()
+        queue = DeliveryQueue(
+            send, workers=1, chat_rate=1000, max_attempts=1).start()
+        queue.put(1, 'текст', on_sent=delivered.set)
+        assert queue.close(timeout=5)
+        assert not delivered.is_set()
+        assert send.sent == []
+
+    def test_chat_rate_limit(self):
+        send = Recorder()
+        queue = DeliveryQueue(send, workers=4, chat_rate=5, limit=5)
+        started = time.monotonic()
+        queue.start()
+        for number in range(3):
+            queue.put('chat', f'msg{number}')
+        assert queue.close(timeout=5)
+        assert len(send.sent) == 3
+        assert time.monotonic() - started >= 0.35, (
+            'Проверьте, что в один чат уходит не больше chat_rate '
+            'сообщений в секунду'
+        )
+
+    def test_poll_enqueues_and_saves_after_delivery(self, monkeypatch):
+        import homework
+        import subscriptions
+
+        class Store:
+            saved = []
+
+            def save(self, *args):
+                self.saved.append(args)
+
+        response = {
+            'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+            'current_date': 10,
+        }
+        monkeypatch.setattr(
+            homework, 'get_api_update', lambda subscription: response)
+        send = Recorder()
+        queue = DeliveryQueue(send, workers=1)
+        store = Store()
+        subscription = subscriptions.Subscription('t', 1)
+        homework.poll_subscription(None, subscription, store, None, queue)
+        assert store.saved == [], (
+            'Проверьте, что состояние сохраняется только после доставки'
+        )
+        queue.start()
+        assert queue.close(timeout=5)
+        assert len(send.sent) == 1
+        assert store.saved[0][1] == 10
@@ -0,0 +1,90 @@
+import dataclasses
+import time
+
+import pytest
+import telegram
+from telegram.utils.request import Request
+
+import homework
+from api_client import PracticumClient
+from fake_server import FakeServer, Script
+
+
+@pytest.fixture
+def server():
+    with FakeServer(seed=1) as server:
+        yield server
+
+
+def make_bot(server):
+    return telegram.Bot(
+        '123:test', base_url=server.telegram_url,
+        request=Request(con_pool_size=2))
+
+
+class TestFakeServer:
+
+    def test_script_changes_status(self, server):
+        server.scripts['token'] = Script(['reviewing', 'approved'])
+        client = PracticumClient(server.endpoint, pool_size=1)
+        statuses = []
+        for _ in range(3):
+            data = client.get('token', 0).json()
+            statuses.append(data['homeworks'][0]['status'])
+        client.close()
+        assert statuses == ['reviewing', 'approved', 'approved']
+        assert server.connections == 1
+
+    def test_unchanged_homeworks_are_filtered(self, server):
+        client = PracticumClient(server.endpoint, pool_size=1)
+        first = client.get('token', 0).json()
+        second = client.get('token', first['current_date'] + 1).json()
+        client.close()
+        assert len(first['homeworks']) == 1
+        assert second['homeworks'] == []
+
+    def test_requires_token(self, server):
+        client = PracticumClient(server.endpoint, pool_size=1)
+        response = client.session.get(server.endpoint)
+        client.close()
+        assert response.status_code == 401
+
+    def test_error_rate(self):
+        with FakeServer(error_rate=1) as server:
+            client = PracticumClient(server.endpoint, pool_size=1)
+            response = client.get('token', 0)
+            client.close()
+        assert response.status_code == 500
+
+    def test_send_message(self, server):
+        bot = make_bot(server)
+        homework.send_message_to(bot, 42, 'Привет')
+        assert server.sent == [(42, 'Привет')]
+
+    def test_flood_control(self):
+        with FakeServer(flood_limit=1, retry_after=3) as server:
+            bot = make_bot(server)
+            bot.send_message(1, 'первое')
+            with pytest.raises(telegram.error.RetryAfter) as error:
+                bot.send_message(1, 'второе')
+            bot.send_message(2, 'другой чат')
+        assert error.value.retry_after == 3
+        assert server.sent == [(1, 'первое'), (2, 'другой чат')]
+
+    def test_bot_uses_configured_urls(self, server, monkeypatch):
+        monkeypatch.setattr(homework, 'CONFIG', dataclasses.replace(
+            homework.CONFIG, telegram_api_url=server.telegram_url))
+        monkeypatch.setattr(homework, 'TELEGRAM_TOKEN', '123:test')
+        homework.send_message_to(homework.make_bot(), 7, 'текст')
+        assert server.sent == [(7, 'текст')]
+
+    def test_get_updates_long_polling(self, server):
+        bot = make_bot(server)
+        started = time.monotonic()
+        assert bot.get_updates(timeout=0.2) == []
+        assert time.monotonic() - started >= 0.2
+        server.push_message(5, '/status')
+        update, = bot.get_updates(timeout=1)
+        assert update.message.text == '/status'
+        assert update.message.chat_id == 5
+        assert bot.get_updates(offset=update.update_id + 1) == []
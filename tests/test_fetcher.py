@@ -0,0 +1,136 @@
+import dataclasses
+import threading
+import time
+from functools import partial
+
+import homework
+from exception import PollTimeoutError
+from fake_server import FakeServer
+from fetcher import ConcurrentFetcher
+from subscriptions import Subscription
+
+
+class TestConcurrentFetcher:
+
+    def test_results_come_as_completed(self):
+        fetcher = ConcurrentFetcher(4)
+
+        def work(delay):
+            time.sleep(delay)
+            return delay * 10
+
+        started = time.monotonic()
+        results = list(fetcher.map(work, [0.3, 0.1, 0.2]))
+        elapsed = time.monotonic() - started
+        fetcher.close()
+        assert [item for item, _, _ in results] == [0.1, 0.2, 0.3]
+        assert [result for _, result, _ in results] == [1.0, 2.0, 3.0]
+        assert elapsed < 0.5, 'Проверьте, что вызовы идут параллельно'
+
+    def test_in_flight_is_bounded(self):
+        fetcher = ConcurrentFetcher(8, max_in_flight=2)
+        lock = threading.Lock()
+        state = {'now': 0, 'max': 0}
+
+        def work(item):
+            with lock:
+                state['now'] += 1
+                state['max'] = max(state['max'], state['now'])
+            time.sleep(0.02)
+            with lock:
+                state['now'] -= 1
+            return item
+
+        results = list(fetcher.map(work, range(10)))
+        fetcher.close()
+        assert len(results) == 10
+        assert state['max'] == 2
+
+    def test_errors_are_returned(self):
+        fetcher = ConcurrentFetcher(2)
+
+        def work(item):
+            raise ValueError(item)
+
+        [(item, result, error)] = fetcher.map(work, ['boom'])
+        fetcher.close()
+        assert item == 'boom' and result is None
+        assert isinstance(error, ValueError)
+
+    def test_timeout_abandons_task(self):
+        fetcher = ConcurrentFetcher(2, timeout=0.1)
+        release = threading.Event()
+
+        def work(item):
+            if item == 'slow':
+                release.wait(5)
+            return item
+
+        results = {
+            item: (result, error)
+            for item, result, error in fetcher.map(work, ['slow', 'fast'])}
+        assert results['fast'] == ('fast', None)
+        assert isinstance(results['slow'][1], PollTimeoutError)
+        [(_, _, error)] = fetcher.map(work, ['slow'])
+        assert isinstance(error, PollTimeoutError), (
+            'Проверьте, что элемент не запускается, пока идет прошлый вызов'
+        )
+        release.set()
+        time.sleep(0.05)
+        assert list(fetcher.map(work, ['slow'])) == [('slow', 'slow', None)]
+        fetcher.close()
+
+
+class TestParallelPoll:
+
+    def test_tick_takes_slowest_request(self, monkeypatch):
+        with FakeServer(latency=0.2) as server:
+            monkeypatch.setattr(homework, 'CONFIG', dataclasses.replace(
+                homework.CONFIG, endpoint=server.endpoint))
+            monkeypatch.setattr(homework, '_client', None)
+            subscriptions = [
+                Subscription(f'token-{number}', number, 0)
+                for number in range(10)]
+            fetcher = ConcurrentFetcher(10, key=lambda item: item.key)
+            started = time.monotonic()
+            results = list(fetcher.map(
+                partial(homework.poll_update, index=None), subscriptions))
+            elapsed = time.monotonic() - started
+            fetcher.close()
+            homework.get_client().close()
+        assert all(error is None for _, _, error in results)
+        assert all(lines for _, (lines, _, _), _ in results)
+        assert elapsed < 1, 'Проверьте, что подписки опрашиваются параллельно'
+
+    def test_abandoned_poll_keeps_cursor(self, monkeypatch):
+        release = threading.Event()
+        finished = threading.Event()
+        response = {
+            'homeworks': [
+                {'id': 1, 'homework_name': 'hw', 'status': 'approved'}],
+            'current_date': 99,
+        }
+
+        def slow_get_api_update(subscription):
+            release.wait(5)
+            return response
+
+        def poll(subscription):
+            try:
+                return homework.poll_update(subscription)
+            finally:
+                finished.set()
+
+        monkeypatch.setattr(homework, 'get_api_update', slow_get_api_update)
+        subscription = Subscription('token', 1, 10)
+        fetcher = ConcurrentFetcher(2, timeout=0.1, key=lambda item: item.key)
+        [(_, update, error)] = fetcher.map(poll, [subscription])
+        assert isinstance(error, PollTimeoutError)
+        homework.complete_poll(None, subscription, update, error)
+        release.set()
+        assert finished.wait(5)
+        fetcher.close()
+        assert subscription.current_date == 10, (
+            'Проверьте, что брошенный по таймауту опрос не сдвигает '
+            'временную метку подписки'
+        )
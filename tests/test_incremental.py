@@ -0,0 +1,91 @@
+import json
+from http import HTTPStatus
+
+import subscriptions
+from incremental import Fingerprint
+
+
+class MockResponse:
+
+    def __init__(self, data=None, status_code=HTTPStatus.OK, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = json.dumps(data).encode()
+        self.decoded = 0
+        self._data = data
+
+    def json(self):
+        self.decoded += 1
+        return self._data
+
+    def close(self):
+        pass
+
+
+class MockClient:
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.sent_headers = []
+
+    def get(self, token, from_date, headers=None):
+        self.sent_headers.append(headers)
+        return self.responses.pop(0)
+
+
+class TestIncremental:
+
+    def test_conditional_headers(self):
+        fingerprint = Fingerprint()
+        assert fingerprint.request_headers() == {}
+        fingerprint.remember_headers(
+            {'ETag': '"abc"', 'Last-Modified': 'Mon, 01 Jan 2024'})
+        assert fingerprint.request_headers() == {
+            'If-None-Match': '"abc"',
+            'If-Modified-Since': 'Mon, 01 Jan 2024',
+        }
+
+    def test_not_modified_skips_decoding(self, monkeypatch):
+        import homework
+
+        data = {'homeworks': [], 'current_date': 5}
+        first = MockResponse(data, headers={'ETag': '"v1"'})
+        second = MockResponse(data, status_code=HTTPStatus.NOT_MODIFIED)
+        client = MockClient([first, second])
+        monkeypatch.setattr(homework, '_client', client)
+        subscription = subscriptions.Subscription('token', 1, 0)
+
+        assert homework.get_api_update(subscription) == data
+        assert homework.get_api_update(subscription) is None
+        assert client.sent_headers[1] == {'If-None-Match': '"v1"'}
+        assert second.decoded == 0, (
+            'Проверьте, что ответ 304 не разбирается как JSON'
+        )
+
+    def test_same_body_skips_decoding(self, monkeypatch):
+        import homework
+
+        data = {'homeworks': [], 'current_date': 5}
+        repeated = MockResponse(data)
+        client = MockClient([MockResponse(data), repeated])
+        monkeypatch.setattr(homework, '_client', client)
+        subscription = subscriptions.Subscription('token', 1, 0)
+
+        homework.get_api_update(subscription)
+        assert homework.get_api_update(subscription) is None
+        assert repeated.decoded == 0
+
+    def test_same_homeworks_only_moves_cursor(self, monkeypatch):
+        import homework
+
+        homeworks = [{'homework_name': 'hw', 'status': 'reviewing'}]
+        client = MockClient([
+            MockResponse({'homeworks': homeworks, 'current_date': 5}),
+            MockResponse({'homeworks': homeworks, 'current_date': 9}),
+        ])
+        monkeypatch.setattr(homework, '_client', client)
+        subscription = subscriptions.Subscription('token', 1, 0)
+
+        assert homework.get_api_update(subscription) is not None
+        assert homework.get_api_update(subscription) is None
+        assert subscription.current_date == 9
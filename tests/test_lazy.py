@@ -0,0 +1,76 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+from lazy import LazyModule, LazyObject, lazy_import
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = (
+    'requests', 'telegram', 'asyncio', 'dotenv', 'orjson', 'http.server')
+IMPORT_CHECK = (
+    'import json, logging, os, sys\n'
+    'import homework\n'
+    'print(json.dumps({\n'
+    '    "loaded": [name for name in %r if name in sys.modules],\n'
+    '    "handlers": len(logging.getLogger("homework").handlers),\n'
+    '    "env": os.getenv("LAZY_IMPORT_CHECK"),\n'
+    '}))\n' % (HEAVY_MODULES,))
+
+
+class TestStartup:
+
+    def test_import_has_no_side_effects(self, tmp_path):
+        (tmp_path / '.env').write_text('LAZY_IMPORT_CHECK=loaded\n')
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        env.pop('LAZY_IMPORT_CHECK', None)
+        result = subprocess.run(
+            [sys.executable, '-c', IMPORT_CHECK], cwd=tmp_path, env=env,
+            capture_output=True, text=True, check=True)
+        report = json.loads(result.stdout)
+        assert report['loaded'] == [], (
+            'Проверьте, что тяжелые библиотеки импортируются лениво'
+        )
+        assert report['handlers'] == 0, (
+            'Проверьте, что импорт homework не добавляет обработчики логов'
+        )
+        assert report['env'] is None, (
+            'Проверьте, что .env читается только при запуске воркера'
+        )
+
+
+class TestLazy:
+
+    def test_module_is_imported_on_first_attribute(self):
+        module = LazyModule('json')
+        assert 'не загружен' in repr(module)
+        assert module.dumps([1]) == '[1]'
+        assert module._module is json
+
+    def test_optional_missing_module(self):
+        assert lazy_import('no_such_module_here', optional=True) is None
+        assert isinstance(lazy_import('json', optional=True), LazyModule)
+
+    def test_object_is_created_once(self):
+        calls = []
+        barrier = threading.Barrier(8)
+
+        def factory():
+            calls.append(1)
+            return 'значение'
+
+        proxy = LazyObject(factory)
+        assert calls == []
+
+        def touch():
+            barrier.wait()
+            proxy.upper()
+
+        threads = [threading.Thread(target=touch) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert calls == [1]
+        assert proxy.upper() == 'ЗНАЧЕНИЕ'
@@ -0,0 +1,96 @@
+import json
+import logging
+
+import log_setup
+
+
+def make_record(msg, **extra):
+    record = logging.LogRecord(
+        'homework', logging.INFO, __file__, 1, msg, None, None, 'func')
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+class TestLogSetup:
+
+    def test_json_format(self):
+        line = log_setup.JsonFormatter().format(
+            make_record('Сбой', subscription='abc', latency=0.5))
+        data = json.loads(line)
+        assert data['message'] == 'Сбой'
+        assert data['subscription'] == 'abc'
+        assert data['latency'] == 0.5
+        assert data['func'] == 'func'
+
+    def test_sampling(self):
+        sampler = log_setup.SamplingFilter(rate=10)
+        frequent = [
+            sampler.filter(make_record('Запрос к информации о домашке'))
+            for _ in range(25)]
+        assert sum(frequent) == 3, (
+            'Проверьте, что частые сообщения попадают в лог выборочно'
+        )
+        assert all(sampler.filter(make_record('Сбой')) for _ in range(5))
+
+    def test_queue_listener_writes_rotated_file(self, tmp_path):
+        root = logging.getLogger()
+        handlers, level = list(root.handlers), root.level
+        path = tmp_path / 'main.log'
+        listener = log_setup.setup_logging(
+            str(path), max_bytes=200, backup_count=2, sample_rate=1)
+        try:
+            for number in range(20):
+                logging.getLogger('homework').info(
+                    'Сообщение %s', number, extra={'chat_id': 1})
+        finally:
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+            root.handlers, root.level = handlers, level
+        assert path.exists()
+        assert (tmp_path / 'main.log.1').exists(), (
+            'Проверьте, что лог ротируется по размеру'
+        )
+        last = path.read_text(encoding='utf-8').splitlines()[-1]
+        assert json.loads(last)['message'] == 'Сообщение 19'
+
+    def test_console_goes_through_listener(self, tmp_path, capsys):
+        root = logging.getLogger()
+        handlers, level = list(root.handlers), root.level
+        listener = log_setup.setup_logging(
+            str(tmp_path / 'main.log'), sample_rate=10, console=True)
+        try:
+            for _ in range(25):
+                logging.getLogger('homework').info(
+                    'Запрос к информации о домашке')
+        finally:
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+            root.handlers, root.level = handlers, level
+        lines = capsys.readouterr().err.splitlines()
+        assert len(lines) == 3, (
+            'Проверьте, что вывод в консоль идет через очередь с выборкой'
+        )
+
+    def test_status_record_has_context(self, caplog):
+        import homework
+        from subscriptions import Subscription
+
+        subscription = Subscription('token', '1', 0)
+        with caplog.at_level(logging.INFO, logger='homework'):
+            homework.process_response(subscription, {
+                'homeworks': [
+                    {'id': 1, 'homework_name': 'hw1', 'status': 'approved'}],
+                'current_date': 10,
+            })
+        records = [
+            record for record in caplog.records
+            if record.msg.startswith('Новый статус работы')]
+        assert len(records) == 1
+        data = json.loads(log_setup.JsonFormatter().format(records[0]))
+        assert data['homework'] == 'hw1'
+        assert data['subscription'] == subscription.key, (
+            'Проверьте, что запись о статусе несет подписку и домашку'
+        )
@@ -0,0 +1,83 @@
+import urllib.request
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def registry():
+    return metrics.Registry(enabled=True)
+
+
+class TestMetrics:
+
+    def test_disabled_registry_records_nothing(self):
+        registry = metrics.Registry()
+        counter = registry.counter('calls_total', 'Вызовы')
+        histogram = registry.histogram('call_seconds', 'Длительность')
+        counter.inc()
+        histogram.observe(0.1)
+        assert counter._values == {}
+        assert histogram._values == {}
+
+    def test_render(self, registry):
+        counter = registry.counter('responses_total', 'Ответы', ('code',))
+        counter.inc(1, 200)
+        counter.inc(2, 200)
+        histogram = registry.histogram('seconds', 'Время', buckets=(0.1, 1))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+        text = registry.render()
+        assert 'homework_bot_responses_total{code="200"} 3' in text
+        assert 'homework_bot_seconds_bucket{le="0.1"} 1' in text
+        assert 'homework_bot_seconds_bucket{le="1"} 2' in text
+        assert 'homework_bot_seconds_bucket{le="+Inf"} 3' in text
+        assert 'homework_bot_seconds_count 3' in text
+        assert '# TYPE homework_bot_seconds histogram' in text
+
+    def test_timed_counts_failures(self, registry):
+        histogram = registry.histogram('stage_seconds', 'Время', ('stage',))
+        failures = registry.counter('failures_total', 'Сбои', ('stage',))
+
+        @metrics.timed(histogram, failures, 'parse')
+        def parse(value):
+            if value is None:
+                raise KeyError('нет значения')
+            return value
+
+        assert parse(1) == 1
+        with pytest.raises(KeyError):
+            parse(None)
+        assert failures._values == {('parse',): 1}
+        assert histogram._values[('parse',)][0][-1] == 0
+        assert sum(histogram._values[('parse',)][0]) == 2
+
+    def test_http_endpoint(self, registry):
+        registry.gauge('queue_depth', 'Очередь', lambda: 7)
+        server = metrics.start_http_server(0, registry=registry)
+        host, port = server.server_address
+        try:
+            assert host == '127.0.0.1', (
+                'Проверьте, что /metrics по умолчанию слушает '
+                'только локальный адрес'
+            )
+            with urllib.request.urlopen(
+                    f'http://{host}:{port}/metrics') as response:
+                body = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert 'homework_bot_queue_depth 7' in body
+
+    def test_parse_status_is_instrumented(self, monkeypatch):
+        import homework
+
+        monkeypatch.setattr(metrics.REGISTRY, 'enabled', True)
+        before = dict(metrics.VALIDATION_FAILURES._values)
+        with pytest.raises(KeyError):
+            homework.parse_status({'status': 'approved'})
+        key = ('parse_status',)
+        assert metrics.VALIDATION_FAILURES._values[key] == \
+            before.get(key, 0) + 1
@@ -0,0 +1,170 @@
+import threading
+
+import homework
+import subscriptions
+from delivery import DeliveryQueue
+from outbox import Outbox
+
+
+class Recorder:
+
+    def __init__(self, failing=False):
+        self.sent = []
+        self.failing = failing
+        self.lock = threading.Lock()
+
+    def __call__(self, chat_id, text):
+        if self.failing:
+            raise RuntimeError('telegram недоступен')
+        with self.lock:
+            self.sent.append((chat_id, text))
+
+
+def commit(outbox, chat_id, text, key=None):
+    ids = []
+    outbox.append(chat_id, text, key, ids.append)
+    outbox.flush()
+    return ids[0]
+
+
+class TestOutbox:
+
+    def test_pending_survive_restart(self, tmp_path):
+        path = str(tmp_path / 'outbox.db')
+        outbox = Outbox(path)
+        first = commit(outbox, 1, 'первое')
+        second = commit(outbox, 2, 'второе')
+        outbox.mark_sent(first)
+        outbox.close()
+        outbox = Outbox(path)
+        try:
+            assert outbox.pending() == [(second, '2', 'второе')], (
+                'Проверьте, что неотправленные сообщения переживают '
+                'перезапуск'
+            )
+        finally:
+            outbox.close()
+
+    def test_idempotency_key(self, tmp_path):
+        outbox = Outbox(str(tmp_path / 'outbox.db'))
+        try:
+            assert commit(outbox, 1, 'текст', 'key') is not None
+            assert commit(outbox, 1, 'текст', 'key') is None
+            assert commit(outbox, 1, 'текст') is not None
+            assert commit(outbox, 1, 'текст') is not None
+            assert len(outbox.pending()) == 3
+        finally:
+            outbox.close()
+
+    def test_workers_share_file_by_owner(self, tmp_path):
+        path = str(tmp_path / 'outbox.db')
+        first = Outbox(path, owner='a')
+        second = Outbox(path, owner='b')
+        try:
+            message_id = commit(first, 1, 'от первого')
+            assert second.pending() == [], (
+                'Проверьте, что воркер не отправляет чужие сообщения'
+            )
+            assert second.adopt(['a', 'b']) == []
+            assert second.adopt(['b']) == [(message_id, '1', 'от первого')]
+            assert second.pending() == [(message_id, '1', 'от первого')]
+            assert first.pending() == []
+            assert second.adopt(['b']) == []
+        finally:
+            first.close()
+            second.close()
+
+    def test_appends_are_group_committed(self, tmp_path):
+        outbox = Outbox(str(tmp_path / 'outbox.db'), flush_interval=0.05)
+        writes = []
+        write = outbox._write
+
+        def counting_write(appends, sent):
+            writes.append(len(appends))
+            return write(appends, sent)
+
+        outbox._write = counting_write
+        committed = threading.Event()
+        ids = []
+
+        def on_commit(message_id):
+            ids.append(message_id)
+            if len(ids) == 100:
+                committed.set()
+
+        try:
+            for number in range(100):
+                outbox.append(1, f'сообщение {number}', None, on_commit)
+            assert committed.wait(5)
+        finally:
+            outbox.close()
+        assert len(writes) < 10, (
+            'Проверьте, что записи фиксируются пачками'
+        )
+        assert sorted(ids) == ids
+
+    def test_old_records_are_removed(self, tmp_path):
+        clock = [0.0]
+        outbox = Outbox(
+            str(tmp_path / 'outbox.db'), retention=60,
+            clock=lambda: clock[0])
+        try:
+            commit(outbox, 1, 'старое')
+            clock[0] = 100
+            commit(outbox, 1, 'новое')
+            assert [text for _, _, text in outbox.pending()] == ['новое']
+        finally:
+            outbox.close()
+
+
+class TestQueueWithOutbox:
+
+    def test_undelivered_messages_are_replayed(self, tmp_path):
+        path = str(tmp_path / 'outbox.db')
+        failing = Recorder(failing=True)
+        queue = DeliveryQueue(
+            failing, workers=1, max_attempts=1, outbox=Outbox(path)).start()
+        saved = []
+        queue.put('1', 'статус', lambda: saved.append(1), 'key')
+        assert queue.close(timeout=5)
+        assert saved == []
+
+        send = Recorder()
+        queue = DeliveryQueue(send, workers=1, outbox=Outbox(path)).start()
+        queue.put('1', 'статус', lambda: saved.append(2), 'key')
+        assert queue.close(timeout=5)
+        assert send.sent == [('1', 'статус')], (
+            'Проверьте, что сообщение из журнала отправляется один раз'
+        )
+        assert saved == [2]
+        outbox = Outbox(path)
+        try:
+            assert outbox.pending() == []
+        finally:
+            outbox.close()
+
+    def test_repoll_after_crash_is_not_resent(self, tmp_path, monkeypatch):
+        response = {
+            'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+            'current_date': 10,
+        }
+        monkeypatch.setattr(
+            homework, 'get_api_update', lambda subscription: response)
+        path = str(tmp_path / 'outbox.db')
+        send = Recorder()
+        outbox = Outbox(path)
+        queue = DeliveryQueue(send, workers=1, outbox=outbox)
+        subscription = subscriptions.Subscription('t', 1, 5)
+        homework.poll_subscription(None, subscription, None, None, queue)
+        outbox.flush()
+        outbox.close()
+
+        restarted = subscriptions.Subscription('t', 1, 5)
+        queue = DeliveryQueue(send, workers=1, outbox=Outbox(path)).start()
+        homework.poll_subscription(None, restarted, None, None, queue)
+        assert queue.close(timeout=5)
+        assert len(send.sent) == 1, (
+            'Проверьте, что повторный опрос после сбоя не отправляет '
+            'сообщение второй раз'
+        )
+        assert restarted.saved_date == 10
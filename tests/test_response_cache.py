@@ -0,0 +1,131 @@
+import dataclasses
+import threading
+import time
+from functools import partial
+
+import pytest
+
+import homework
+from fake_server import FakeServer, Script
+from fetcher import ConcurrentFetcher
+from response_cache import ResponseCache
+from scheduler import IDLE, PollScheduler
+from status_index import StatusIndex
+from subscriptions import SubscriptionRegistry
+from utils import FakeClock
+
+
+class Fetch:
+
+    def __init__(self, delay=0, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, token, from_date):
+        with self.lock:
+            self.calls.append((token, from_date))
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return {'token': token, 'from_date': from_date}
+
+
+class TestResponseCache:
+
+    def test_concurrent_requests_share_one_fetch(self):
+        cache = ResponseCache(ttl=5, bucket=60)
+        fetch = Fetch(delay=0.2)
+        results = []
+
+        def poll():
+            results.append(cache.get('token', 100, fetch))
+
+        threads = [threading.Thread(target=poll) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert fetch.calls == [('token', 60)], (
+            'Проверьте, что одновременные запросы одного токена '
+            'делают один запрос к API'
+        )
+        assert len(results) == 5
+        assert all(result is results[0] for result in results)
+
+    def test_from_date_buckets(self):
+        cache = ResponseCache(ttl=5, bucket=60)
+        fetch = Fetch()
+        cache.get('token', 61, fetch)
+        cache.get('token', 119, fetch)
+        cache.get('token', 120, fetch)
+        cache.get('other', 61, fetch)
+        assert fetch.calls == [
+            ('token', 60), ('token', 120), ('other', 60)]
+
+    def test_answer_expires(self):
+        clock = FakeClock()
+        cache = ResponseCache(ttl=5, bucket=60, clock=clock)
+        fetch = Fetch()
+        cache.get('token', 0, fetch)
+        clock.now = 4
+        cache.get('token', 0, fetch)
+        assert len(fetch.calls) == 1
+        clock.now = 5
+        cache.get('token', 0, fetch)
+        assert len(fetch.calls) == 2
+        clock.now = 100
+        cache.get('other', 0, fetch)
+        assert len(cache) == 1, (
+            'Проверьте, что устаревшие ответы удаляются из кэша'
+        )
+
+    def test_errors_are_not_cached(self):
+        cache = ResponseCache(ttl=5, bucket=60)
+        failing = Fetch(error=RuntimeError('API недоступен'))
+        with pytest.raises(RuntimeError):
+            cache.get('token', 0, failing)
+        fetch = Fetch()
+        assert cache.get('token', 0, fetch) == {
+            'token': 'token', 'from_date': 0}
+
+
+class TestSharedPoll:
+
+    def test_one_request_fans_out_to_every_chat(self, monkeypatch):
+        scripts = {'shared': Script(['reviewing'])}
+        with FakeServer(scripts=scripts) as server:
+            monkeypatch.setattr(homework, 'CONFIG', dataclasses.replace(
+                homework.CONFIG, endpoint=server.endpoint,
+                telegram_api_url=server.telegram_url))
+            monkeypatch.setattr(homework, 'TELEGRAM_TOKEN', '123:test')
+            monkeypatch.setattr(homework, '_client', None)
+            monkeypatch.setattr(homework, 'RESPONSES', ResponseCache())
+            registry = SubscriptionRegistry()
+            for chat_id in (1, 2, 3):
+                registry.add('shared', chat_id, 1000)
+            registry.add('solo', 4, 1000)
+            scheduler = PollScheduler(jitter=0)
+            for subscription in registry:
+                scheduler.complete(subscription.key, IDLE)
+            scheduler.postpone(registry.for_token('shared')[0].key, 0)
+
+            due = homework.due_subscriptions(registry, scheduler)
+            assert sorted(item.chat_id for item in due) == ['1', '2', '3'], (
+                'Проверьте, что вместе с подпиской опрашиваются '
+                'остальные подписки ее токена'
+            )
+            bot = homework.make_bot()
+            index = StatusIndex(100)
+            fetcher = ConcurrentFetcher(4, key=lambda item: item.key)
+            try:
+                results = fetcher.map(
+                    partial(homework.poll_update, index=index), due)
+                for subscription, update, error in results:
+                    homework.complete_poll(
+                        bot, subscription, update, error, index=index)
+            finally:
+                fetcher.close()
+            assert scripts['shared'].polls == 1
+            assert sorted(chat_id for chat_id, _ in server.sent) == [1, 2, 3]
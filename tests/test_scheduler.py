@@ -0,0 +1,89 @@
+import scheduler
+import subscriptions
+from scheduler import CHANGED, ERROR, IDLE, PollScheduler
+from utils import FakeClock
+
+
+def make_scheduler(clock, rng=lambda: 0.5, jitter=0.0):
+    return PollScheduler(
+        base_interval=600, reviewing_interval=150, max_interval=3600,
+        idle_backoff=2, jitter=jitter, clock=clock, rng=rng)
+
+
+class TestPollScheduler:
+
+    def test_due_order(self):
+        clock = FakeClock()
+        polls = make_scheduler(clock)
+        polls.add('a')
+        polls.add('b')
+        assert sorted(polls.pop_due()) == ['a', 'b']
+        assert polls.pop_due() == []
+        polls.complete('a', CHANGED)
+        polls.complete('b', CHANGED, reviewing=True)
+        assert polls.next_delay() == 150
+        clock.now = 150
+        assert polls.pop_due() == ['b'], (
+            'Проверьте, что подписка с работой на проверке '
+            'опрашивается чаще'
+        )
+
+    def test_idle_and_error_backoff(self):
+        polls = make_scheduler(FakeClock())
+        assert [polls.interval('a', IDLE) for _ in range(4)] == [
+            600, 1200, 2400, 3600]
+        assert polls.interval('a', CHANGED) == 600
+        assert polls.interval('a', IDLE) == 600
+        assert [polls.interval('b', ERROR) for _ in range(3)] == [
+            1200, 2400, 3600]
+
+    def test_jitter_spreads_polls(self):
+        clock = FakeClock()
+        values = iter([0.0, 1.0])
+        polls = make_scheduler(clock, rng=lambda: next(values), jitter=0.1)
+        polls.add('a')
+        polls.add('b')
+        polls.pop_due(now=1000)
+        values = iter([0.0, 1.0])
+        polls.rng = lambda: next(values)
+        polls.complete('a', CHANGED)
+        polls.complete('b', CHANGED)
+        assert polls._due == {'a': 540, 'b': 660}
+
+    def test_requests_per_second(self):
+        clock = FakeClock()
+        polls = make_scheduler(clock)
+        for key in range(30):
+            polls.add(key)
+        for key in polls.pop_due():
+            polls.complete(key, IDLE)
+        assert polls.requests_per_second() == 30 / scheduler.RATE_WINDOW
+        clock.now = scheduler.RATE_WINDOW + 1
+        assert polls.requests_per_second() == 0
+
+    def test_removed_subscription_is_skipped(self):
+        polls = make_scheduler(FakeClock())
+        polls.add('a')
+        polls.remove('a')
+        assert polls.pop_due() == []
+        assert polls.next_delay() == 600
+
+    def test_poll_outcomes(self, monkeypatch):
+        import homework
+
+        answers = iter([
+            {'homeworks': [{'id': 1, 'homework_name': 'hw',
+                            'status': 'reviewing'}], 'current_date': 1},
+            None,
+        ])
+        monkeypatch.setattr(
+            homework, 'get_api_update', lambda subscription: next(answers))
+        subscription = subscriptions.Subscription('t', 1)
+
+        class Bot:
+            def send_message(self, chat_id=None, text=None):
+                pass
+
+        assert homework.poll_subscription(Bot(), subscription) == CHANGED
+        assert subscription.reviewing == {'1'}
+        assert homework.poll_subscription(Bot(), subscription) == IDLE
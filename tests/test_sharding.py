@@ -0,0 +1,207 @@
+import pytest
+
+import homework
+from circuit import CLOSED, OPEN
+from scheduler import PollScheduler
+from sharding import HashRing, ShardCoordinator, SQLiteLeaseTable, open_leases
+from status_index import StatusIndex
+from storage import SQLiteStateStore
+from subscriptions import SubscriptionRegistry, make_key
+from utils import FakeClock
+
+KEYS = [f'key-{number}' for number in range(3000)]
+
+
+class FakeQueue:
+
+    def __init__(self):
+        self.chats = set()
+        self.sent = []
+
+    def put(self, chat_id, text, on_sent=None):
+        self.sent.append((chat_id, text))
+
+    def pending(self, chat_id):
+        return chat_id in self.chats
+
+    def adopt(self, live):
+        return 0
+
+
+@pytest.fixture
+def clock():
+    return FakeClock(1000.0)
+
+
+@pytest.fixture
+def table(tmp_path, clock):
+    table = SQLiteLeaseTable(str(tmp_path / 'leases.db'), clock)
+    yield table
+    table.close()
+
+
+def coordinator(table, worker, clock):
+    shard = ShardCoordinator(table, worker, ttl=30, clock=clock)
+    shard.refresh(force=True)
+    return shard
+
+
+class TestHashRing:
+
+    def test_keys_are_spread_evenly(self):
+        ring = HashRing(['a', 'b', 'c'])
+        owners = [ring.owner(key) for key in KEYS]
+        for node in 'abc':
+            assert 700 < owners.count(node) < 1300
+
+    def test_adding_node_moves_few_keys(self):
+        before = HashRing(['a', 'b', 'c'])
+        after = HashRing(['a', 'b', 'c', 'd'])
+        moved = [key for key in KEYS if before.owner(key) != after.owner(key)]
+        assert all(after.owner(key) == 'd' for key in moved)
+        assert len(moved) < len(KEYS) / 3
+
+    def test_empty_ring(self):
+        assert HashRing().owner('key') is None
+
+
+class TestLeaseTable:
+
+    def test_lease_is_exclusive_until_expired(self, table, clock):
+        assert table.acquire('key', 'a', 30)
+        assert table.acquire('key', 'a', 30), 'Своя аренда продлевается'
+        assert not table.acquire('key', 'b', 30)
+        clock.now += 31
+        assert table.acquire('key', 'b', 30)
+
+    def test_release_and_leave(self, table):
+        table.heartbeat('a', 30)
+        table.acquire('one', 'a', 30)
+        table.acquire('two', 'a', 30)
+        table.release('one', 'b')
+        assert not table.acquire('one', 'b', 30)
+        table.release('one', 'a')
+        assert table.acquire('one', 'b', 30)
+        table.leave('a')
+        assert table.workers() == []
+        assert table.acquire('two', 'b', 30)
+
+    def test_heartbeat_renews_leases(self, table, clock):
+        table.acquire('key', 'a', 30)
+        clock.now += 20
+        table.heartbeat('a', 30)
+        clock.now += 20
+        assert not table.acquire('key', 'b', 30)
+        assert table.workers() == ['a']
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            open_leases('redis', 'leases')
+
+
+class TestRebalance:
+
+    def make_worker(self, table, name, clock, store):
+        registry = SubscriptionRegistry()
+        for number in range(40):
+            registry.add(f'token-{number}', number, 0)
+        scheduler = PollScheduler(jitter=0, clock=clock)
+        for subscription in registry:
+            scheduler.add(subscription.key)
+        shard = coordinator(table, name, clock)
+        return registry, scheduler, shard, StatusIndex()
+
+    def poll(self, worker, store, queue=None):
+        registry, scheduler, shard, index = worker
+        due = homework.due_subscriptions(
+            registry, scheduler, shard, store, index, queue)
+        for subscription in due:
+            scheduler.postpone(subscription.key, 0)
+        return {subscription.key for subscription in due}
+
+    def test_each_subscription_has_one_owner(self, table, clock, tmp_path):
+        store = SQLiteStateStore(str(tmp_path / 'state.db'))
+        first = self.make_worker(table, 'a', clock, store)
+        second = self.make_worker(table, 'b', clock, store)
+        first[2].refresh(force=True)
+        owned_a = self.poll(first, store)
+        owned_b = self.poll(second, store)
+        assert owned_a and owned_b
+        assert not owned_a & owned_b
+        assert len(owned_a | owned_b) == 40
+        store.close()
+
+    def test_handover_waits_for_delivery(self, table, clock, tmp_path):
+        store = SQLiteStateStore(str(tmp_path / 'state.db'))
+        queue = FakeQueue()
+        first = self.make_worker(table, 'a', clock, store)
+        owned = self.poll(first, store, queue)
+        assert len(owned) == 40
+
+        second = self.make_worker(table, 'b', clock, store)
+        first[2].refresh(force=True)
+        moved = [key for key in owned if second[2].assigned(key)]
+        assert moved
+        key = moved[0]
+        subscription = first[0].get(key)
+        store.save(key, 777, 'Уже отправлено', [('1', 'approved')])
+        queue.chats.add(subscription.chat_id)
+
+        clock.now += 10
+        self.poll(first, store, queue)
+        assert key not in self.poll(second, store), (
+            'Проверьте, что аренда не отдается, пока сообщения в очереди'
+        )
+        queue.chats.clear()
+        clock.now += 10
+        self.poll(first, store, queue)
+        clock.now += 10
+        assert key in self.poll(second, store)
+        taken = second[0].get(key)
+        assert taken.last_message == 'Уже отправлено'
+        assert taken.current_date == 777
+        assert second[3].get(key, '1') == 'approved'
+        store.close()
+
+    def test_outage_notice_once_per_chat(self, table, clock, tmp_path):
+        store = SQLiteStateStore(str(tmp_path / 'state.db'))
+        queue = FakeQueue()
+        first = self.make_worker(table, 'a', clock, store)
+        second = self.make_worker(table, 'b', clock, store)
+        first[2].refresh(force=True)
+        self.poll(first, store)
+        self.poll(second, store)
+        paused = first[0].get(sorted(first[2].held)[0])
+        paused.paused = True
+        for registry, _, shard, _ in (first, second):
+            homework.notify_outage(registry, queue, CLOSED, OPEN, shard)
+        chats = [chat_id for chat_id, _ in queue.sent]
+        assert len(chats) == len(set(chats)), (
+            'Проверьте, что о сбое каждый чат узнает от одного воркера'
+        )
+        assert paused.chat_id not in chats, (
+            'Проверьте, что приостановленные подписки не оповещаются'
+        )
+        assert len(chats) == 39
+        store.close()
+
+    def test_command_registration_reaches_owner(self, table, clock, tmp_path):
+        store = SQLiteStateStore(str(tmp_path / 'state.db'))
+        first = self.make_worker(table, 'a', clock, store)
+        second = self.make_worker(table, 'b', clock, store)
+        first[2].refresh(force=True)
+        second[2].refresh(force=True)
+        number = 0
+        while not second[2].assigned(
+                make_key(f'new-{number}', 'chat')):
+            number += 1
+        subscription = first[0].add(f'new-{number}', 'chat')
+        store.save_registration(subscription)
+        first[1].postpone(subscription.key, 0)
+        assert subscription.key not in self.poll(first, store)
+        clock.now += second[2].interval
+        assert subscription.key in self.poll(second, store), (
+            'Проверьте, что подписку, заведенную командой на другом '
+            'воркере, опрашивает ее владелец'
+        )
+        store.close()
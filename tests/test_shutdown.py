@@ -0,0 +1,206 @@
+import asyncio
+import dataclasses
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import homework
+from control import LoopControl
+from delivery import DeliveryQueue
+from fake_server import FakeServer, Script
+from response_cache import ResponseCache
+from scheduler import PollScheduler
+from storage import SQLiteStateStore
+from subscriptions import SubscriptionRegistry
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class SlowSend:
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.sent = []
+
+    def __call__(self, chat_id, text):
+        time.sleep(self.delay)
+        self.sent.append((chat_id, text))
+
+
+def stop_later(control, delay=0.1):
+    timer = threading.Timer(delay, control.request_stop)
+    timer.start()
+    return timer
+
+
+class TestStopLoop:
+
+    def test_running_stops_after_request(self):
+        control = LoopControl()
+        try:
+            items = control.running(range(5))
+            assert next(items) == 0
+            control.request_stop()
+            assert list(items) == []
+        finally:
+            control.close()
+
+    def test_sync_loop_wakes_and_returns(self):
+        control = LoopControl()
+        scheduler = PollScheduler(600, 150, 3600, jitter=0)
+        stop_later(control)
+        started = time.monotonic()
+        try:
+            homework.run_polling(
+                None, SubscriptionRegistry(), scheduler, control=control)
+        finally:
+            control.close()
+        assert time.monotonic() - started < 2, (
+            'Проверьте, что сигнал остановки прерывает сон цикла опроса'
+        )
+
+    def test_async_loop_waits_for_started_polls(self, monkeypatch):
+        control = LoopControl()
+        registry = SubscriptionRegistry()
+        subscription = registry.add('token', 1)
+        scheduler = PollScheduler(jitter=0)
+        scheduler.postpone(subscription.key, 0)
+        polled = []
+
+        def slow_poll(subscription, index=None):
+            time.sleep(0.3)
+            polled.append(subscription.key)
+
+        monkeypatch.setattr(homework, 'poll_update', slow_poll)
+        stop_later(control)
+        try:
+            asyncio.run(homework.main_async(
+                None, registry, scheduler, control=control))
+        finally:
+            control.close()
+        assert polled == [subscription.key], (
+            'Проверьте, что начатый опрос дорабатывает до остановки'
+        )
+
+    def test_sync_loop_keeps_one_deadline(self, monkeypatch):
+        monkeypatch.setattr(homework, 'CONFIG', dataclasses.replace(
+            homework.CONFIG, shutdown_timeout=0.3, poll_timeout=60))
+        control = LoopControl()
+        registry = SubscriptionRegistry()
+        subscription = registry.add('token', 1)
+        scheduler = PollScheduler(jitter=0)
+        scheduler.postpone(subscription.key, 0)
+        release = threading.Event()
+
+        def slow_poll(subscription, index=None):
+            release.wait(5)
+
+        monkeypatch.setattr(homework, 'poll_update', slow_poll)
+        stop_later(control)
+        fetcher = homework.make_fetcher()
+        started = time.monotonic()
+        try:
+            homework.run_polling(
+                None, registry, scheduler, fetcher=fetcher, control=control)
+            assert homework.stop_timeout(control) == 0
+        finally:
+            release.set()
+            fetcher.close()
+            control.close()
+        assert time.monotonic() - started < 2, (
+            'Проверьте, что опросы в полете ждут не дольше '
+            'общего срока остановки'
+        )
+
+    def test_async_loop_keeps_one_deadline(self, monkeypatch):
+        with FakeServer(latency=5) as server:
+            monkeypatch.setattr(homework, 'CONFIG', dataclasses.replace(
+                homework.CONFIG, endpoint=server.endpoint,
+                shutdown_timeout=0.3))
+            monkeypatch.setattr(homework, '_client', None)
+            monkeypatch.setattr(homework, 'RESPONSES', ResponseCache())
+            control = LoopControl()
+            registry = SubscriptionRegistry()
+            subscription = registry.add('token', 1)
+            scheduler = PollScheduler(jitter=0)
+            scheduler.postpone(subscription.key, 0)
+            stop_later(control)
+            started = time.monotonic()
+            try:
+                homework.run_async(homework.main_async(
+                    None, registry, scheduler, control=control))
+                assert homework.stop_timeout(control) == 0
+            finally:
+                control.close()
+            assert time.monotonic() - started < 2, (
+                'Проверьте, что асинхронный цикл не ждет запросы '
+                'в полете дольше общего срока остановки'
+            )
+
+
+class TestShutdown:
+
+    def test_queue_is_drained_and_state_saved(self, tmp_path):
+        store = SQLiteStateStore(str(tmp_path / 'state.db'))
+        send = SlowSend(0.1)
+        queue = DeliveryQueue(send, workers=1).start()
+        saved = []
+        queue.put(1, 'первое')
+        queue.put(2, 'второе', lambda: saved.append(2))
+        homework.shutdown(queue, store, timeout=5)
+        assert len(send.sent) == 2
+        assert saved == [2]
+        with pytest.raises(sqlite3.ProgrammingError):
+            store.load()
+
+    def test_drain_respects_deadline(self):
+        queue = DeliveryQueue(SlowSend(5), workers=1).start()
+        queue.put(1, 'медленно')
+        started = time.monotonic()
+        homework.shutdown(queue, timeout=0.2)
+        assert time.monotonic() - started < 2, (
+            'Проверьте, что очередь дорабатывает не дольше timeout'
+        )
+
+    @pytest.mark.skipif(sys.platform == 'win32', reason='нужен SIGTERM')
+    def test_sigterm_delivers_pending_messages(self, tmp_path):
+        token = 'shutdown-token'
+        scripts = {token: Script(['reviewing'])}
+        with FakeServer(scripts=scripts) as server:
+            env = dict(
+                os.environ,
+                PRAKTICUM_TOKEN=token,
+                TELEGRAM_TOKEN='123:shutdown',
+                TELEGRAM_ChAT_ID='5',
+                PRACTICUM_ENDPOINT=server.endpoint,
+                TELEGRAM_API_URL=server.telegram_url,
+                STATE_PATH=str(tmp_path / 'state.db'),
+                OUTBOX_PATH=str(tmp_path / 'outbox.db'),
+                LOG_FILE=str(tmp_path / 'main.log'),
+                POLL_JITTER='0',
+                COMMANDS='off')
+            process = subprocess.Popen(
+                [sys.executable, 'homework.py'], cwd=ROOT, env=env,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                deadline = time.monotonic() + 30
+                while not scripts[token].polls:
+                    assert time.monotonic() < deadline, 'Воркер не начал опрос'
+                    time.sleep(0.01)
+                process.send_signal(signal.SIGTERM)
+                assert process.wait(15) == 0
+            finally:
+                if process.poll() is None:
+                    process.kill()
+            assert [chat_id for chat_id, _ in server.sent] == [5], (
+                'Проверьте, что сообщения из очереди доставляются '
+                'перед выходом'
+            )
+        log = (tmp_path / 'main.log').read_text(encoding='utf-8')
+        assert 'Работа остановлена' in log
@@ -0,0 +1,61 @@
+import subscriptions
+from status_index import StatusIndex, homework_key, restore_index
+from storage import SQLiteStateStore
+from utils import MockBot
+
+
+class TestStatusIndex:
+
+    def test_alternating_statuses_are_not_lost(self):
+        index = StatusIndex()
+        index.commit('sub', [('1', 'reviewing')])
+        index.commit('sub', [('1', 'rejected')])
+        assert index.get('sub', '1') == 'rejected'
+
+    def test_eviction_keeps_unfinished_works(self):
+        index = StatusIndex(capacity=2)
+        index.commit('sub', [('1', 'approved'), ('2', 'reviewing')])
+        index.commit('sub', [('3', 'rejected')])
+        assert len(index) == 2
+        assert index.get('sub', '1') is None, (
+            'Проверьте, что сверх лимита вытесняются принятые работы'
+        )
+        assert index.get('sub', '2') == 'reviewing'
+        assert index.get('sub', '3') == 'rejected'
+
+    def test_lookup_refreshes_finished_works(self):
+        index = StatusIndex(capacity=2)
+        index.commit('sub', [('1', 'approved'), ('2', 'approved')])
+        assert index.get('sub', '1') == 'approved'
+        index.commit('sub', [('3', 'reviewing')])
+        assert index.get('sub', '1') == 'approved', (
+            'Проверьте, что поиск продлевает жизнь принятой работы'
+        )
+        assert index.get('sub', '2') is None
+
+    def test_homework_key_falls_back_to_name(self):
+        assert homework_key({'id': 7, 'homework_name': 'hw'}) == '7'
+        assert homework_key({'homework_name': 'hw'}) == 'hw'
+
+    def test_poll_sends_each_transition_once(self, monkeypatch, tmp_path):
+        import homework
+
+        response = {
+            'homeworks': [{'id': 1, 'homework_name': 'hw', 'status': 'reviewing'}],
+            'current_date': 10,
+        }
+        monkeypatch.setattr(
+            homework, 'get_api_update', lambda subscription: response)
+        store = SQLiteStateStore(str(tmp_path / 'state.db'))
+        index = StatusIndex()
+        subscription = subscriptions.Subscription('t', 1)
+        bot = MockBot()
+        homework.poll_subscription(bot, subscription, store, index)
+        homework.poll_subscription(bot, subscription, store, index)
+        assert len(bot.sent) == 1
+
+        restored = restore_index(StatusIndex(), store)
+        assert restored.get(subscription.key, '1') == 'reviewing', (
+            'Проверьте, что индекс статусов восстанавливается из хранилища'
+        )
+        store.close()
@@ -0,0 +1,103 @@
+import pytest
+
+import storage
+import subscriptions
+
+
+@pytest.fixture(params=[storage.SQLITE_BACKEND, storage.FILE_BACKEND])
+def store(request, tmp_path):
+    state = storage.open_store(request.param, str(tmp_path / 'state'))
+    yield state
+    state.close()
+
+
+class TestStateStore:
+
+    def test_last_save_wins(self, store):
+        store.save('a', 1, 'первое')
+        store.save('a', 2, 'второе')
+        store.save('b', 3, '')
+        assert store.load() == {
+            'a': {'current_date': 2, 'last_message': 'второе'},
+            'b': {'current_date': 3, 'last_message': ''},
+        }
+
+    def test_restore_registry(self, store):
+        registry = subscriptions.SubscriptionRegistry()
+        subscription = registry.add('token', 1)
+        store.save(subscription.key, 1700000000, 'Список пуст')
+        registry = storage.restore_registry(registry, store)
+        assert subscription.current_date == 1700000000, (
+            'Проверьте, что после перезапуска опрос продолжается '
+            'с сохраненной временной метки'
+        )
+        assert subscription.last_message == 'Список пуст'
+
+    def test_statuses_are_saved_with_cursor(self, store):
+        store.save('a', 1, '', [('hw1', 'reviewing')])
+        store.save('a', 2, '', [('hw1', 'approved'), ('hw2', 'rejected')])
+        assert sorted(store.load_statuses()) == [
+            ('a', 'hw1', 'approved'), ('a', 'hw2', 'rejected')]
+        assert store.load()['a']['current_date'] == 2
+
+    def test_registrations(self, store):
+        registry = subscriptions.SubscriptionRegistry()
+        subscription = registry.add('token', 1)
+        store.save_registration(subscription)
+        subscription.paused = True
+        store.save_registration(subscription)
+        store.save(subscription.key, 5, 'Работа проверена')
+        restored = storage.restore_registry(
+            subscriptions.SubscriptionRegistry(), store).get(subscription.key)
+        assert restored.token == 'token'
+        assert restored.paused, (
+            'Проверьте, что пауза подписки переживает перезапуск'
+        )
+        assert restored.last_message == 'Работа проверена'
+
+    def test_unknown_backend(self, tmp_path):
+        with pytest.raises(ValueError):
+            storage.open_store('redis', str(tmp_path / 'state'))
+
+
+class TestFileStateStore:
+
+    def test_torn_line_is_skipped(self, tmp_path):
+        path = tmp_path / 'state.jsonl'
+        store = storage.FileStateStore(str(path))
+        store.save('a', 1, 'ok')
+        store.close()
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write('{"key": "a", "current_da')
+        store = storage.FileStateStore(str(path))
+        assert store.load() == {'a': {'current_date': 1, 'last_message': 'ok'}}
+        store.close()
+
+    def test_save_after_torn_line(self, tmp_path):
+        path = tmp_path / 'state.jsonl'
+        store = storage.FileStateStore(str(path))
+        store.save('a', 1, 'ok')
+        store.close()
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write('{"key": "a", "current_da')
+        store = storage.FileStateStore(str(path))
+        store.save('a', 2, 'ok')
+        store.close()
+        store = storage.FileStateStore(str(path))
+        state = store.load()['a']
+        assert state['current_date'] == 2, (
+            'Проверьте, что запись после сбоя не склеивается '
+            'с оборванной строкой'
+        )
+        store.close()
+
+    def test_compaction(self, tmp_path):
+        path = tmp_path / 'state.jsonl'
+        store = storage.FileStateStore(str(path))
+        for date in range(10):
+            store.save('a', date, '')
+        assert store.load() == {'a': {'current_date': 9, 'last_message': ''}}
+        store.save('a', 10, '')
+        store.close()
+        with open(path, encoding='utf-8') as file:
+            assert len(file.readlines()) == 2
@@ -0,0 +1,80 @@
+import json
+
+import subscriptions
+
+
+class TestSubscriptions:
+
+    def test_add_is_idempotent(self):
+        registry = subscriptions.SubscriptionRegistry()
+        first = registry.add('token', 123)
+        second = registry.add('token', '123')
+        assert first is second, (
+            'Проверьте, что повторная регистрация той же пары '
+            '(токен, чат) возвращает существующую подписку'
+        )
+        assert len(registry) == 1
+
+    def test_key_does_not_contain_token(self):
+        subscription = subscriptions.Subscription('secret-token', 1)
+        assert 'secret-token' not in subscription.key
+        assert subscription.key == subscriptions.make_key('secret-token', '1')
+
+    def test_iteration_allows_changes(self):
+        registry = subscriptions.SubscriptionRegistry()
+        registry.add('a', 1)
+        registry.add('b', 2)
+        for subscription in registry:
+            registry.remove(subscription.key)
+        assert len(registry) == 0
+
+    def test_load_subscriptions(self, tmp_path):
+        path = tmp_path / 'subscriptions.json'
+        path.write_text(json.dumps([
+            {'token': 'a', 'chat_id': 1},
+            {'token': 'b', 'chat_id': 2, 'current_date': 42},
+        ]))
+        registry = subscriptions.load_subscriptions(
+            subscriptions.SubscriptionRegistry(), path)
+        dates = sorted(item.current_date for item in registry)
+        assert dates == [42, subscriptions.DEFAULT_FROM_DATE]
+
+    def test_poll_subscription_uses_own_credentials(self, monkeypatch):
+        import homework
+
+        calls = []
+
+        def fake_get_api_update(subscription):
+            calls.append((subscription.token, subscription.current_date))
+            return {'homeworks': [], 'current_date': 100}
+
+        class Bot:
+            sent = []
+
+            def send_message(self, chat_id=None, text=None):
+                self.sent.append((chat_id, text))
+
+        monkeypatch.setattr(
+            homework, 'get_api_update', fake_get_api_update)
+        subscription = subscriptions.Subscription('tok', 777, 5)
+        bot = Bot()
+        homework.poll_subscription(bot, subscription)
+        assert calls == [('tok', 5)]
+        assert bot.sent == [('777', 'Список пуст')]
+        assert subscription.current_date == 100
+
+    def test_shared_tokens_are_marked(self):
+        registry = subscriptions.SubscriptionRegistry()
+        student = registry.add('token', 1)
+        other = registry.add('other', 1)
+        assert not student.shared
+        mentor = registry.add('token', 2)
+        assert student.shared and mentor.shared, (
+            'Проверьте, что подписки с общим токеном отмечаются shared'
+        )
+        assert not other.shared
+        assert registry.for_token('token') == sorted(
+            [student, mentor], key=lambda item: item.key)
+        registry.remove(mentor.key)
+        assert not student.shared
+        assert registry.for_token('token') == [student]
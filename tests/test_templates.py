@@ -0,0 +1,69 @@
+import pytest
+
+import homework
+from subscriptions import Subscription, SubscriptionRegistry
+from templates import MessageTemplate, TemplateCatalog
+
+VERDICTS = {'approved': 'Принято.', 'rejected': 'Есть замечания.'}
+
+
+class TestMessageTemplate:
+
+    def test_render(self):
+        template = MessageTemplate('"{name}": {verdict}', VERDICTS)
+        assert template.render('hw1', 'approved') == '"hw1": Принято.'
+        with pytest.raises(KeyError):
+            template.render('hw1', 'lost')
+
+    def test_name_can_repeat_or_be_absent(self):
+        twice = MessageTemplate('{name}/{name} {verdict}', VERDICTS)
+        assert twice.render('a', 'rejected') == 'a/a Есть замечания.'
+        absent = MessageTemplate('{verdict}', VERDICTS)
+        assert absent.render('a', 'approved') == 'Принято.'
+
+    def test_memo_is_bounded_lru(self):
+        template = MessageTemplate('{name} {verdict}', VERDICTS, memo_size=2)
+        first = template.render('hw1', 'approved')
+        assert template.render('hw1', 'approved') is first
+        template.render('hw2', 'approved')
+        template.render('hw1', 'approved')
+        template.render('hw3', 'approved')
+        assert list(template._memo) == [
+            ('hw1', 'approved'), ('hw3', 'approved')]
+
+
+class TestTemplateCatalog:
+
+    def test_locales_and_fallback(self):
+        catalog = TemplateCatalog(VERDICTS)
+        assert catalog.get().render('hw', 'approved').endswith('Принято.')
+        english = catalog.get('en').render('hw', 'approved')
+        assert english.startswith('The review status of "hw"')
+        assert catalog.get('xx') is catalog.get()
+
+    def test_custom_template_is_compiled_once(self):
+        catalog = TemplateCatalog(VERDICTS)
+        custom = catalog.get('ru', '{verdict} ({name})')
+        assert catalog.get('ru', '{verdict} ({name})') is custom
+        assert custom.render('hw', 'rejected') == 'Есть замечания. (hw)'
+
+
+class TestSubscriptionTemplates:
+
+    def test_default_message_is_unchanged(self):
+        record = homework.VALIDATOR.homework(
+            {'homework_name': 'hw', 'status': 'approved'})
+        assert homework.status_message(record) == (
+            'Изменился статус проверки работы "hw". '
+            + homework.HOMEWORK_STATUSES['approved'])
+
+    def test_chat_template(self):
+        registry = SubscriptionRegistry()
+        subscription = registry.add(
+            'token', 1, 0, locale='en', template='{name}: {verdict}')
+        assert isinstance(subscription, Subscription)
+        lines, _ = homework.process_response(subscription, {
+            'homeworks': [{'homework_name': 'hw', 'status': 'reviewing'}],
+            'current_date': 1,
+        })
+        assert lines == ['hw: The reviewer has started checking the work.']
@@ -0,0 +1,90 @@
+import pytest
+
+import homework
+from exception import InvalidHomeworkError, InvalidResponseError
+from subscriptions import Subscription
+from validation import ResponseValidator
+
+VALIDATOR = ResponseValidator(('approved', 'reviewing', 'rejected'))
+
+
+class TestResponseValidator:
+
+    @pytest.mark.parametrize('response, message', [
+        ([], 'не является словарем'),
+        ({'current_date': 1}, 'нет ключа homeworks'),
+        ({'homeworks': {}, 'current_date': 1}, 'не является списком'),
+        ({'homeworks': []}, 'нет ключа current_date'),
+        ({'homeworks': [], 'current_date': '1'}, 'не является числом'),
+    ])
+    def test_bad_response_is_rejected(self, response, message):
+        with pytest.raises(InvalidResponseError, match=message):
+            VALIDATOR.validate(response)
+
+    def test_bad_response_is_type_error(self):
+        with pytest.raises(TypeError):
+            VALIDATOR.check([])
+
+    def test_bad_homeworks_are_rejected_one_by_one(self):
+        good = {'id': 7, 'homework_name': 'hw', 'status': 'reviewing'}
+        batch = VALIDATOR.validate({
+            'homeworks': [
+                good,
+                {'homework_name': 'no status'},
+                {'status': 'approved'},
+                {'homework_name': 'odd', 'status': 'lost'},
+                {'homework_name': 'list', 'status': ['approved']},
+                {'homework_name': 'dict', 'status': {}},
+                'not a dict',
+            ],
+            'current_date': 5,
+        })
+        assert [item.key for item in batch.homeworks] == ['7']
+        assert batch.homeworks[0].name == 'hw'
+        assert batch.homeworks[0].status == 'reviewing'
+        assert batch.homeworks[0].raw is good
+        assert len(batch.rejected) == 6
+        assert all(
+            isinstance(error, InvalidHomeworkError)
+            for _, error in batch.rejected)
+        assert batch.current_date == 5
+
+    def test_unhashable_status_is_rejected_in_stream(self):
+        rejected = []
+        records = list(VALIDATOR.records([
+            {'homework_name': 'b', 'status': ['x']},
+            {'homework_name': 'hw', 'status': 'approved'},
+        ], rejected))
+        assert [item.name for item in records] == ['hw'], (
+            'Проверьте, что статус-список отбраковывает только свою домашку'
+        )
+        assert len(rejected) == 1
+        assert isinstance(rejected[0][1], InvalidHomeworkError)
+
+    def test_homework_error_message(self):
+        with pytest.raises(KeyError) as error:
+            VALIDATOR.homework({'homework_name': 'hw', 'status': 'lost'})
+        assert str(error.value) == "Неизвестный статус домашки \"hw\": 'lost'"
+
+    def test_records_have_slots(self):
+        record = VALIDATOR.homework({'homework_name': 'hw', 'status': 'approved'})
+        with pytest.raises(AttributeError):
+            record.extra = 1
+
+
+class TestProcessResponse:
+
+    def test_bad_homework_does_not_fail_batch(self):
+        subscription = Subscription('token', '1', 0)
+        lines, changes = homework.process_response(subscription, {
+            'homeworks': [
+                {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+                {'id': 2, 'homework_name': 'hw2', 'status': 'lost'},
+            ],
+            'current_date': 10,
+        })
+        assert lines == [
+            'Изменился статус проверки работы "hw1". '
+            + homework.HOMEWORK_STATUSES['approved']]
+        assert changes == [('1', 'approved')]
+        assert subscription.current_date == 10
@@ -37,3 +37,22 @@ def check_default_var_exists(scope: ModuleType, var_name: str) -> None:
         f'{var_name} должна быть переменной, а не функцией.'
     )
 
+
+class FakeClock:
+    """Clock for tests: returns `now`, which a test moves by hand"""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class MockBot:
+    """Bot stub that remembers the texts of sent messages"""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None):
+        self.sent.append(text)
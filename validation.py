@@ -0,0 +1,143 @@
+from exception import InvalidHomeworkError, InvalidResponseError
+
+
+class Homework:
+    """Проверенная домашка из ответа API."""
+
+    __slots__ = ('key', 'name', 'status', 'raw')
+
+    def __init__(self, key, name, status, raw):
+        """Запоминает поля домашки и исходный словарь."""
+        self.key = key
+        self.name = name
+        self.status = status
+        self.raw = raw
+
+
+class Batch:
+    """Проверенный ответ API: годные и отбракованные домашки."""
+
+    __slots__ = ('homeworks', 'rejected', 'current_date')
+
+    def __init__(self, homeworks, rejected, current_date):
+        """Запоминает результат проверки."""
+        self.homeworks = homeworks
+        self.rejected = rejected
+        self.current_date = current_date
+
+
+class ResponseValidator:
+    """
+    Проверка ответа API статусов домашек.
+
+    Допустимые статусы собираются в множество один раз при создании,
+    а ответ проверяется и превращается в записи Homework за один
+    проход. Ошибка в форме ответа отклоняет его целиком, а ошибка
+    в отдельной домашке отбраковывает только ее.
+    """
+
+    def __init__(self, statuses):
+        """Создает проверку для статусов statuses."""
+        self.statuses = frozenset(statuses)
+
+    def check(self, response):
+        """Проверяет форму ответа и возвращает список домашек как есть."""
+        if not isinstance(response, dict):
+            raise InvalidResponseError(
+                f'Ответ API не является словарем: {type(response).__name__}')
+        if 'homeworks' not in response:
+            raise InvalidResponseError('В ответе API нет ключа homeworks')
+        homeworks = response['homeworks']
+        if not isinstance(homeworks, list):
+            raise InvalidResponseError(
+                'homeworks в ответе API не является списком: '
+                f'{type(homeworks).__name__}')
+        self.current_date(response)
+        return homeworks
+
+    @staticmethod
+    def current_date(response):
+        """Проверяет и возвращает current_date из ответа."""
+        current_date = response.get('current_date')
+        if current_date is None:
+            raise InvalidResponseError('В ответе API нет ключа current_date')
+        if (not isinstance(current_date, (int, float))
+                or isinstance(current_date, bool)):
+            raise InvalidResponseError(
+                f'current_date в ответе API не является числом: '
+                f'{current_date!r}')
+        return current_date
+
+    def homework(self, item):
+        """
+        Проверяет одну домашку и возвращает запись Homework.
+
+        Годная домашка проходит одну общую проверку, разбор
+        по шагам нужен только для сообщения об ошибке.
+        """
+        if not isinstance(item, dict):
+            raise InvalidHomeworkError(
+                f'Домашка не является словарем: {type(item).__name__}')
+        name = item.get('homework_name')
+        status = item.get('status')
+        if (type(status) is str and status in self.statuses
+                and name and isinstance(name, str)):
+            key = item.get('id') or name
+            return Homework(
+                key if type(key) is str else str(key), name, status, item)
+        if not name or not isinstance(name, str):
+            raise InvalidHomeworkError('У домашки нет имени homework_name')
+        if status is None:
+            raise InvalidHomeworkError(f'У домашки "{name}" нет статуса')
+        raise InvalidHomeworkError(
+            f'Неизвестный статус домашки "{name}": {status!r}')
+
+    def validate(self, response):
+        """
+        Проверяет ответ целиком.
+
+        Возвращает Batch с записями годных домашек и парами
+        (домашка, ошибка) для отбракованных.
+        """
+        rejected = []
+        homeworks = list(self.records(self.check(response), rejected))
+        return Batch(homeworks, rejected, response['current_date'])
+
+    def validate_stream(self, stream):
+        """Проверяет ответ из HomeworkStream по мере чтения домашек."""
+        return StreamBatch(self, stream)
+
+    def records(self, homeworks, rejected):
+        """
+        Отдает записи годных домашек по одной.
+
+        Отбракованные домашки с ошибками добавляются в rejected.
+        """
+        homework = self.homework
+        for item in homeworks:
+            try:
+                yield homework(item)
+            except InvalidHomeworkError as error:
+                rejected.append((item, error))
+
+
+class StreamBatch:
+    """
+    Ответ API, который проверяется по мере чтения.
+
+    homeworks — итератор записей, пройти его можно один раз;
+    current_date доступна после того, как он пройден.
+    """
+
+    __slots__ = ('homeworks', 'rejected', '_stream')
+
+    def __init__(self, validator, stream):
+        """Связывает проверку validator с потоком домашек stream."""
+        self.rejected = []
+        self.homeworks = validator.records(stream, self.rejected)
+        self._stream = stream
+
+    @property
+    def current_date(self):
+        """Возвращает проверенную current_date из полей ответа."""
+        return ResponseValidator.current_date(self._stream.fields)